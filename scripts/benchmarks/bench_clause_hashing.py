@@ -0,0 +1,78 @@
+"""Compares the clause hashing of clause_hashing (64-bit Zobrist keys, XOR, exact verification)
+with the former scheme (sum of random 32-bit values per literal, hash values only).
+
+For each n, `m` distinct random clauses of width k are hashed and inserted into a set.
+We report the throughput of both schemes and the number of distinct clauses which the
+former scheme would have treated as duplicates (i.e. silently dropped).
+
+Sample call: python3 benchmarks/bench_clause_hashing.py -ns 1000 100000 1000000 -m 1000000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from clause_hashing import zobrist_keys, hash_literals, ClauseHashSet
+
+
+def sum32_keys(n, seed=42):
+    """The former variable mapping: each literal is mapped to a random value in {0, ..., 2^32 - 1}."""
+    rng = random.Random(seed)
+    sample = rng.sample(range(2**32-1), 2*n)
+    keys = {}
+    for l in range(1, n+1):
+        keys[l] = sample[2*l-2]
+        keys[-l] = sample[2*l-1]
+    return keys
+
+
+def random_clauses(n, m, k, seed):
+    """Returns m distinct random clauses (tuples of literals) of width k over n variables."""
+    rng = random.Random(seed)
+    clauses = set()
+    while len(clauses) < m:
+        clauses.add(tuple(sorted(v if rng.random() < 0.5 else -v for v in rng.sample(range(1, n+1), k))))
+    return list(clauses)
+
+
+def run_sum32(clauses, keys):
+    hash_values = set()
+    dropped = 0
+    start = time.perf_counter()
+    for clause in clauses:
+        h = sum(map(lambda x: keys[x], clause))
+        if h in hash_values:
+            dropped += 1 # a distinct clause with the same hash value was seen before
+            continue
+        hash_values.add(h)
+    return time.perf_counter() - start, dropped
+
+
+def run_zobrist(clauses, keys):
+    hash_values = ClauseHashSet()
+    dropped = 0
+    start = time.perf_counter()
+    for clause in clauses:
+        if not hash_values.add(clause, hash_literals(clause, keys)):
+            dropped += 1
+    return time.perf_counter() - start, dropped, hash_values.n_collisions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-ns", nargs='+', type=int, default=[1000, 10000, 100000, 1000000], help="The numbers of variables.")
+    parser.add_argument("-m", type=int, default=1000000, help="The number of distinct clauses hashed per n.")
+    parser.add_argument("-k", type=int, default=3, help="The width of the clauses.")
+    parser.add_argument("-s", type=int, default=42, help="The seed for the clauses.")
+    args = parser.parse_args()
+
+    print(f"{'n':>9} {'m':>9} | {'sum32 [clauses/s]':>18} {'dropped':>8} | {'zobrist64 [clauses/s]':>22} {'dropped':>8} {'64-bit collisions':>18}")
+    for n in args.ns:
+        clauses = random_clauses(n, args.m, args.k, args.s)
+        m = len(clauses)
+        time_sum32, dropped_sum32 = run_sum32(clauses, sum32_keys(n))
+        time_zobrist, dropped_zobrist, collisions = run_zobrist(clauses, zobrist_keys(n))
+        print(f"{n:>9} {m:>9} | {m/time_sum32:>18.0f} {dropped_sum32:>8} | {m/time_zobrist:>22.0f} {dropped_zobrist:>8} {collisions:>18}")
@@ -0,0 +1,57 @@
+"""Compares the modes of MoreResolutionFormula for finding the clauses which share literals with a clause
+(see more_resolution_formula.INTERSECT_MODES): "subsets" stores every clause under all of its subsets of
+at most `needed_intersect` literals, "postings" intersects the occurrences of the single literals.
+
+For each cnf-file (standard: the files in resolution/instances), both modes resolve the formula `times` times
+(or to convergence with -times 0). We report the peak of the memory allocated by Python (tracemalloc) and the
+runtime, and check that both modes find the same resolvents on each level.
+
+Sample call: python3 benchmarks/bench_intersection_index.py -times 3
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+RESOLUTION_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "resolution")
+sys.path.append(RESOLUTION_PATH)
+import pyximport; pyximport.install(setup_args={})
+import parse_formula
+from more_resolution_formula import MoreResolutionFormula, INTERSECT_MODES
+
+
+def resolve(path, intersect, times, max_length):
+    """Resolves the formula in `path` with the mode `intersect`.
+    Returns the resolvents of each level, the peak of the allocated memory (in bytes) and the runtime."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    cnf = MoreResolutionFormula(form=parse_formula.parse_formula(path)[0], intersect=intersect)
+    with contextlib.redirect_stdout(io.StringIO()):
+        result_dict = cnf.resolve_multiple_times(times=times if times > 0 else float('inf'), max_length=max_length)
+    runtime = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    levels = {level: sorted(x.variables for x in result) for level, result in result_dict.items()}
+    return levels, peak, runtime
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-cnfs", nargs='+', default=sorted(glob.glob(os.path.join(RESOLUTION_PATH, "instances", "*.cnf"))), help="The cnf-files which are resolved.")
+    parser.add_argument("-times", type=int, default=3, help="The number of resolution rounds (0: until convergence).")
+    parser.add_argument("-max_length", type=int, default=4, help="The maximal length of the resolvents.")
+    args = parser.parse_args()
+
+    print(f"{'file':>40} | " + " | ".join(f"{mode + ' [MB]':>15} {'[s]':>7}" for mode in INTERSECT_MODES))
+    for path in args.cnfs:
+        results = [resolve(path, mode, args.times, args.max_length) for mode in INTERSECT_MODES]
+        if any(levels != results[0][0] for levels, _, _ in results):
+            raise AssertionError(f"The resolvents of {path} differ.")
+
+        name = os.path.basename(path)
+        print(f"{name:>40} | " + " | ".join(f"{peak/2**20:>15.1f} {runtime:>7.1f}" for _, peak, runtime in results))
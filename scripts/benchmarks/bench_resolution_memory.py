@@ -0,0 +1,71 @@
+"""Compares the memory of convergence runs of MoreResolutionFormula (each pair of clauses is enumerated once
+by the order of the clause indices) with the former pair enumeration (all resolved pairs are stored in
+the set `already_resolved`).
+
+For each cnf-file, both variants resolve the formula to convergence. We report the peak of the memory
+allocated by Python (tracemalloc), the number of pairs the former variant stores and the runtime,
+and check that both variants find the same resolvents on each level.
+
+Sample call: python3 benchmarks/bench_resolution_memory.py -cnfs resolution/tests/test_instanzen/uf250-01.cnf -max_length 3
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "resolution"))
+import pyximport; pyximport.install(setup_args={})
+import parse_formula
+from more_resolution_formula import MoreResolutionFormula
+
+
+class FormerResolutionFormula(MoreResolutionFormula):
+    """Resolves as MoreResolutionFormula, but skips resolved pairs with the set `already_resolved` (as before)."""
+
+    def __init__(self, form=None):
+        super().__init__(form)
+        self.already_resolved = set()
+
+    def new_pairs(self, left, rights, min_index):
+        for right in rights:
+            if (left, right) in self.already_resolved or (right, left) in self.already_resolved:
+                continue
+            self.already_resolved.add((left, right))
+            yield right
+
+
+def converge(cls, path, max_length):
+    """Resolves the formula in `path` to convergence with the class `cls`.
+    Returns the resolvents of each level, the peak of the allocated memory (in bytes), the runtime and the formula."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    cnf = cls(form=parse_formula.parse_formula(path)[0])
+    with contextlib.redirect_stdout(io.StringIO()):
+        result_dict = cnf.resolve_to_convergence(max_length=max_length)
+    runtime = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    levels = {level: sorted(x.variables for x in result) for level, result in result_dict.items()}
+    return levels, peak, runtime, cnf
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-cnfs", nargs='+', required=True, help="The cnf-files which are resolved to convergence.")
+    parser.add_argument("-max_length", type=int, default=4, help="The maximal length of the resolvents.")
+    args = parser.parse_args()
+
+    print(f"{'file':>40} {'clauses':>8} | {'former [MB]':>11} {'pairs':>10} {'[s]':>7} | {'ordered [MB]':>12} {'[s]':>7} {'saved':>6}")
+    for path in args.cnfs:
+        former_levels, former_peak, former_time, former = converge(FormerResolutionFormula, path, args.max_length)
+        levels, peak, runtime, cnf = converge(MoreResolutionFormula, path, args.max_length)
+        if levels != former_levels:
+            raise AssertionError(f"The resolvents of {path} differ.")
+
+        name = os.path.basename(path)
+        print(f"{name:>40} {cnf.n_clauses:>8} | {former_peak/2**20:>11.1f} {len(former.already_resolved):>10} {former_time:>7.1f} | "
+              f"{peak/2**20:>12.1f} {runtime:>7.1f} {1 - peak/former_peak:>6.0%}")
@@ -0,0 +1,81 @@
+"""Compares the typed resolution kernel cython_functions.resolve (sorted C int arrays, Gray code
+enumeration of the subsets of the resolvent) with the former implementation (Python sets,
+list(combinations(...)) of every subset, hash value of each subset computed from scratch).
+
+All pairs of clauses of the given cnf-files which can be resolved are resolved with both functions.
+We report the throughput of both functions and check that they return the same resolvents.
+
+Sample call: python3 benchmarks/bench_resolve.py -cnfs resolution/tests/test_instanzen/uf250-01.cnf -max_length 4
+"""
+
+import argparse
+import os
+import sys
+import time
+from itertools import combinations
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "resolution"))
+import pyximport; pyximport.install(setup_args={})
+import cython_functions
+import parse_formula
+
+
+def resolve_former(vars_clauseA, vars_clauseB, variable, max_length, hash_values):
+    """The former resolve function (on the literal sets of the clauses)."""
+    new_clause_vars = vars_clauseA.union(vars_clauseB)
+    if len(new_clause_vars)-2 > max_length:
+        return None # The resolvent would be above allowed `max_length`
+
+    if len(set(map(abs, new_clause_vars))) < len(new_clause_vars)-1:
+        return None # The resolvent would be tautological
+
+    new_clause_vars = new_clause_vars.difference({variable, -variable})
+    for r in range(len(new_clause_vars), 0, -1):
+        comb = list(combinations(new_clause_vars, r))
+        for var_combination in comb:
+            if hash_values.contains(var_combination, cython_functions.hash_value(var_combination)):
+                return None
+
+    return new_clause_vars
+
+
+def resolvable_pairs(formula):
+    """Returns all triples (i, j, variable) such that the clause i contains `variable` and the clause j contains -`variable`."""
+    pairs = []
+    for variable in range(1, formula.n_variables+1):
+        for i in formula.variable_dict[variable]:
+            for j in formula.variable_dict[-variable]:
+                pairs.append((i, j, variable))
+    return pairs
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-cnfs", nargs='+', required=True, help="The cnf-files whose clauses are resolved.")
+    parser.add_argument("-max_length", type=int, default=4, help="The maximal length of the resolvents.")
+    parser.add_argument("-repeat", type=int, default=3, help="How often all pairs are resolved (the best time is reported).")
+    args = parser.parse_args()
+
+    print(f"{'file':>40} {'pairs':>9} | {'former [pairs/s]':>17} | {'kernel [pairs/s]':>17} {'speedup':>8}")
+    for path in args.cnfs:
+        formula, _, _ = parse_formula.parse_formula(path)
+        clauses = formula.clauses
+        hash_values = formula.clause_hash_values
+        pairs = resolvable_pairs(formula)
+        literal_sets = {i: set(clauses[i].variables) for i in clauses}
+
+        time_former = time_kernel = float('inf')
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            former = [resolve_former(literal_sets[i], literal_sets[j], v, args.max_length, hash_values) for i, j, v in pairs]
+            time_former = min(time_former, time.perf_counter() - start)
+
+            start = time.perf_counter()
+            kernel = [cython_functions.resolve(clauses[i].variables, clauses[j].variables, v, args.max_length, hash_values) for i, j, v in pairs]
+            time_kernel = min(time_kernel, time.perf_counter() - start)
+
+        if [r if r is None else sorted(r) for r in former] != [r if r is None else list(r) for r in kernel]:
+            raise AssertionError(f"The resolvents of {path} differ.")
+
+        name = os.path.basename(path)
+        print(f"{name:>40} {len(pairs):>9} | {len(pairs)/time_former:>17.0f} | {len(pairs)/time_kernel:>17.0f} {time_former/time_kernel:>7.1f}x")
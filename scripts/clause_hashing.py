@@ -0,0 +1,136 @@
+"""Hashing of clauses, shared by the creator and the resolution scripts.
+
+Each literal is mapped to a random 64-bit key (Zobrist hashing) and a clause is hashed
+by the XOR of the keys of its literals. The hash value does not depend on the order of
+the literals and can be updated literal by literal. Since the keys are independent and
+uniformly distributed, two distinct clauses share a hash value only with probability 2^-64.
+
+To rule out even these rare collisions, ClauseHashSet stores the literals of every clause
+and verifies each hit exactly. Hence, a clause is never mistaken for a different one.
+"""
+
+# Import standard python modules
+import random
+from functools import lru_cache
+
+
+@lru_cache(maxsize=16)
+def zobrist_keys(n, seed=42):
+    """
+    Returns a dict mapping each literal -n, ..., -1, 1, ..., n to a random value in {0, ..., 2^64 - 1}.
+    The keys only depend on n and seed, so they are built only once per n and shared by all callers (do not modify them!).
+    For n < n', the keys of the literals -n, ..., n are the same for n and n'.
+    Parameter n: The number of variables.
+    Parameter seed: The seed to initialize the random number generator.
+    """
+    rng = random.Random(seed)
+    keys = {}
+    for l in range(1, n+1):
+        keys[l] = rng.getrandbits(64)
+        keys[-l] = rng.getrandbits(64)
+    return keys
+
+
+def hash_literals(literals, keys):
+    """
+    Returns the XOR of the keys of all literals in `literals`.
+    Parameter literals: An iterable of literals (any objects that are keys of `keys`).
+    Parameter keys: The mapping of the literals to their 64-bit keys, e.g. as returned by zobrist_keys.
+    """
+    h = 0
+    for l in literals:
+        h ^= keys[l]
+    return h
+
+
+def same_clause(a, b):
+    """Returns True if the clauses `a` and `b` contain the same literals (in any order)."""
+    return len(a) == len(b) and frozenset(a) == frozenset(b)
+
+
+class ClauseHashSet:
+    """
+    A set of clauses which is addressed by the hash values of the clauses.
+
+    Each lookup only needs the hash value and the literals of a clause. If a clause with
+    the same hash value is stored, the literals are compared, so the answers are always exact.
+    Only a reference to the literals is stored (e.g. the literal set of a Clause object), they must not be changed.
+    """
+
+    # The Bloom filter has at least FILTER_BITS_PER_HASH bits per stored hash value (and at most 2^32 bits).
+    FILTER_BITS_PER_HASH = 16
+
+    def __init__(self):
+        self._clauses = {} # hash value -> literals of the first clause with this hash value
+        self._collisions = {} # hash value -> list of literals of further clauses with this hash value
+        self.n_collisions = 0 # number of distinct clauses which share the hash value with another clause
+        # Bloom filter of the stored hash values h: the bits h & mask and (h >> 32) & mask are set.
+        # Bits of removed hash values stay set (they only cause further lookups), they are cleared when the filter grows.
+        self._filter = bytearray(2**13)
+
+    def __len__(self):
+        return len(self._clauses) + self.n_collisions
+
+    def bloom_filter(self):
+        """Returns the Bloom filter (a bytearray of 2^b bits, do not modify it!) of the stored hash values.
+        A hash value h is rejected without a lookup unless the bits h & mask and (h >> 32) & mask (mask = 2^b - 1) are set
+        (bit i is bit i % 8 of byte i // 8)."""
+        return self._filter
+
+    def _set_filter_bits(self, h):
+        mask = 8*len(self._filter) - 1
+        for bit in (h & mask, (h >> 32) & mask):
+            self._filter[bit >> 3] |= 1 << (bit & 7)
+
+    def _grow_filter(self):
+        n_bits = 8*len(self._filter)
+        while n_bits < len(self._clauses) * self.FILTER_BITS_PER_HASH and n_bits < 2**32:
+            n_bits *= 2
+        self._filter = bytearray(n_bits // 8)
+        for h in self._clauses:
+            self._set_filter_bits(h)
+
+    def contains(self, literals, h):
+        """Returns True if the clause `literals` with hash value `h` is in the set."""
+        stored = self._clauses.get(h)
+        if stored is None:
+            return False
+        if same_clause(stored, literals):
+            return True
+        return any(same_clause(other, literals) for other in self._collisions.get(h, ()))
+
+    def add(self, literals, h):
+        """Adds the clause `literals` with hash value `h`. Returns False if the clause was already in the set."""
+        stored = self._clauses.get(h)
+        if stored is None:
+            self._clauses[h] = literals
+            if 8*len(self._filter) < len(self._clauses) * self.FILTER_BITS_PER_HASH and len(self._filter) < 2**29:
+                self._grow_filter()
+            else:
+                self._set_filter_bits(h)
+            return True
+        if self.contains(literals, h):
+            return False
+        self._collisions.setdefault(h, []).append(literals)
+        self.n_collisions += 1
+        return True
+
+    def remove(self, literals, h):
+        """Removes the clause `literals` with hash value `h`. Raises KeyError if the clause is not in the set."""
+        others = self._collisions.get(h, [])
+        if h in self._clauses and same_clause(self._clauses[h], literals):
+            if others:
+                self._clauses[h] = others.pop(0)
+                self.n_collisions -= 1
+            else:
+                del self._clauses[h]
+        else:
+            for i, other in enumerate(others):
+                if same_clause(other, literals):
+                    del others[i]
+                    self.n_collisions -= 1
+                    break
+            else:
+                raise KeyError(h)
+        if h in self._collisions and not others:
+            del self._collisions[h]
@@ -31,10 +31,11 @@ import pyximport; pyximport.install(setup_args={})
 from creator.base_instance_creator import create_instances
 from resolution.main import resolve_and_write
 from creator.mod_instance import modify_instance
+from creator.mod_bundle import create_bundle
 
 # Sample call (which works quickly): python3 create_all_files.py -ns 10 11 -r 2.0 --more -t 2 -M 8
 
-def main(N=10, ns=None, r=None, k=3, s=42, output_base_path="./root", ps=None, q=None, more=False, converge=True, times=2, max_length=4, shuffle=True, M=5000, c=None, E=None, config_file_contents=None):
+def main(N=10, ns=None, r=None, k=3, s=42, output_base_path="./root", ps=None, q=None, more=False, converge=True, times=2, max_length=4, shuffle=True, M=5000, c=None, E=None, config_file_contents=None, bundle=False, cache_dir=None):
 
     # These conditions will also be tested in base_instance_creator.py
     # However, we will use ns to create the basic folder structure, what we will do before calling base_instance_creator.py
@@ -106,6 +107,7 @@ def main(N=10, ns=None, r=None, k=3, s=42, output_base_path="./root", ps=None, q
     #     ├── n200/
     #     │   ├── {instance_name_1}/
     #     │   │   └── M files generated by combining the instance with M differently sampled resolvent subsets
+    #     │   │       (or, with bundle=True, one bundle per E-value storing these M files, see creator/mod_bundle.py)
     #     │   ├── ...
     #     │   └── {instance_name_N}/
     #     └── n300/
@@ -159,7 +161,7 @@ def main(N=10, ns=None, r=None, k=3, s=42, output_base_path="./root", ps=None, q
         dir = os.path.join(instances_folder_path, f"n{n}")
         for file in os.listdir(dir):
             print(f"Starting resolution for file {file}")
-            resolve_and_write(formula=os.path.join(dir, file), output_path=os.path.join(resolvents_folder_path, f"n{n}"), converge=converge, more=more, max_length=max_length, times=times)
+            resolve_and_write(formula=os.path.join(dir, file), output_path=os.path.join(resolvents_folder_path, f"n{n}"), converge=converge, more=more, max_length=max_length, times=times, cache_dir=cache_dir)
 
     if verbose:
         print("All resolvents files were successfully created.")
@@ -176,7 +178,10 @@ def main(N=10, ns=None, r=None, k=3, s=42, output_base_path="./root", ps=None, q
             res = os.path.join(os.path.join(resolvents_folder_path, f"n{n}"), os.path.splitext(file)[0] + ".resolvents")            
             out = os.path.join(os.path.join(mod_folder_path, f"n{n}"), os.path.splitext(file)[0])
             for e in E:
-                modify_instance(orig=orig, resolvents=res, seed=s+i, M=M, outputPath=out, p=c, E=e, shuffle=shuffle)
+                if bundle:
+                    create_bundle(orig=orig, resolvents=res, seed=s+i, M=M, outputPath=out, p=c, E=e, shuffle=shuffle)
+                else:
+                    modify_instance(orig=orig, resolvents=res, seed=s+i, M=M, outputPath=out, p=c, E=e, shuffle=shuffle)
                 i += 1
                 if verbose:
                     print("Generating modified files w.r.t.:", res)
@@ -247,6 +252,8 @@ if __name__ == '__main__':
     parser.add_argument("-M", type=int, default=5000, help="Specifies how many new files are generated.")
     parser.add_argument("-c", type=float, default=None, help="Specifies the probability/chance for adding each resolvent.")  
     parser.add_argument("-E", nargs='+', type=float, default=None, help="Specifies the expectation (old: probability) for adding each resolvent w.r.t. the number of original clauses.")    
+    parser.add_argument("--bundle", default=False, action="store_true" , help="Store the modified instances of each base instance in a bundle instead of M files.")
+    parser.add_argument("-cache_dir", type=str, default=None, help="Reuse the resolvents of base instances which were resolved with the same parameters before from this folder (it should not be in the output-path, which is overwritten).")
 
     args = parser.parse_args()
 
@@ -263,6 +270,6 @@ if __name__ == '__main__':
     for i,j in vars(args).items():
         config_file_contents.append("{0}: {1}\n".format(i,j))
 
-    main(N=args.N, ns=args.ns, r=args.r, k=args.k, s=args.s, output_base_path=args.output_base_path, ps=args.ps, q=args.q, more=args.more, converge=args.converge, times=args.times, max_length=args.max_length, shuffle=args.shuffle, M=args.M, c=args.c, E=args.E, config_file_contents=config_file_contents)
+    main(N=args.N, ns=args.ns, r=args.r, k=args.k, s=args.s, output_base_path=args.output_base_path, ps=args.ps, q=args.q, more=args.more, converge=args.converge, times=args.times, max_length=args.max_length, shuffle=args.shuffle, M=args.M, c=args.c, E=args.E, config_file_contents=config_file_contents, bundle=args.bundle, cache_dir=args.cache_dir)
 
 
@@ -2,5 +2,7 @@ import creator.base_instance_creator
 import creator.cnftools
 import creator.generator
 import creator.hash_clauses
+import creator.mod_bundle
 import creator.mod_instance
 import creator.sample_clauses
+import creator.seed_schedule
@@ -1,11 +1,13 @@
 import math
 import random
 import os.path
+from concurrent.futures import ProcessPoolExecutor
 
 import generator as g
+from seed_schedule import draw_seeds, scheduled_seeds
 #from . import generator as g
 
-def create_instances(ns, r, N=10, k=3, s=42, o='./', ps=None, q=None):
+def create_instances(ns, r, N=10, k=3, s=42, o='./', ps=None, q=None, workers=1, schedule=None):
     """
     Diese Funktion erstellt eine Reihe von k-SAT Instanzen mit hidden solution.
     :param ns: Sollte eine Liste sein. Jedes Element sollte ein int sein und entspricht der
@@ -19,10 +21,16 @@ def create_instances(ns, r, N=10, k=3, s=42, o='./', ps=None, q=None):
                 Außerdem muss entweder p oder q None sein. Standard None.
     :param q: Aus dem q-Wert können die p-Werte bestimmt werden. Entweder q oder p müssen None sein.
             Standard: None. ABER: Falls auch ps None entspricht, wird q auf (sqrt(5)-1)/2 gesetzt.
+    :param workers: Die Anzahl der Prozesse, die die Instanzen parallel erstellen. Die erzeugten Dateien
+                sind unabhängig von workers identisch. Standard: 1.
+    :param schedule: Der Pfad eines Seed-Schedules (siehe seed_schedule.SeedSchedule), aus dem die N * len(ns) Seeds
+                gelesen werden. Enthält er weniger Seeds, wird er erweitert. Die Instanzen sind dieselben wie ohne Schedule.
+                Standard: None, die Seeds werden gezogen.
     """
     # Wir überprüfen zunächst die Bedingungen.
     if not hasattr(ns, '__iter__'):
         raise TypeError("ns has to be iterable.")
+    ns = list(ns)
 
     if not all(isinstance(x, int) for x in ns):
         raise TypeError('ns has to be a list of integers.')
@@ -41,6 +49,14 @@ def create_instances(ns, r, N=10, k=3, s=42, o='./', ps=None, q=None):
     if not isinstance(o, str):
         raise TypeError("o should be a string.")
 
+    if not isinstance(workers, int):
+        raise TypeError("workers should be an integer.")
+    if workers < 1:
+        raise ValueError('workers should be at least 1.')
+
+    if not isinstance(schedule, str) and schedule is not None:
+        raise TypeError("schedule should be a string.")
+
     if (ps is not None) and (q is not None):
         raise ValueError("Eiter ps oder q has to be None.")
 
@@ -80,19 +96,30 @@ def create_instances(ns, r, N=10, k=3, s=42, o='./', ps=None, q=None):
     # Damit wären, technisch gesehen, die Zufallszahlen nicht unabhängig.
     # Das Problem wird umgangen, wenn ein Random-Objekt initialisiert wird.
     rng.seed(s)
-    for n in ns:
+    # Zunächst werden alle Seeds (in derselben Reihenfolge wie bei der seriellen Erstellung) gezogen bzw. aus dem Schedule gelesen.
+    # Jede Datei soll mit einem neuen, unabhängigen Seed erstellt werden (kein Seed wird doppelt verwendet).
+    # Danach ist jede Instanz unabhängig von den anderen und kann in einem eigenen Prozess erstellt werden.
+    if schedule is not None:
+        seeds = scheduled_seeds(schedule, s, N * len(ns))
+    else:
+        seeds = draw_seeds(rng, N * len(ns))
+    jobs = []
+    for i, n in enumerate(ns):
         # Für jedes n werden die Anzahl der Klauseln berechnet und und der Ausgabepfad bestimmt.
         output_path_n = os.path.join(o, f"n{n}")
         m = round(n*r)
-        # Track the seed that were used.
-        used_seeds = []
-        for i in range(N):
-            # Jede Datei soll mit einem neuen, unabhängigen Seed erstellt werden.
-            seed = rng.randint(1, 2**32 - 1)
-            while seed in used_seeds: # seed was already used, try another one.
-            	seed = rng.randint(1, 2**32 - 1)
-            used_seeds.append(seed)
+        for seed in seeds[i*N:(i+1)*N]:
+            jobs.append((n, m, seed, output_path_n))
+
+    if workers == 1:
+        for n, m, seed, output_path_n in jobs:
             g.main(n, m, k=k, p=ps, s=seed, o=output_path_n)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(g.main, n, m, k=k, p=ps, s=seed, o=output_path_n) for n, m, seed, output_path_n in jobs]
+            for future in futures:
+                # Errors raised in the processes are raised here again.
+                future.result()
 
 
 if __name__ == '__main__':
@@ -107,7 +134,9 @@ if __name__ == '__main__':
     parser.add_argument("-ps", type=float, default=None, nargs='+',
                         help="Specify the p-values as described in the paper.....")
     parser.add_argument("-q", type=float, default=None, help="Specifies the q-value. The p-values can be determined from q.")
+    parser.add_argument("-workers", type=int, default=1, help="Specifies how many processes generate the formulas in parallel.")
+    parser.add_argument("-schedule", type=str, default=None, help="Specifies a seed schedule (see seed_schedule.py) the seeds are read from.")
     args = parser.parse_args()
 
-    create_instances(args.ns, args.r, N=args.N, k=args.k, s=args.s, o=args.o, ps=args.ps, q=args.q)
+    create_instances(args.ns, args.r, N=args.N, k=args.k, s=args.s, o=args.o, ps=args.ps, q=args.q, workers=args.workers, schedule=args.schedule)
 
@@ -1,6 +1,28 @@
 """This class is a *very basic* way of building and manipulating CNF formulas and helps to output them in the DIMACS-format.
 """
 
+import gzip
+import lzma
+from io import StringIO
+
+import numpy
+
+
+# Number of clauses that are joined to one string before they are written to the file.
+CHUNK_SIZE = 10000
+
+
+def open_dimacs(path, mode="wt"):
+	"""Opens the file `path` for reading or writing a DIMACS file.
+	Files ending with ".gz" or ".xz" are (de-)compressed transparently.
+	"""
+	if path.endswith(".gz"):
+		return gzip.open(path, mode)
+	if path.endswith(".xz"):
+		return lzma.open(path, mode)
+	return open(path, mode)
+
+
 class CNF(object):
 	def __init__(self, n):
 	# Initial the CNF is empty
@@ -37,21 +59,164 @@ class CNF(object):
 		self.clauses.append(clause_list)
 		
 
-	def dimacs(self):
-		"""Converts the CNF file to the DIMACS format.
+	def write_dimacs(self, fileobj, chunk_size=CHUNK_SIZE):
+		"""Writes the CNF in the DIMACS format to the file object `fileobj`.
+		The clauses are written in chunks of `chunk_size` clauses,
+		so the DIMACS content is never held in memory as a whole.
 		"""
-		output = ""
 		# Write header
 		for header_line in self.header.split("\n"):
-			output += "c " + header_line + "\n"
-	
+			fileobj.write("c " + header_line + "\n")
+
 		# Write formula specification
-		output += f"p cnf {self.n} {len(self.clauses)}\n"
-		
+		fileobj.write(f"p cnf {self.n} {len(self)}\n")
+
 		# Write clauses
-		for cls in self.clauses:
-			clause_string = ' '.join([str(lit) for lit in cls])
-			clause_string += " 0\n"
-			output += clause_string
+		for chunk in self._clause_chunks(chunk_size):
+			fileobj.write("".join(' '.join(map(str, cls)) + " 0\n" for cls in chunk))
+
+
+	def _clause_chunks(self, chunk_size):
+		"""Yields the clauses (as lists of signed integers) in lists of at most `chunk_size` clauses.
+		"""
+		for start in range(0, len(self.clauses), chunk_size):
+			yield self.clauses[start:start+chunk_size]
+
+
+	def dimacs(self):
+		"""Converts the CNF file to the DIMACS format.
+		"""
+		output = StringIO()
+		self.write_dimacs(output)
+		return output.getvalue()
+
+
+
+class ArrayCNF(CNF):
+	"""A CNF that keeps all clauses in one contiguous int32 buffer instead of one Python list per clause.
+
+	If all clauses have the same width k (as for the planted k-SAT formulas), clause i occupies
+	the literals [i*k, (i+1)*k) of the buffer. As soon as clauses of different widths are added,
+	an additional array of offsets marks where each clause starts.
+	The DIMACS output is identical to the one of CNF.
+	"""
+
+	def __init__(self, n, k=None):
+		# The clauses are kept in the buffer below instead of the list of CNF.
+		self.n = n
+		self.header = "Default header"
+		self.k = k
+		self._literals = numpy.empty(1024, dtype=numpy.int32)
+		self._offsets = None # only used if the clauses have different widths
+		self._n_literals = 0
+		self._n_clauses = 0
+
+	def __len__(self):
+		"""Number of clauses in the formula
+		"""
+		return self._n_clauses
 
-		return output
\ No newline at end of file
+	@property
+	def clauses(self):
+		"""The clauses as a (read-only) tuple of lists of signed integers.
+		The clauses of an ArrayCNF can only be added by add_clause or add_clauses.
+		"""
+		return tuple(cls for chunk in self._clause_chunks(max(self._n_clauses, 1)) for cls in chunk)
+
+	def literals(self):
+		"""Returns the literals of all clauses as one flat int32 array (without a copy).
+		"""
+		return self._literals[:self._n_literals]
+
+	def offsets(self):
+		"""Returns an array of length len(self)+1, clause i consists of the literals [offsets[i], offsets[i+1]).
+		"""
+		if self._offsets is None:
+			return numpy.arange(self._n_clauses + 1, dtype=numpy.int64) * (self.k or 0)
+		return self._offsets[:self._n_clauses + 1]
+
+	#
+	# Methods for building the CNF
+	#
+
+	def add_clause(self, clause):
+		"""Adds a clause to the CNF object (same interface as CNF.add_clause).
+		"""
+		if not hasattr(clause, '__iter__'):
+			raise TypeError("Invalid clause. A clauses must be iterable.")
+		clause = list(clause)
+		if not all((type(lit) is int) and (type(truth) is bool) for (truth, lit) in clause):
+			raise TypeError("All literals have to be integers.")
+		self.add_clauses(numpy.array([[lit if truth else -lit for (truth, lit) in clause]], dtype=numpy.int64))
+
+	def add_clauses(self, clauses, offsets=None):
+		"""Adds many clauses at once.
+		The clauses are either given as a 2-dimensional integer array (one clause of signed literals per row)
+		or as a flat integer array of literals together with an array `offsets` of length m+1,
+		such that clause i consists of the literals clauses[offsets[i]:offsets[i+1]].
+		All clauses are validated with array operations before any of them is added.
+		"""
+		clauses = numpy.asarray(clauses)
+		if clauses.dtype.kind not in "iu":
+			raise TypeError("All literals have to be integers.")
+
+		if offsets is None:
+			if clauses.ndim != 2:
+				raise ValueError("Without offsets, the clauses have to be given as a 2-dimensional array.")
+			m, width = clauses.shape
+			literals = clauses.ravel()
+			widths = numpy.full(m, width, dtype=numpy.int64)
+		else:
+			offsets = numpy.asarray(offsets, dtype=numpy.int64)
+			if clauses.ndim != 1 or offsets.ndim != 1 or len(offsets) == 0 or offsets[0] != 0 or offsets[-1] != len(clauses) or numpy.any(numpy.diff(offsets) < 0):
+				raise ValueError("The offsets do not match the literals.")
+			literals = clauses
+			widths = numpy.diff(offsets)
+			m = len(widths)
+
+		if numpy.any(literals == 0) or numpy.any(numpy.abs(literals) > self.n):
+			raise ValueError(f"Invalid clause. The clause may only contain positive/negative integers up to {self.n}/{-self.n}.")
+
+		# Sort the variables within each clause, equal neighbours are reappearing variables.
+		clause_ids = numpy.repeat(numpy.arange(m), widths)
+		order = numpy.lexsort((numpy.abs(literals), clause_ids))
+		variables = numpy.abs(literals)[order]
+		if numpy.any((variables[1:] == variables[:-1]) & (clause_ids[order][1:] == clause_ids[order][:-1])):
+			raise ValueError("This class does not accept tautological clauses or clauses with reappearing literals.")
+
+		self._append(literals.astype(numpy.int32), widths)
+
+	def _append(self, literals, widths):
+		"""(INTERNAL USE) Appends validated literals of clauses with the given widths to the buffer."""
+		if self.k is None and self._n_clauses == 0 and len(widths) > 0:
+			self.k = int(widths[0])
+		if self._offsets is None and numpy.any(widths != self.k):
+			# From now on, the clauses have different widths.
+			self._offsets = self.offsets().copy()
+
+		end = self._n_literals + len(literals)
+		if end > len(self._literals):
+			self._literals = numpy.resize(self._literals, max(end, 2*len(self._literals)))
+		self._literals[self._n_literals:end] = literals
+
+		if self._offsets is not None:
+			new_end = self._n_clauses + len(widths) + 1
+			if new_end > len(self._offsets):
+				self._offsets = numpy.resize(self._offsets, max(new_end, 2*len(self._offsets)))
+			self._offsets[self._n_clauses+1:new_end] = self._n_literals + numpy.cumsum(widths)
+
+		self._n_literals = end
+		self._n_clauses += len(widths)
+
+	def _clause_chunks(self, chunk_size):
+		"""Yields the clauses (as lists of signed integers) in lists of at most `chunk_size` clauses.
+		"""
+		offsets = self.offsets()
+		for start in range(0, self._n_clauses, chunk_size):
+			end = min(start + chunk_size, self._n_clauses)
+			literals = self._literals[offsets[start]:offsets[end]]
+			if self._offsets is None:
+				yield literals.reshape(-1, self.k).tolist()
+			else:
+				borders = (offsets[start+1:end] - offsets[start]).tolist()
+				yield [cls.tolist() for cls in numpy.split(literals, borders)]
@@ -371,10 +371,32 @@ class CNF(object):
         self._dimacs_dump_clauses(output, export_header, extra_text)
         return output.getvalue()
 
+    def write_dimacs(self, fileobj, export_header=True, extra_text=None):
+        """Write the dimacs encoding of the formula to a file
+
+        In contrast to `dimacs` the encoding is not built in memory,
+        the clauses are written in chunks directly to `fileobj`.
+
+        Parameters
+        ----------
+        fileobj : file-like object
+            the (text) file the dimacs encoding is written to.
+            Use `cnfformula.open_dimacs` to write gzip or xz compressed files.
+
+        export_header : bool
+            determines whether the formula header should be inserted as
+            a comment in the DIMACS output.
+
+        extra_text : str, optional
+            Additional text attached to the header
+        """
+        self._dimacs_dump_clauses(fileobj, export_header, extra_text)
+
     def _dimacs_dump_clauses(self,
                              output=None,
                              export_header=True,
-                             extra_text=None):
+                             extra_text=None,
+                             chunk_size=10000):
         """Dump the dimacs encoding of the formula to the file-like output
 
         This is for internal use only. It produces the dimacs output
@@ -408,7 +430,8 @@ class CNF(object):
         if len(self.clauses) == 0:
             output.write("\n")  # this newline makes `lingeling` solver happy
 
-        # Clauses
-        for cls in self.clauses:
-            output.write("\n" + " ".join([str(l) for l in cls + (0, )]))
+        # Clauses (joined in chunks to keep the number of write calls small)
+        for start in range(0, len(self.clauses), chunk_size):
+            chunk = self.clauses[start:start + chunk_size]
+            output.write("".join("\n" + " ".join(map(str, cls)) + " 0" for cls in chunk))
 
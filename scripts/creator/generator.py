@@ -5,13 +5,19 @@ import random
 import os
 import sys
 
+# Import third-party modules
+import numpy
+
 # Import own modules
 import cnfformula
 import sample_clauses as sample_clauses
 import hash_clauses as hash_clauses
 
 
-def main(n, m, k=None, p=None, s=None, F=None, o=None):
+# The available methods to sample the clauses (see the parameter `sampler` of main).
+SAMPLERS = ["exact", "batch", "direct"]
+
+def main(n, m, k=None, p=None, s=None, F=None, o=None, sampler=None, z=None, repair=False):
     """Builds random CNF formula with :math:`m` clauses
     over :math:`n` variables, each of width :math:`k`.
     The sampling of the clauses is done uniformly at random,
@@ -42,6 +48,23 @@ def main(n, m, k=None, p=None, s=None, F=None, o=None):
     o : str, optional (standard: o = './')
         output path of the DIMACS file
 
+    sampler : str, optional (standard: sampler = 'exact')
+        the method used to sample the clauses:
+        'exact' draws the clauses one by one (reproduces the files of earlier versions),
+        'batch' draws large blocks of clauses with NumPy (much faster for large n, but different files for the same seed),
+        'direct' draws the number of satisfied literals first and never rejects a clause because of p
+        (as fast as 'batch' and independent of the p-values, but different files for the same seed)
+
+    z : str, optional (standard behaviour: the DIMACS file is not compressed)
+        'gz' or 'xz' to compress the DIMACS file, the file name gets the extension .cnf.gz or .cnf.xz
+
+    repair : bool, optional (standard: repair = False)
+        if some variables do not occur in the sampled clauses, all clauses are discarded and sampled again.
+        If repair is True, the sampled clauses are kept instead and only as many clauses are replaced
+        by clauses containing the unused variables as necessary (see sample_clauses.repair_coverage).
+        The number of replaced clauses is written to the header.
+        In both modes, the number of sampling attempts is written to the header.
+
     Raises
     ------
     TypeError
@@ -56,6 +79,8 @@ def main(n, m, k=None, p=None, s=None, F=None, o=None):
         when any(val > 1.0 for val in p)
         when any(val < 0.0 for val in p)
         when not any(val > 0.0 for val in p)
+        when sampler is not one of 'exact', 'batch' or 'direct'
+        when z is not one of None, 'gz' or 'xz'
         if there are fewer clauses available than the number requested (this may take quite some time!)
 
     FileNotFoundError
@@ -116,7 +141,9 @@ def main(n, m, k=None, p=None, s=None, F=None, o=None):
     else:
         terminalstring += " -s " + str(s)
 
-    random.seed(s)
+    # All random decisions of this call are drawn from rng.
+    # In contrast to the global random number generator, several calls can run concurrently (e.g. in threads).
+    rng = random.Random(s)
 
 
     if F is not None:
@@ -128,6 +155,20 @@ def main(n, m, k=None, p=None, s=None, F=None, o=None):
     else:
         terminalstring += " -o " + o 
 
+
+    if sampler is None:
+        sampler = "exact" # set the standard sampler
+    else:
+        terminalstring += " -sampler " + sampler
+
+
+    if z is not None:
+        terminalstring += " -z " + z
+
+
+    if repair:
+        terminalstring += " --repair"
+
     # -------------------------------------------------------------------------------------------
 
     #
@@ -158,6 +199,12 @@ def main(n, m, k=None, p=None, s=None, F=None, o=None):
     if not any(val > 0.0 for val in p):
         raise ValueError("Some p-values must be > 0.0")
 
+    if sampler not in SAMPLERS:
+        raise ValueError("The sampler must be one of {}.".format(", ".join(SAMPLERS)))
+
+    if z not in [None, "gz", "xz"]:
+        raise ValueError("The compression must be gz or xz.")
+
     # -------------------------------------------------------------------------------------------
 
     #
@@ -171,7 +218,7 @@ def main(n, m, k=None, p=None, s=None, F=None, o=None):
 
         for i in range(1,n+1):
             variable = i
-            flip = random.randint(0, 1)
+            flip = rng.randint(0, 1)
             if (flip == 0):
                 hiddensol_listint.append(variable)
                 hiddensol_string += str(variable) + " "
@@ -227,23 +274,43 @@ def main(n, m, k=None, p=None, s=None, F=None, o=None):
     F = cnfformula.CNF(n)
 
     t = 0
+    repairs = 0
 
     # Add the clauses to the formula
     try:
-        hash_clauses.init_variable_mapping(n)
+        # The mapping is only built once per n and not changed by the sampling
+        mapping = hash_clauses.get_variable_mapping(n)
         condition = True
         while condition:
             t+=1
             # important to try different seeds if try was not sucessful
-            variables, clauselist = sample_clauses.sample_clauses(k, n, m, hidden, s+t, p)
+            if sampler == "batch":
+                variables, clausearray = sample_clauses.sample_clauses_batch(k, n, m, hidden, s+t, p)
+            elif sampler == "direct":
+                variables, clausearray = sample_clauses.sample_clauses_direct(k, n, m, hidden, s+t, p)
+            else:
+                variables, clauselist = sample_clauses.sample_clauses(k, n, m, hidden, s+t, p, mapping=mapping)
             # Check if all variables were used
             if len(variables) != n:
-                continue
+                if not repair:
+                    continue
+
+                # Keep the sampled clauses and only replace some of them by clauses with the unused variables
+                if sampler == "exact":
+                    clausearray = numpy.array([[lit if truth else -lit for (truth, lit) in clause] for clause in clauselist])
+                clausearray, repairs = sample_clauses.repair_coverage(k, n, clausearray, hidden, p, sample_clauses.repair_generator(s+t))
+                if sampler == "exact":
+                    clauselist = [tuple((lit > 0, abs(lit)) for lit in clause) for clause in clausearray.tolist()]
+
+            if sampler != "exact":
+                # Keep the clauses in one array instead of one list per clause
+                F = cnfformula.ArrayCNF(n, k)
+                F.add_clauses(clausearray)
+            else:
+                F = cnfformula.CNF(n)
 
-            F = cnfformula.CNF(n)
-            
-            for clause in clauselist:
-                F.add_clause(clause)
+                for clause in clauselist:
+                    F.add_clause(clause)
             
             condition = False
 
@@ -258,17 +325,22 @@ def main(n, m, k=None, p=None, s=None, F=None, o=None):
 
     # Generate the potential filename to save later  
     file_name = f"gen_n{n}_m{m}_k{k}SAT_seed{s}.cnf"
+    if z is not None:
+        file_name += "." + z
 
     # Set the header of the CNF formula, that will be printed after the "c" in DIMACS
     F.header = "This file was generated by concealSATgen\n"\
     + terminalstring + "\n"\
     + f"Hidden solution: {hiddensol_string}\n"\
-    + "p-values " + pvaluestring
+    + "p-values " + pvaluestring + "\n"\
+    + f"Sampling attempts: {t}"
+
+    if repair:
+        F.header += f"\nRepaired clauses: {repairs}"
 
-    # Create the file and write the DIMACS content
-    f2 = open(f"{o}/{file_name}", "w")
-    f2.write( F.dimacs() )
-    f2.close()
+    # Create the file and stream the DIMACS content to it
+    with cnfformula.open_dimacs(f"{o}/{file_name}", "wt") as f2:
+        F.write_dimacs(f2)
 
 ###################################################################################
 
@@ -282,6 +354,9 @@ if __name__ == '__main__':
     parser.add_argument("-s", type=int, default=None, help="The seed to initialize the random number generator.")
     parser.add_argument("-F", type=str, default=None, help="The path to the file with contains the wanted hidden solution.")    
     parser.add_argument("-o", type=str, default=None, help="The output-path to save the generated cnf-file.")
+    parser.add_argument("-sampler", type=str, default=None, choices=SAMPLERS, help="The method used to sample the clauses (standard: exact).")
+    parser.add_argument("-z", type=str, default=None, choices=["gz", "xz"], help="Compress the generated cnf-file with gzip or xz.")
+    parser.add_argument("--repair", default=False, action="store_true", help="Replace single clauses instead of sampling all clauses again if a variable is unused.")
     args = parser.parse_args()
 
-    main(args.n, args.m, k=args.k, p=args.p, s=args.s, F=args.F, o=args.o)
+    main(args.n, args.m, k=args.k, p=args.p, s=args.s, F=args.F, o=args.o, sampler=args.sampler, z=args.z, repair=args.repair)
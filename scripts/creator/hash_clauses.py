@@ -1,28 +1,51 @@
 
 # Import standard python modules
-import random
+import os
+import sys
+from functools import lru_cache
+from types import MappingProxyType
+
+# Import own modules
+# The hashing of clauses is shared with the resolution scripts and located in the parent folder.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from clause_hashing import zobrist_keys, ClauseHashSet
 
 
 
 variable_mapping = {}
 
-def init_variable_mapping(n, seed=42):
+@lru_cache(maxsize=16)
+def get_variable_mapping(n, seed=42):
     """
-    This method initializes the variable mapping. Each literal is uniquely mapped to a randomly chosen value in {0, ..., 2^32 - 1}.
+    This method returns a variable mapping for n variables. Each literal is uniquely mapped to a randomly chosen value in {0, ..., 2^64 - 1}
+    (see clause_hashing.zobrist_keys).
+    The mapping only depends on n and seed, so it is built only once per n and shared by all callers.
+    It is returned as a read-only view, a caller cannot change the hash values of the other callers.
     Parameter n: The number of variables.
     """
-    rng = random.Random()
-    rng.seed(seed)
-    sample = random.sample(range(2**32-1), 2*n)
-    i = 0
+    keys = zobrist_keys(n, seed)
+    mapping = {}
     for l in range(1, n+1):
-        variable_mapping[(True, l)] = sample[i]
-        variable_mapping[(False, l)] = sample[i+1]
-        i += 2
+        mapping[(True, l)] = keys[l]
+        mapping[(False, l)] = keys[-l]
+    return MappingProxyType(mapping)
+
+def init_variable_mapping(n, seed=42):
+    """
+    This method initializes the module-wide variable mapping used by hash_clause if no mapping is passed.
+    Parameter n: The number of variables.
+    """
+    variable_mapping.clear()
+    variable_mapping.update(get_variable_mapping(n, seed))
     
-def hash_clause(clause):
+def hash_clause(clause, mapping=None):
     """
-    This method calculates the sum of literals of a clause w.r.t. the above variable mapping.
+    This method calculates the XOR of the literals of a clause w.r.t. the variable mapping `mapping` (standard: the module-wide mapping).
     Parameter clause: The clause is a list of the form [(Boolean, int)]. The Boolean describes the polarity of the literal. 
     """
-    return sum(map(lambda x: variable_mapping[x], clause))
+    if mapping is None:
+        mapping = variable_mapping
+    h = 0
+    for literal in clause:
+        h ^= mapping[literal]
+    return h
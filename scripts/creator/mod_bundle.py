@@ -0,0 +1,224 @@
+import random
+import os
+import sys
+import json
+import numpy
+
+import mod_instance as mi
+from seed_schedule import draw_seeds, scheduled_seeds
+
+
+# The version of the bundle format (stored in each bundle).
+BUNDLE_VERSION = 1
+
+
+def create_bundle(orig, resolvents, seed=42, M=5000, outputPath='./modified', p=None, E=0.1, shuffle=False, selection='bernoulli', schedule=None):
+    """Stores the M modified instances of `modify_instance` in a single bundle file instead of M DIMACS files.
+
+    The bundle {outputPath}/orig_mod_s{seed}_p{p}.npz contains the clauses of the original file and
+    the resolvents only once. For each modified instance only its seed and the selected resolvents
+    (one bit per resolvent) are stored. The modified instances can be written on demand
+    with ModifiedInstanceBundle, the files are identical to the files created by
+    modify_instance(orig, resolvents, seed, M, outputPath, p, E, shuffle, selection=selection).
+
+    Parameters
+    ----------
+    orig, resolvents, seed, M, outputPath, p, E, shuffle, selection, schedule
+        as in `mod_instance.modify_instance`
+
+    Returns
+    -------
+    str
+        the path of the bundle
+
+    Raises
+    ------
+    TypeError, ValueError
+        as in `mod_instance.modify_instance`
+    """
+
+    mi.check_non_M_and_p_parameters(orig, resolvents, seed, outputPath, shuffle)
+
+    if not isinstance(p,float) and p is not None:
+        raise TypeError("p has to be of type float.")
+
+    if not isinstance(E, float) and not isinstance(E, int):
+        raise TypeError("E must be float or int.")
+
+    if E <= 0:
+        raise ValueError("E must be positive.")
+
+    p = mi.calculate_standard_p_value(p, orig, resolvents, E)
+
+    if p <= 0 or p > 1:
+        raise ValueError("It must hold 0 < p <= 1.")
+
+    if not isinstance(M, int):
+        raise TypeError("M has to be of type int.")
+
+    if M <= 0:
+        raise ValueError("M has to be positive.")
+
+    mi.check_selection(selection)
+
+    if not isinstance(schedule, str) and schedule is not None:
+        raise TypeError("schedule has to be of type str.")
+
+    # The same seeds as in modify_instance.
+    if schedule is not None:
+        seeds = scheduled_seeds(schedule, seed, M)
+    else:
+        rng = random.Random()
+        rng.seed(seed)
+        seeds = draw_seeds(rng, M)
+
+    original_clauses = mi.get_clause_file(orig)
+    resolvent_clauses = mi.get_clause_file(resolvents)
+
+    # One row of bits per modified instance.
+    masks = numpy.empty((M, (len(resolvent_clauses) + 7) // 8), dtype=numpy.uint8)
+    selected = numpy.empty(len(resolvent_clauses), dtype=bool)
+    for row, (_, _, sampled) in enumerate(mi.sample_selections(seeds, len(resolvent_clauses), p, selection)):
+        selected[:] = False
+        selected[sampled] = True
+        masks[row] = numpy.packbits(selected)
+
+    meta = {
+        "version": BUNDLE_VERSION,
+        "name": mi.get_file_name_without_path_without_extension(orig),
+        "original_cnf_file": mi.get_file_name_without_path_without_extension(orig) + ".cnf",
+        "resolvent_file": mi.get_file_name_without_path_without_extension(resolvents) + ".resolvents",
+        "n": mi.get_parameter_line_from_cnf_file(orig).split(" ")[2],
+        "p": p,
+        "shuffle": shuffle,
+        "selection": selection,
+        "header": mi.get_header(orig)[:-1],
+    }
+
+    os.makedirs(outputPath, exist_ok=True)
+    bundle_path = os.path.join(outputPath, mi.get_file_name_without_path_without_extension(orig) + f"_mod_s{seed}_p{p}.npz")
+    with open(bundle_path, "wb") as f:
+        numpy.savez(f,
+            meta=numpy.frombuffer(json.dumps(meta).encode(), dtype=numpy.uint8),
+            original_data=contiguous_lines(original_clauses), resolvent_data=contiguous_lines(resolvent_clauses),
+            seeds=numpy.array(seeds, dtype=numpy.int64), masks=masks)
+
+    return bundle_path
+
+
+
+def contiguous_lines(clause_file):
+    """Returns the (normalized) lines of a ClauseFile one after another in a uint8 array."""
+    data = numpy.empty(int(clause_file.lengths.sum()), dtype=numpy.uint8)
+    clause_file.copy_lines(data, numpy.cumsum(clause_file.lengths) - clause_file.lengths)
+    return data
+
+
+
+class ModifiedInstanceBundle:
+    """The modified instances stored in a bundle written by `create_bundle`.
+
+    The i-th instance (with the seed seeds[i]) is written by `write` to a file object,
+    by `materialize` to its usual file {outputPath}/orig_mod_s{seed}_p{p}.cnf.
+    """
+
+    def __init__(self, path):
+        with numpy.load(path) as bundle:
+            meta = json.loads(bundle["meta"].tobytes().decode())
+            if meta["version"] != BUNDLE_VERSION:
+                raise ValueError(f"The bundle {path} has the unsupported version {meta['version']}.")
+            self.original_clauses = mi.ClauseFile.from_lines(bundle["original_data"])
+            self.resolvent_clauses = mi.ClauseFile.from_lines(bundle["resolvent_data"])
+            self.seeds = bundle["seeds"].tolist()
+            self.masks = bundle["masks"]
+
+        self.name = meta["name"]
+        self.original_cnf_file = meta["original_cnf_file"]
+        self.resolvent_file = meta["resolvent_file"]
+        self.n = meta["n"]
+        self.p = meta["p"]
+        self.shuffle = meta["shuffle"]
+        self.selection = meta["selection"]
+        self.header = meta["header"]
+        self._index = {seed: i for i, seed in enumerate(self.seeds)}
+
+    def __len__(self):
+        return len(self.seeds)
+
+    def index(self, seed):
+        """Returns the index of the instance with the seed `seed`. Raises a KeyError if there is no such instance."""
+        return self._index[seed]
+
+    def file_name(self, i):
+        """Returns the file name of the i-th instance (without path)."""
+        return self.name + f"_mod_s{self.seeds[i]}_p{self.p}.cnf"
+
+    def write(self, i, f):
+        """Writes the i-th instance in DIMACS format to the binary file object `f`."""
+        seed = self.seeds[i]
+        no_of_resolvents = len(self.resolvent_clauses)
+        sampled = numpy.flatnonzero(numpy.unpackbits(self.masks[i], count=no_of_resolvents))
+
+        order = numpy.arange(len(self.original_clauses) + len(sampled))
+        if self.shuffle:
+            # Draw the same random numbers as modify_instance: first the selection, then the shuffle.
+            rng, _ = mi.select_resolvents(seed, no_of_resolvents, self.p, self.selection)
+            rng.shuffle(order)
+
+        header = mi.new_header_lines(seed, self.p, no_of_resolvents, self.original_cnf_file, self.resolvent_file, self.header, self.selection)
+        mi.write_modified_instance(f, header, self.n, self.original_clauses, self.resolvent_clauses, sampled, order)
+
+    def materialize(self, i, outputPath='./modified'):
+        """Writes the i-th instance to {outputPath}/orig_mod_s{seed}_p{p}.cnf and returns the path of the file."""
+        os.makedirs(outputPath, exist_ok=True)
+        file_name = os.path.join(outputPath, self.file_name(i))
+        with open(file_name, "wb") as f:
+            self.write(i, f)
+        return file_name
+
+
+
+#########################################################################
+######################  if __name__ == '__main__' #######################
+#########################################################################
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Creates a bundle of modified instances (as mod_instance.py does) or writes instances stored in a bundle (with -bundle).")
+    parser.add_argument("-orig", default=None, help="Specifies the path to the original cnf-file.")
+    parser.add_argument("-resolvents", default=None, help="Specifies the path the the resolvents-file from where the clauses are sampled.")
+    parser.add_argument("-seed", type=int, default=42, help="Specifies the seed to initalize the random number generator responsible for sampling the resolvents.")
+    parser.add_argument("-M", type=int, default=5000, help="Specifies how many modified instances are stored.")
+    parser.add_argument("-outputPath", default="./modified", help="Specifies the output path of the bundle or of the written instances.")
+    parser.add_argument("-p", type=float, default=None, help="Specifies the propbability for adding each resolvent.")
+    parser.add_argument("-E", type=float, default=0.1, help="Specifies the propbability for adding each resolvent w.r.t. the number of original clauses.")
+    parser.add_argument("--shuffle", default=False, action="store_true" , help="Shuffle the clauses before writing to the file.")
+    parser.add_argument("-selection", default="bernoulli", choices=mi.SELECTIONS, help="Specifies how the resolvents are sampled (standard: bernoulli).")
+    parser.add_argument("-schedule", default=None, help="Specifies a seed schedule (see seed_schedule.py) the seeds are read from.")
+    parser.add_argument("-bundle", default=None, help="Specifies the path of a bundle whose instances are written.")
+    parser.add_argument("-seeds", nargs='+', type=int, default=None, help="Specifies the seeds of the instances to write (standard: all instances).")
+    parser.add_argument("-to", default=None, help="Writes a single instance to this file or FIFO instead of the output path ('-' for stdout).")
+    parser.add_argument("--fifo", default=False, action="store_true", help="Create the FIFO given by -to before writing.")
+
+    args = parser.parse_args()
+
+    if args.bundle is None:
+        print(create_bundle(orig=args.orig, resolvents=args.resolvents, seed=args.seed, M=args.M, outputPath=args.outputPath, p=args.p, E=args.E, shuffle=args.shuffle, selection=args.selection, schedule=args.schedule))
+    else:
+        bundle = ModifiedInstanceBundle(args.bundle)
+        indices = range(len(bundle)) if args.seeds is None else [bundle.index(seed) for seed in args.seeds]
+
+        if args.to is None:
+            for i in indices:
+                bundle.materialize(i, args.outputPath)
+        else:
+            if len(indices) != 1:
+                raise ValueError("-to needs exactly one instance, use -seeds to select it.")
+            if args.to == "-":
+                bundle.write(indices[0], sys.stdout.buffer)
+            else:
+                if args.fifo and not os.path.exists(args.to):
+                    os.mkfifo(args.to)
+                # Opening a FIFO blocks until the solver opens it for reading.
+                with open(args.to, "wb") as f:
+                    bundle.write(indices[0], f)
@@ -1,10 +1,13 @@
 import random
 import os
 from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
 import numpy
 
+from seed_schedule import draw_seeds, scheduled_seeds
 
-def modify_instance(orig, resolvents, seed=42, M=5000, outputPath='./modified', p=None, E=0.1, shuffle=False):
+
+def modify_instance(orig, resolvents, seed=42, M=5000, outputPath='./modified', p=None, E=0.1, shuffle=False, workers=1, selection='bernoulli', schedule=None):
     """Repeatedly modifies a CNF with some of its resolvents and writes the file in DIMACS format.
 
     For each clause in the resolvent-file specified in `resolvents`, the function samples with
@@ -49,13 +52,31 @@ def modify_instance(orig, resolvents, seed=42, M=5000, outputPath='./modified',
         if True, all clauses (original and resolvents picked) will be shuffled before writing to the file
         (default: False)
 
+    workers : int, optional
+        the number of processes writing the files in parallel, each process writes the files of some of the seeds
+        the names and contents of the files do not depend on workers
+        (default: 1)
+
+    selection : str, optional
+        how the resolvents are sampled:
+        'bernoulli' draws one random number per resolvent (reproduces the files of earlier versions),
+        'sparse' draws the number of sampled resolvents from Binomial(n', p) and then a uniformly random subset of this size
+        (same distribution and much faster for small p, but different files for the same seed)
+        (default: 'bernoulli')
+
+    schedule : str, optional
+        the path of a seed schedule (see seed_schedule.SeedSchedule) the M seeds are read from
+        the schedule is created or extended if it holds fewer than M seeds, the files are the same as without a schedule
+        (default: None, the seeds are drawn)
+
     Raises
     ------
     TypeError
         see above
 
     ValueError
-        if M <= 0 or p <= 0 or p > 1, E <= 0
+        if M <= 0 or p <= 0 or p > 1, E <= 0, workers < 1, selection is not one of SELECTIONS,
+        the schedule was drawn with another seed
 
     See Also
     --------
@@ -86,6 +107,17 @@ def modify_instance(orig, resolvents, seed=42, M=5000, outputPath='./modified',
     if M <= 0:
         raise ValueError("M has to be positive.")
 
+    if not isinstance(workers, int):
+        raise TypeError("workers has to be of type int.")
+
+    if workers < 1:
+        raise ValueError("workers has to be positive.")
+
+    check_selection(selection)
+
+    if not isinstance(schedule, str) and schedule is not None:
+        raise TypeError("schedule has to be of type str.")
+
 
     #### Here, the actual code starts. ####
 
@@ -94,27 +126,37 @@ def modify_instance(orig, resolvents, seed=42, M=5000, outputPath='./modified',
     # Damit wären, technisch gesehen, die Zufallszahlen nicht unabhängig.
     # Das Problem wird umgangen, wenn ein Random-Objekt initialisiert wird.
 
-    rng = random.Random()
-    rng.seed(seed) 
-
-    # Iterate over the M files to be created.
+    # Draw the M seeds first (or read them from the schedule). Each file should be created with a random, independent seed.
     # Make sure no seeds are used twice.
-    used_seeds = []
-
-    for modfile in range(M):
-        # Each file should be created with a random, independent seed.
-        seed = rng.randint(1, 2**32 - 1)
+    if schedule is not None:
+        used_seeds = scheduled_seeds(schedule, seed, M)
+    else:
+        rng = random.Random()
+        rng.seed(seed)
+        used_seeds = draw_seeds(rng, M)
 
-        while seed in used_seeds: # seed was already used, try another one.
-            seed = rng.randint(1, 2**32 - 1)
+    if workers == 1:
+        # Create the M files in one batch.
+        modify_batch(orig, resolvents, used_seeds, outputPath, p, shuffle, selection)
+    else:
+        # Load the files before starting the processes. The processes share the memory-mapped files
+        # (and inherit the index of the lines if they are forked).
+        get_clause_file(orig)
+        get_clause_file(resolvents)
 
-        used_seeds.append(seed)
-        modify_single(orig, resolvents, seed, outputPath, p, E, shuffle)
+        # Each process creates the files of consecutive seeds. We use more ranges than processes to balance the load.
+        range_size = -(-M // (4 * workers))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(modify_batch, orig, resolvents, used_seeds[first:first+range_size], outputPath, p, shuffle, selection)
+                       for first in range(0, M, range_size)]
+            for future in futures:
+                # Raise the exceptions of the processes
+                future.result()
 
 
 
 
-def modify_single(orig, resolvents, seed=42, outputPath='./modified', p=None, E=0.1, shuffle=False):
+def modify_single(orig, resolvents, seed=42, outputPath='./modified', p=None, E=0.1, shuffle=False, selection='bernoulli'):
     """This function creates a single file with the filename {outputPath}/orig_mod_s{seed}_p{p}.cnf
 
     WARNING: This function should normally only be called via modify_instance (e.g. with parameter M = 1).
@@ -136,59 +178,113 @@ def modify_single(orig, resolvents, seed=42, outputPath='./modified', p=None, E=
     if p <= 0 or p > 1:
         raise ValueError("It must hold 0 < p <= 1.")
 
-    if not os.path.isdir(outputPath):
-        os.makedirs(outputPath)
+    check_selection(selection)
+
+    modify_batch(orig, resolvents, [seed], outputPath, p, shuffle, selection)
+
 
-    
-    #rng_single = random.Random()
-    #rng_single.seed(seed)
-    numpy.random.seed(seed)
 
+def modify_batch(orig, resolvents, seeds, outputPath, p, shuffle=False, selection='bernoulli'):
+    """Creates one modified instance {outputPath}/orig_mod_s{seed}_p{p}.cnf for each seed in `seeds`.
+
+    The file for a seed is the same as if it was created by `modify_single` with this seed:
+    The resolvents are sampled by `select_resolvents` (see sample_selections).
+    The files are loaded and the header is calculated only once for all seeds.
+
+    WARNING: The parameters are not checked, call modify_instance instead.
+
+    Parameters
+    ----------
+    orig, resolvents, outputPath, shuffle, selection
+        as in `modify_instance`
+
+    seeds : list of int
+        the seeds of the modified instances
+
+    p : float
+        the probability for adding each resolvent (has to be given, see calculate_standard_p_value)
+    """
 
-    # TODO: Doppelt
     # Make sure, the folder to save the output-files exists.
-    # If the folder already exists, it will be overwritten.
     os.makedirs(outputPath, exist_ok=True)
 
-    # Get the DIMACS lines of the original file.
-    original_clauses = get_clauses(orig)
+    # Get the clause lines of the original file and of the resolvents-file (both are only loaded once).
+    original_clauses = get_clause_file(orig)
+    resolvent_clauses = get_clause_file(resolvents)
+
+    # The header only differs in the seed.
+    n = get_parameter_line_from_cnf_file(orig).split(" ")[2]
+    file_prefix = outputPath + "/" + get_file_name_without_path_without_extension(orig)
 
-    # Get the contents of the resolvents-file.
-    resolvent_clauses = get_clauses(resolvents)
+    for seed, rng, sampled in sample_selections(seeds, len(resolvent_clauses), p, selection):
+        # Combine all clauses and maybe shuffle.
+        order = numpy.arange(len(original_clauses) + len(sampled))
+        if shuffle:
+            # Shuffling the positions consumes the same random numbers as shuffling the list of lines.
+            rng.shuffle(order)
 
-    # Sample the clauses.
-    sampled_clauses = []
-    randoms = numpy.random.rand(len(resolvent_clauses))
-    zipped_list = filter(lambda x: x[0] < p, zip(randoms.tolist(), resolvent_clauses))
-    for _, res in zipped_list:
-        sampled_clauses.append(res)
+        new_header = generate_new_header_up_to_p_line(orig, resolvents, seed, p, selection)
+        file_name = file_prefix + f"_mod_s{seed}_p{p}.cnf"
+        with open(file_name, "wb") as f:
+            write_modified_instance(f, new_header, n, original_clauses, resolvent_clauses, sampled, order)
 
-    # Calculate the content of the file
-    new_header = generate_new_header_up_to_p_line(orig, resolvents, seed, p)
 
-    file_name = outputPath + "/" + get_file_name_without_path_without_extension(orig) + f"_mod_s{seed}_p{p}.cnf"
 
-    f = open(file_name, "w")
+def sample_selections(seeds, no_of_resolvents, p, selection='bernoulli'):
+    """Yields (seed, rng, sampled) for each seed in `seeds`, where sampled is the sorted array of the indices of the sampled resolvents
+    and rng is the random number generator which sampled them (further random numbers, e.g. for shuffling, have to be drawn from rng).
+    The resolvents of each seed are sampled by `select_resolvents` when the seed is reached,
+    i.e. only the random numbers of one seed are in memory at once.
+    """
 
-    for line in new_header:
-        f.write(line.rstrip()+"\n")
+    for seed in seeds:
+        rng, sampled = select_resolvents(seed, no_of_resolvents, p, selection)
+        yield seed, rng, sampled
 
-    # Calculate the p-line
-    n = get_parameter_line_from_cnf_file(orig).split(" ")[2]
-    no_of_orig_clauses = len(get_clauses(orig))
 
-    f.write(f"p cnf {n} {no_of_orig_clauses + len(sampled_clauses)}\n")
 
-    # Combine all clauses, maybe shuffle, and write to file
-    all_clauses = original_clauses + sampled_clauses
+def select_resolvents(seed, no_of_resolvents, p, selection='bernoulli'):
+    """Samples each of the no_of_resolvents resolvents with probability p for the modified instance with the seed `seed`.
+    Returns the random number generator and the sorted array of the indices of the sampled resolvents.
 
-    if shuffle:
-        numpy.random.shuffle(all_clauses)
+    'bernoulli': compares numpy.random.rand(no_of_resolvents) with p (the generator is a numpy.random.RandomState).
+    'sparse': draws the number of sampled resolvents from Binomial(no_of_resolvents, p) and then
+    this many distinct indices uniformly at random (the generator is numpy.random.default_rng(seed)).
+    This gives the same distribution, but the time only depends on the number of sampled resolvents (not on no_of_resolvents).
+    """
+
+    if selection == "sparse":
+        rng = numpy.random.default_rng(seed)
+        count = rng.binomial(no_of_resolvents, p)
+        sampled = numpy.sort(rng.choice(no_of_resolvents, size=count, replace=False))
+    else:
+        rng = numpy.random.RandomState(seed)
+        sampled = numpy.flatnonzero(rng.random_sample(no_of_resolvents) < p)
+    return rng, sampled
+
+
+
+def write_modified_instance(f, header, n, original_clauses, resolvent_clauses, sampled, order):
+    """Writes the header, the p-line and the clauses of the original file plus the resolvents with the indices `sampled`
+    to the binary file object `f`, the i-th clause is written at the position order[i].
+    The clauses are not copied line by line, we only compute the position of each line in the new file.
+    """
 
-    for clause in all_clauses:
-        f.write(clause.rstrip()+"\n")
+    no_of_all_clauses = len(original_clauses) + len(sampled)
 
-    f.close()
+    for line in header:
+        f.write((line.rstrip()+"\n").encode())
+
+    # Calculate the p-line
+    f.write(f"p cnf {n} {no_of_all_clauses}\n".encode())
+
+    lengths = numpy.concatenate((original_clauses.lengths, resolvent_clauses.lengths[sampled]))
+    positions = numpy.empty(no_of_all_clauses, dtype=numpy.int64)
+    positions[order] = numpy.cumsum(lengths[order]) - lengths[order]
+    body = numpy.empty(int(lengths.sum()), dtype=numpy.uint8)
+    original_clauses.copy_lines(body, positions[:len(original_clauses)])
+    resolvent_clauses.copy_lines(body, positions[len(original_clauses):], sampled)
+    f.write(body.tobytes())
 
 
 
@@ -197,6 +293,16 @@ def modify_single(orig, resolvents, seed=42, outputPath='./modified', p=None, E=
 #########################################################################
 
 
+# The available methods to sample the resolvents (see the parameter `selection` of modify_instance).
+SELECTIONS = ["bernoulli", "sparse"]
+
+
+def check_selection(selection):
+    """Raises a ValueError if `selection` is not one of SELECTIONS."""
+    if selection not in SELECTIONS:
+        raise ValueError("selection has to be one of {}.".format(", ".join(SELECTIONS)))
+
+
 def check_non_M_and_p_parameters(orig, resolvents, seed, outputPath, shuffle):
     """This function will be called by the functions modify_single and modify_instance to check all non-M-related parameters."""
 
@@ -236,8 +342,8 @@ def calculate_standard_p_value(p, orig, resolvents, E=0.1):
     """
 
     if p is None:       
-        no_of_orig_clauses = len(get_clauses(orig))
-        no_of_resolvents = len(get_clauses(resolvents))    
+        no_of_orig_clauses = len(get_clause_file(orig))
+        no_of_resolvents = len(get_clause_file(resolvents))
         return min(no_of_orig_clauses / no_of_resolvents * E, 1.0)
     else:
         return p 
@@ -263,15 +369,102 @@ def get_parameter_line_from_cnf_file(filepath):
 
 
 @lru_cache(maxsize=100)
-def get_clauses(filepath):
-    with open(filepath, 'r') as f:
-            lines = f.readlines()
-    clauses = []
-    for line in lines:
-        if not (line.startswith("c") or line.startswith("p")):
-            clauses.append(line)
+def get_clause_file(filepath):
+    """Returns the ClauseFile of a specified file. Each file is only loaded once."""
+    return ClauseFile(filepath)
+
+
+
+# The bytes which str.rstrip() removes from the end of a DIMACS line.
+WHITESPACE = numpy.array([ord(c) for c in " \t\n\r\x0b\x0c"], dtype=numpy.uint8)
 
-    return clauses
+
+class ClauseFile:
+    """The clause lines of a DIMACS (or resolvents) file, i.e. all lines not starting with 'c' or 'p'.
+
+    The file is memory-mapped and the start and length of each clause line are indexed in NumPy arrays,
+    so no Python object per line is created. Each line (including its newline) can be copied
+    as a byte range. If some lines end with whitespace or the last line has no newline,
+    a normalized copy of the clause lines (as written by `line.rstrip()+"\n"`) is kept in memory instead.
+    """
+
+    def __init__(self, filepath):
+        if os.path.getsize(filepath) > 0:
+            data = numpy.memmap(filepath, dtype=numpy.uint8, mode='r')
+        else:
+            data = numpy.zeros(0, dtype=numpy.uint8)
+
+        # Index the lines: line i is data[starts[i]:ends[i]], ends[i] includes the newline (if any).
+        ends = numpy.flatnonzero(data == ord("\n")) + 1
+        if len(data) > 0 and data[-1] != ord("\n"):
+            ends = numpy.append(ends, len(data))
+        starts = numpy.concatenate(([0], ends[:-1])).astype(numpy.int64)
+
+        # Only keep the clause lines.
+        first_bytes = data[starts] if len(data) > 0 else data
+        is_clause = (first_bytes != ord("c")) & (first_bytes != ord("p"))
+        starts = starts[is_clause]
+        ends = ends[is_clause]
+
+        # Strip trailing whitespace (and the newline) from each line.
+        stripped_ends = ends.copy()
+        trailing = stripped_ends > starts
+        while trailing.any():
+            trailing[trailing] = numpy.isin(data[stripped_ends[trailing] - 1], WHITESPACE)
+            stripped_ends[trailing] -= 1
+            trailing &= stripped_ends > starts
+
+        if numpy.array_equal(stripped_ends + 1, ends):
+            # All lines are normalized, the bytes of the file can be copied directly.
+            self.data = data
+            self.starts = starts
+            self.lengths = ends - starts
+        else:
+            lengths = stripped_ends - starts + 1
+            positions = numpy.cumsum(lengths) - lengths
+            self.data = numpy.full(int(lengths.sum()), ord("\n"), dtype=numpy.uint8)
+            copy_ranges(self.data, positions, data, starts, lengths - 1)
+            self.starts = positions
+            self.lengths = lengths
+
+    @classmethod
+    def from_lines(cls, data):
+        """Returns a ClauseFile of the normalized clause lines (each ending with a newline) stored one after another in the uint8 array `data`."""
+        clause_file = cls.__new__(cls)
+        ends = numpy.flatnonzero(data == ord("\n")) + 1
+        clause_file.data = data
+        # Line i starts at the end of line i-1 (no line for empty data).
+        clause_file.starts = numpy.concatenate(([0], ends))[:-1].astype(numpy.int64)
+        clause_file.lengths = ends - clause_file.starts
+        return clause_file
+
+    def __len__(self):
+        return len(self.starts)
+
+    def copy_lines(self, out, positions, lines=None):
+        """Copies the clause lines with the indices `lines` (default: all lines) to the uint8 array `out`,
+        line lines[i] starts at out[positions[i]].
+        """
+        if lines is None:
+            copy_ranges(out, positions, self.data, self.starts, self.lengths)
+        else:
+            copy_ranges(out, positions, self.data, self.starts[lines], self.lengths[lines])
+
+
+
+def copy_ranges(out, out_starts, data, starts, lengths):
+    """Copies the byte ranges data[starts[i]:starts[i]+lengths[i]] to out[out_starts[i]:out_starts[i]+lengths[i]]."""
+    total = int(lengths.sum())
+    if total == 0:
+        return
+    ends = starts + lengths
+    if numpy.array_equal(starts[1:], ends[:-1]) and numpy.array_equal(out_starts[1:], out_starts[:-1] + lengths[:-1]):
+        # The ranges are consecutive in data and in out (e.g. all lines of a file in the same order).
+        out[out_starts[0]:out_starts[0]+total] = data[starts[0]:starts[0]+total]
+        return
+    # Index of each byte within its range.
+    offsets = numpy.arange(total) - numpy.repeat(numpy.cumsum(lengths) - lengths, lengths)
+    out[numpy.repeat(out_starts, lengths) + offsets] = data[numpy.repeat(starts, lengths) + offsets]
 
 
 
@@ -280,21 +473,31 @@ def get_file_name_without_path_without_extension(path):
 
 
 
-def generate_new_header_up_to_p_line(origFile, resFile, seed, p):
+def generate_new_header_up_to_p_line(origFile, resFile, seed, p, selection='bernoulli'):
     # TODO: Problems: What if the extensions are different.
     # TODO: What if a file uses two dots?
 
-    no_of_resolvents = len(get_clauses(resFile))
+    no_of_resolvents = len(get_clause_file(resFile))
     original_cnf_file = get_file_name_without_path_without_extension(origFile) + ".cnf"
     resolvent_file = get_file_name_without_path_without_extension(resFile) + ".resolvents"
 
+    return new_header_lines(seed, p, no_of_resolvents, original_cnf_file, resolvent_file, get_header(origFile)[:-1], selection)
+
+
+
+def new_header_lines(seed, p, no_of_resolvents, original_cnf_file, resolvent_file, orig_header, selection='bernoulli'):
+    """Returns the header of a modified instance (without the p-line), orig_header are the comment lines of the original file."""
+
+    # The sparse selection gives different files for the same seed, so it is stated in the header.
+    selection_note = " (sparse selection)" if selection == "sparse" else ""
+
     new_header = ["c Modified by xyzFancyModifier\n",
-    f"c Used with seed {seed} and p {p}\n",
+    f"c Used with seed {seed} and p {p}{selection_note}\n",
     f"c Sampled from {no_of_resolvents} resolvents\n",
     f"c Original cnf file {original_cnf_file}\n",
     f"c Resolvent file {resolvent_file}\n"]
 
-    for entry in get_header(origFile)[:-1]:
+    for entry in orig_header:
         new_header.append(entry)
 
     return new_header
@@ -316,7 +519,10 @@ if __name__ == '__main__':
     parser.add_argument("-p", type=float, default=None, help="Specifies the propbability for adding each resolvent.")
     parser.add_argument("-E", type=float, default=0.1, help="Specifies the propbability for adding each resolvent w.r.t. the number of original clauses.")
     parser.add_argument("--shuffle", default=False, action="store_true" , help="Shuffle the clauses before writing to the file.")
+    parser.add_argument("-workers", type=int, default=1, help="Specifies how many processes write the files in parallel.")
+    parser.add_argument("-selection", default="bernoulli", choices=SELECTIONS, help="Specifies how the resolvents are sampled (standard: bernoulli).")
+    parser.add_argument("-schedule", default=None, help="Specifies a seed schedule (see seed_schedule.py) the seeds are read from.")
 
     args = parser.parse_args()
 
-    modify_instance(orig=args.orig, resolvents=args.resolvents, seed=args.seed, M=args.M, outputPath=args.outputPath, p=args.p, E=args.E, shuffle=args.shuffle)
\ No newline at end of file
+    modify_instance(orig=args.orig, resolvents=args.resolvents, seed=args.seed, M=args.M, outputPath=args.outputPath, p=args.p, E=args.E, shuffle=args.shuffle, workers=args.workers, selection=args.selection, schedule=args.schedule)
\ No newline at end of file
@@ -2,16 +2,21 @@
 # Import standard python modules
 import random
 import itertools
+import math
+
+# Import third-party modules
+import numpy
 
 # Import own modules
-from hash_clauses import hash_clause
+from hash_clauses import hash_clause, ClauseHashSet
 
 
 
-def unfair_coin_flip(p):
+def unfair_coin_flip(p, rng=random):
     """Given a float p in the range [0,1), this function will return True with probability p, and False otherwise.
+    The random number is drawn from rng (standard: the global random number generator).
     """
-    return True if random.random() < p else False
+    return True if rng.random() < p else False
     # random.random() returns a uniformly distributed pseudo-random floating point number in the range [0, 1).
     # This number is less than a given number p in the range [0,1) with probability p.
 
@@ -24,34 +29,38 @@ def number_of_satisfied_literals(clause, assignment):
     return sum(satisfied_lits)
 
     
-def sample_clauses(k, n, m, hidden_solution, s, p):
+def sample_clauses(k, n, m, hidden_solution, s, p, rng=None, mapping=None):
     """Create a sampled list of m clauses of width k with with variables 1,...,n,
     that are satisfied by the hidden_solution and are added to the list according
     to the list p (where the i-th entry specifies the probability that a clause
     with i satisfied literals under the hidden_solution gets added to the list).
+
+    The clauses are drawn from rng (standard: a new random.Random object seeded with s)
+    and duplicates are detected with the variable mapping `mapping` (standard: the module-wide
+    mapping of hash_clauses). No global state is changed, so several formulas can be sampled concurrently.
     """ 
 
-    random.seed(s)
+    if rng is None:
+        rng = random.Random(s)
 
     clauses = []
     
     highestvariablecreated = 0
 
     variableset = set()
-    clause_hash_set = set()
+    clause_hash_set = ClauseHashSet() # duplicates are detected exactly (hits are verified)
     
     while len(clauses) < m:
-        clause = tuple((random.choice([True,False]),i)
-                       for i in random.sample(range(1,n+1),k))        
+        clause = tuple((rng.choice([True,False]),i)
+                       for i in rng.sample(range(1,n+1),k))        
 
         i = number_of_satisfied_literals(clause, hidden_solution)
 
-        if i > 0 and unfair_coin_flip(p[i-1]) == True:
-            hash_value = hash_clause(clause)
-            if hash_value in clause_hash_set:
+        if i > 0 and unfair_coin_flip(p[i-1], rng) == True:
+            hash_value = hash_clause(clause, mapping)
+            if not clause_hash_set.add(clause, hash_value):
                 continue # clause is already present            
 
-            clause_hash_set.add(hash_value)
             maxtupel = max(clause, key = lambda x: x[1])
 
             if maxtupel[1] > highestvariablecreated:
@@ -63,3 +72,274 @@ def sample_clauses(k, n, m, hidden_solution, s, p):
             clauses.append(clause)
 
     return variableset, clauses
+
+
+def expected_acceptance_rate(k, p):
+    """Returns the probability that a uniformly drawn clause of width k is accepted
+    with respect to the list p, i.e. sum_i binom(k, i) / 2^k * p_i.
+    """
+    return sum(math.comb(k, i) * p[i-1] for i in range(1, k+1)) / 2**k
+
+
+def hidden_solution_array(n, hidden_solution):
+    """Returns a boolean array of length n+1 whose entry var is the truth value of var under the hidden_solution."""
+    hidden = numpy.zeros(n+1, dtype=bool)
+    for var, value in hidden_solution.items():
+        hidden[var] = value
+    return hidden
+
+
+def append_new_clauses(clauses, literals):
+    """Appends the rows of `literals` to the (m, k) array `clauses`, skipping duplicate clauses
+    (the order of the literals does not matter).
+    The first occurrence of each clause is kept, so earlier clauses are never replaced.
+    """
+    k = clauses.shape[1]
+    candidates = numpy.concatenate((clauses, literals))
+    keys = numpy.ascontiguousarray(numpy.sort(candidates, axis=1))
+    keys = keys.view(numpy.dtype((numpy.void, keys.dtype.itemsize * k))).ravel()
+    _, first = numpy.unique(keys, return_index=True)
+    first.sort()
+    return candidates[first]
+
+
+def satisfied_literal_distribution(k, p):
+    """Returns the distribution of the number i of satisfied literals of the clauses added by `sample_clauses`.
+
+    A uniformly drawn clause of width k has i satisfied literals with probability binom(k, i) / 2^k
+    and is accepted with probability p_i. Thus, the accepted clauses have i satisfied literals
+    with probability binom(k, i) * p_i / sum_j binom(k, j) * p_j.
+    The returned array has length k+1 (the entry 0 is always 0).
+    """
+    weights = numpy.array([0.0] + [math.comb(k, i) * float(p[i-1]) for i in range(1, k+1)])
+    return weights / weights.sum()
+
+
+def sample_clauses_batch(k, n, m, hidden_solution, s, p, batch_size=None):
+    """Vectorized version of `sample_clauses`.
+
+    Instead of drawing one clause at a time, whole blocks of candidate clauses are drawn as
+    NumPy arrays. The number of satisfied literals w.r.t. the hidden_solution, the acceptance
+    according to the list p and the removal of duplicate clauses are carried out as array operations.
+    The distribution of the sampled formula is the same as for `sample_clauses`,
+    but the formula itself differs for the same seed s (use `sample_clauses` if the
+    formulas of earlier versions have to be reproduced exactly).
+
+    Parameters
+    ----------
+    k, n, m, hidden_solution, s, p
+        as in `sample_clauses`
+
+    batch_size : int, optional
+        number of candidate clauses drawn per block
+        (default: estimated from m and the expected acceptance rate)
+
+    Returns
+    -------
+    variableset : set of int
+        the variables occurring in the clauses
+
+    clauses : numpy.ndarray
+        an (m, k) array; each row is a clause given by its signed literals
+    """
+
+    rng = numpy.random.default_rng(s)
+
+    # hidden[var] is the truth value of var under the hidden solution.
+    hidden = hidden_solution_array(n, hidden_solution)
+
+    # acceptance[i] is the probability to add a clause with i satisfied literals.
+    # Clauses without any satisfied literal are never added.
+    acceptance = numpy.array([0.0] + [float(value) for value in p])
+    rate = expected_acceptance_rate(k, p)
+
+    clauses = numpy.empty((0, k), dtype=numpy.int64)
+
+    while len(clauses) < m:
+        if batch_size is None:
+            # Draw enough candidates to (most likely) finish in one round, but bound the memory used.
+            missing = m - len(clauses)
+            size = min(max(int(1.2 * missing / rate) + 1024, 1024), 2**22)
+        else:
+            size = batch_size
+
+        variables = rng.integers(1, n+1, size=(size, k))
+        polarities = rng.integers(0, 2, size=(size, k)).astype(bool)
+        coins = rng.random(size)
+
+        # As in random.sample, the k variables of a clause have to be distinct.
+        sorted_variables = numpy.sort(variables, axis=1)
+        distinct = numpy.all(sorted_variables[:, 1:] != sorted_variables[:, :-1], axis=1)
+
+        satisfied = numpy.sum(polarities == hidden[variables], axis=1)
+        accepted = distinct & (coins < acceptance[satisfied])
+
+        literals = numpy.where(polarities, variables, -variables)[accepted]
+        clauses = append_new_clauses(clauses, literals)
+
+    clauses = clauses[:m]
+    variableset = set(numpy.unique(numpy.abs(clauses)).tolist())
+
+    return variableset, clauses
+
+
+def sample_clauses_direct(k, n, m, hidden_solution, s, p, batch_size=None):
+    """Rejection-free version of `sample_clauses_batch`.
+
+    Instead of drawing uniform clauses and accepting them with probability p_i, the number i of
+    satisfied literals is drawn first from the distribution of the accepted clauses
+    (see `satisfied_literal_distribution`). Then, k distinct variables are drawn uniformly
+    and exactly i of them (at random positions) get the polarity of the hidden solution.
+    This gives the same distribution of clauses as `sample_clauses`, but no clause is rejected
+    because of the p-values, so the time needed does not depend on p.
+    Only duplicate clauses and clauses with repeated variables are drawn again.
+
+    Parameters
+    ----------
+    k, n, m, hidden_solution, s, p
+        as in `sample_clauses`
+
+    batch_size : int, optional
+        number of candidate clauses drawn per block
+        (default: the number of missing clauses, bounded by 2^22)
+
+    Returns
+    -------
+    variableset : set of int
+        the variables occurring in the clauses
+
+    clauses : numpy.ndarray
+        an (m, k) array; each row is a clause given by its signed literals
+    """
+
+    rng = numpy.random.default_rng(s)
+
+    # hidden[var] is the truth value of var under the hidden solution.
+    hidden = hidden_solution_array(n, hidden_solution)
+    distribution = satisfied_literal_distribution(k, p)
+
+    clauses = numpy.empty((0, k), dtype=numpy.int64)
+
+    while len(clauses) < m:
+        if batch_size is None:
+            missing = m - len(clauses)
+            size = min(max(int(1.1 * missing) + 1024, 1024), 2**22)
+        else:
+            size = batch_size
+
+        satisfied = rng.choice(k+1, size=size, p=distribution)
+        variables = rng.integers(1, n+1, size=(size, k))
+
+        # The positions of the satisfied literals are uniformly distributed:
+        # position j is satisfied if its rank among k random numbers is smaller than i.
+        ranks = numpy.argsort(numpy.argsort(rng.random((size, k)), axis=1), axis=1)
+        agree = ranks < satisfied[:, None]
+        polarities = agree == hidden[variables]
+
+        # As in random.sample, the k variables of a clause have to be distinct.
+        sorted_variables = numpy.sort(variables, axis=1)
+        distinct = numpy.all(sorted_variables[:, 1:] != sorted_variables[:, :-1], axis=1)
+
+        literals = numpy.where(polarities, variables, -variables)[distinct]
+        clauses = append_new_clauses(clauses, literals)
+
+    clauses = clauses[:m]
+    variableset = set(numpy.unique(numpy.abs(clauses)).tolist())
+
+    return variableset, clauses
+
+
+def repair_generator(s):
+    """Returns the random number generator for `repair_coverage` after the clauses were sampled with the seed `s`.
+
+    The samplers use numpy.random.default_rng(s). The repair gets its own stream (seeded with [s, 1]),
+    otherwise its draws would repeat the first draws of the sampler and the new clauses would be
+    correlated with the sampled ones.
+    """
+    return numpy.random.default_rng([s, 1])
+
+
+def repair_coverage(k, n, clauses, hidden_solution, p, rng):
+    """Replaces clauses until every variable 1,...,n occurs in the formula.
+
+    For every unused variable v, a clause containing v and k-1 further distinct variables
+    chosen uniformly at random is sampled (and accepted according to the list p, as in `sample_clauses`).
+    Thus, it is drawn from the same distribution as the other clauses conditioned on containing v.
+    The new clause replaces a randomly chosen clause whose removal does not leave a variable unused.
+    Instead of discarding all clauses and sampling a new formula, only few clauses are exchanged.
+
+    Parameters
+    ----------
+    k, n, hidden_solution, p
+        as in `sample_clauses`
+
+    clauses : numpy.ndarray
+        an (m, k) array of clauses given by their signed literals (as returned by `sample_clauses_batch`)
+
+    rng : numpy.random.Generator
+        the random number generator used for sampling and choosing the replaced clauses,
+        it has to be independent of the generator the clauses were sampled with (see `repair_generator`)
+
+    Returns
+    -------
+    clauses : numpy.ndarray
+        the repaired (m, k) array
+
+    repairs : int
+        the number of replaced clauses
+
+    Raises
+    ------
+    ValueError
+        if the m clauses cannot contain all n variables
+    """
+
+    clauses = numpy.array(clauses, dtype=numpy.int64)
+    m = len(clauses)
+
+    if m*k < n:
+        raise ValueError("The clauses cannot contain all variables.")
+
+    hidden = hidden_solution_array(n, hidden_solution)
+
+    occurrences = numpy.bincount(numpy.abs(clauses).ravel(), minlength=n+1)
+    present = set(tuple(sorted(clause)) for clause in clauses.tolist())
+    missing = (numpy.flatnonzero(occurrences[1:] == 0) + 1).tolist()
+    repairs = 0
+
+    while missing:
+        v = missing[-1]
+        if occurrences[v] > 0:
+            # v was covered by an earlier new clause.
+            missing.pop()
+            continue
+
+        # Draw k-1 distinct variables different from v.
+        others = rng.choice(n-1, size=k-1, replace=False) + 1
+        others[others >= v] += 1
+        variables = numpy.concatenate(([v], others))
+        polarities = rng.integers(0, 2, size=k).astype(bool)
+
+        i = int(numpy.sum(polarities == hidden[variables]))
+        if i == 0 or not rng.random() < p[i-1]:
+            continue
+
+        clause = numpy.where(polarities, variables, -variables)
+        key = tuple(sorted(clause.tolist()))
+        if key in present:
+            continue # clause is already present
+
+        # Only clauses whose variables all occur at least twice can be removed.
+        removable = numpy.flatnonzero(numpy.all(occurrences[numpy.abs(clauses)] >= 2, axis=1))
+        if len(removable) == 0:
+            raise ValueError("The clauses cannot contain all variables.")
+        j = rng.choice(removable)
+
+        present.remove(tuple(sorted(clauses[j].tolist())))
+        occurrences[numpy.abs(clauses[j])] -= 1
+        clauses[j] = clause
+        present.add(key)
+        occurrences[variables] += 1
+        repairs += 1
+
+    return clauses, repairs
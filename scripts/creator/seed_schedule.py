@@ -0,0 +1,130 @@
+import json
+import random
+import os
+
+
+# The seeds are drawn uniformly from {SEED_MIN, ..., SEED_MAX}.
+SEED_MIN = 1
+SEED_MAX = 2**32 - 1
+
+
+def draw_seeds(rng, count, used=None):
+    """Draws `count` distinct seeds with rng.randint(SEED_MIN, SEED_MAX) and returns them as a list.
+
+    A seed which was already drawn (or is contained in the set `used`) is replaced by the next random seed.
+    This gives the same seeds as checking a list of the used seeds, but each check takes constant time.
+
+    Parameters
+    ----------
+    rng : random.Random
+        the random number generator the seeds are drawn from
+
+    count : int
+        the number of seeds
+
+    used : set of int, optional
+        seeds which must not be drawn, the new seeds are added to this set
+        (default: an empty set)
+    """
+
+    if used is None:
+        used = set()
+
+    seeds = []
+    for i in range(count):
+        seed = rng.randint(SEED_MIN, SEED_MAX)
+        while seed in used: # seed was already used, try another one.
+            seed = rng.randint(SEED_MIN, SEED_MAX)
+        used.add(seed)
+        seeds.append(seed)
+
+    return seeds
+
+
+class SeedSchedule:
+    """A deterministic sequence of distinct seeds which is drawn from random.Random(seed).
+
+    The first M seeds are the seeds used by mod_instance.modify_instance(..., seed=seed, M=M).
+    The schedule can be extended, saved to a file and loaded again, later seeds continue the same sequence.
+    """
+
+    def __init__(self, seed=42):
+        self.seed = seed
+        self.seeds = []
+        self._rng = random.Random()
+        self._rng.seed(seed)
+        self._used = set()
+
+    def __len__(self):
+        return len(self.seeds)
+
+    def extend(self, count):
+        """Draws the next `count` seeds of the sequence and returns them."""
+        new_seeds = draw_seeds(self._rng, count, self._used)
+        self.seeds.extend(new_seeds)
+        return new_seeds
+
+    def save(self, path):
+        """Writes the schedule (the initial seed, the seeds and the state of the random number generator) as JSON to the file `path`.
+        The file is replaced atomically."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            json.dump({"seed": self.seed, "seeds": self.seeds, "state": self._rng.getstate()}, f)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path):
+        """Reads a schedule written by `save`.
+
+        The state of the random number generator is restored (the seeds are not drawn again), so the loaded schedule
+        continues the sequence. Raises a ValueError if the file is not a schedule.
+        """
+        with open(path, "r") as f:
+            try:
+                content = json.load(f)
+                seed, seeds, (version, internal_state, gauss_next) = content["seed"], content["seeds"], content["state"]
+            except (ValueError, KeyError, TypeError) as e:
+                raise ValueError(f"{path} is not a seed schedule.") from e
+
+        schedule = cls(seed)
+        schedule.seeds = seeds
+        schedule._used = set(seeds)
+        if len(schedule._used) != len(seeds):
+            raise ValueError(f"The seeds in {path} are not distinct.")
+        schedule._rng.setstate((version, tuple(internal_state), gauss_next))
+        return schedule
+
+
+
+def scheduled_seeds(path, seed, count):
+    """Returns the first `count` seeds of the SeedSchedule with the seed `seed` stored in the file `path`
+    (the same seeds as draw_seeds(random.Random(seed), count)).
+
+    If the file does not exist, the schedule is created. If it contains fewer seeds, it is extended.
+    In both cases, it is saved to `path`. Raises a ValueError if the schedule in `path` was drawn with another seed.
+    """
+    if os.path.isfile(path):
+        schedule = SeedSchedule.load(path)
+        if schedule.seed != seed:
+            raise ValueError(f"The schedule in {path} was drawn with the seed {schedule.seed}.")
+    else:
+        schedule = SeedSchedule(seed)
+    if len(schedule) < count:
+        schedule.extend(count - len(schedule))
+        schedule.save(path)
+    return schedule.seeds[:count]
+
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-seed", type=int, default=42, help="Specifies the seed to initalize the random number generator.")
+    parser.add_argument("-M", type=int, default=5000, help="Specifies how many seeds are drawn.")
+    parser.add_argument("-o", default="./seeds.json", help="Specifies the file the schedule is written to. An existing schedule is extended to M seeds.")
+
+    args = parser.parse_args()
+
+    scheduled_seeds(args.o, args.seed, args.M)
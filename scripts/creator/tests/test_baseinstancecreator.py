@@ -438,6 +438,36 @@ class TestBaseInstanceCreator(unittest.TestCase):
                 self.assertTrue(filecmp.cmp(orgfile, copyfile))   
 
 
+    def test_parallel_generation(self):
+        print(sys._getframe(  ).f_code.co_name)
+        # Check if the parallel generation creates exactly the same files as the serial generation.
+        ns = [50, 100]
+        r = 4.1
+        N = 6
+        s = 1234
+
+        c.create_instances(ns=ns, r=r, N=N, s=s, o=tmpfolder)
+        c.create_instances(ns=ns, r=r, N=N, s=s, o=tmpcopyfolder, workers=4)
+
+        for n in ns:
+            path = os.path.join(tmpfolder, f"n{n}")
+            copypath = os.path.join(tmpcopyfolder, f"n{n}")
+            files = sorted(os.listdir(path))
+            self.assertEqual(files, sorted(os.listdir(copypath)))
+            self.assertEqual(len(files), N)
+            for file_ in files:
+                lines = self.get_header(os.path.join(path, file_), 2000)
+                copylines = self.get_header(os.path.join(copypath, file_), 2000)
+                # The call line contains the output path, which differs.
+                self.assertEqual(lines[:1] + lines[2:], copylines[:1] + copylines[2:])
+
+        # Check if invalid numbers of workers get rejected
+        with self.assertRaises(TypeError):
+            c.create_instances(ns=ns, r=r, workers=2.0)
+        with self.assertRaises(ValueError):
+            c.create_instances(ns=ns, r=r, workers=0)
+
+
     def test_q_given_correct_ps_calculated(self):
         print(sys._getframe(  ).f_code.co_name)
         # Test if, given a q, the ps list gets calculated correctly.
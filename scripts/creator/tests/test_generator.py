@@ -1,9 +1,11 @@
 # This file contains the unit test for the script `generator.py`.
 
 import unittest
+from unittest.mock import patch
 import os, glob
 import filecmp
 from shutil import rmtree, copy2
+from concurrent.futures import ThreadPoolExecutor
 from scipy.stats import chisquare
 
 import sys
@@ -13,6 +15,10 @@ sys.path.append(BASE_PATH)
 from random import randint, seed, uniform
 
 import generator as g
+import cnfformula
+import sample_clauses
+import hash_clauses
+import numpy
 
 # Specify the folderpaths used during testing
 tmpfolder = "./tmp_test"
@@ -398,20 +404,22 @@ class TestGenerator(unittest.TestCase):
 		o = tmpfolder
 		path = os.path.join(o, self.calculate_file_name(n, m, k=k, s=s))
 		g.main(n, m, k=k, p=p, s=s, o=o)
-		header = self.get_header(path, 6)
+		header = self.get_header(path, 7)
 		# The header should have the following form:
 		#   "c This file was generated by _"
 		#   "c Created by calling python3 generator.py -n 2222 -m 6666 -k 2 -p 0.16 0.32 -s 16 -o ./tmp_test"
 		#   "c Hidden solution: pos.int pos.int pos.int ..."
 		#   "c p-values 0.16 0.32"
+		#   "c Sampling attempts: pos.int"
 		#   "p cnf 2222 6666"
 		#   "'int' 'int' 0"
 		self.assertRegex(header[0], "^c This file was generated by[\w\s\.]+\n$")
 		self.assertRegex(header[1], f"^c Created by calling python3 generator\.py -n {n} -m {m} -k {k} -p 0\.16 0\.32 -s {s} -o {tmpfolder}\n$")
 		self.assertRegex(header[2], "^c Hidden solution: ([\d]+ )*[\d]+\n$")
 		self.assertRegex(header[3], "^c p-values 0\.16 0\.32\n$")
-		self.assertRegex(header[4], "^p cnf 2222 10000\n$")
-		self.assertRegex(header[5], "^(-?[1-9][\d]* ){2}0\n$")
+		self.assertRegex(header[4], "^c Sampling attempts: [1-9][\d]*\n$")
+		self.assertRegex(header[5], "^p cnf 2222 10000\n$")
+		self.assertRegex(header[6], "^(-?[1-9][\d]* ){2}0\n$")
 		
 
 		# We also check the case where a hidden solution was delivered.
@@ -422,20 +430,22 @@ class TestGenerator(unittest.TestCase):
 		F = './hidden.solution'
 		path =  os.path.join('./', self.calculate_file_name(n, m, k=k, s=s))
 		g.main(n, m, k=k, s=s, F=F)
-		header = self.get_header(path, 6)
+		header = self.get_header(path, 7)
 		# The header should have the following form:
 		#   "c This file was generated by _"
 		#   "c Created by calling python3 generator.py -n 1010 -m 4312 -k 3 -s 166 -F ./hidden.solution"
 		#   "c Hidden solution: 1 3 5 ... 99"
 		#   "c p-values 1.00 1.00 1.00"
+		#   "c Sampling attempts: pos.int"
 		#   "p cnf 1010 4312"
 		#   "'int' 'int' 'int' 0"
 		self.assertRegex(header[0], "^c This file was generated by[\w\s\.]+\n$")
 		self.assertRegex(header[1], f"^c Created by calling python3 generator\.py -n {n} -m {m} -k {k} -s {s} -F \./hidden\.solution\n$")
 		# The hidden solution will be checked in the next block of code.
 		self.assertRegex(header[3], "^c p-values 1\.00 1\.00 1\.00\n$")
-		self.assertRegex(header[4], f"^p cnf {n} {m}\n$")
-		self.assertRegex(header[5], "^(-?[1-9][\d]* ){3}0\n$")
+		self.assertRegex(header[4], "^c Sampling attempts: [1-9][\d]*\n$")
+		self.assertRegex(header[5], f"^p cnf {n} {m}\n$")
+		self.assertRegex(header[6], "^(-?[1-9][\d]* ){3}0\n$")
 
 		# The line specifying the hidden solution will be split at every whitespace.
 		# We then first check the part coming before the actual hidden solution.
@@ -459,20 +469,22 @@ class TestGenerator(unittest.TestCase):
 		F = './hidden2.solution'
 		path =  os.path.join('./', self.calculate_file_name(n, m))
 		g.main(n, m, F=F)
-		header = self.get_header(path, 6)
+		header = self.get_header(path, 7)
 		# The header should have the following form:
 		#   "c This file was generated by _"
 		#   "c Created by calling python3 generator.py -n 1000 -m 4200 -F ./hidden2.solution"
 		#   "c Hidden solution: {randomly generated}"
 		#   "c p-values {randomly generated}"
+		#   "c Sampling attempts: pos.int"
 		#   "p cnf 1000 4200"
 		#   "'int' 'int' 'int' 0"
 		self.assertRegex(header[0], "^c This file was generated by[\w\s\.]+\n$")
 		self.assertRegex(header[1], f"^c Created by calling python3 generator\.py -n {n} -m {m} -F \./hidden2\.solution\n$")
 		# The hidden solution will be checked in the next block of code.
 		self.assertRegex(header[3], "^c p-values [\s\d\w\.]*\n$")
-		self.assertRegex(header[4], "^p cnf 1000 4200\n$")
-		self.assertRegex(header[5], "^(-?[1-9][\d]* ){3}0\n$")
+		self.assertRegex(header[4], "^c Sampling attempts: [1-9][\d]*\n$")
+		self.assertRegex(header[5], "^p cnf 1000 4200\n$")
+		self.assertRegex(header[6], "^(-?[1-9][\d]* ){3}0\n$")
 		
 		# The line specifying the hidden solution will be split at every whitespace.
 		# We then first check the part coming before the actual hidden solution.
@@ -493,7 +505,7 @@ class TestGenerator(unittest.TestCase):
 		and that every clause contains variables between 1 and `n` and ends with a "0".
 		"""
 		used_vars = set()
-		for i in range(5, len(lines)):
+		for i in range(6, len(lines)):
 			literals = lines[i].rstrip().split()
 			# Each time we should discover a clause of width k, i.e., k literals plus a terminating 0.
 			self.assertEqual(len(literals), k+1)
@@ -532,11 +544,11 @@ class TestGenerator(unittest.TestCase):
 		g.main(n, m, o=o)
 		lines = self.get_all_lines(path)
 
-		# In the first 5 lines the header can be found.
+		# In the first 6 lines the header can be found.
 		# The header, however, gets already checked in test_header.
 		# Thus, we can skip the first 5 lines.
-		# Our first check will be the number of lines: This number should be m+5.        
-		self.assertEqual(m+5, len(lines))
+		# Our first check will be the number of lines: This number should be m+6.        
+		self.assertEqual(m+6, len(lines))
 
 		# After that we check every line that contains a clause and make sure that
 		# the width of the clause equals k.
@@ -556,11 +568,11 @@ class TestGenerator(unittest.TestCase):
 		g.main(n, m, k=k, s=s, o=o, F=F)
 		lines = self.get_all_lines(path)
 
-		# In the first 5 lines the header can be found.
+		# In the first 6 lines the header can be found.
 		# The header, however, gets already checked in test_header.
 		# Thus, we can skip the first 5 lines.
-		# Our first check will be the number of lines: This number should be m+5.
-		self.assertEqual(m+5, len(lines))
+		# Our first check will be the number of lines: This number should be m+6.
+		self.assertEqual(m+6, len(lines))
 
 		# After that we check every line that contains a clause and make sure that
 		# the width of the clause equals k.
@@ -589,7 +601,7 @@ class TestGenerator(unittest.TestCase):
 		"""This method checks if a given hidden solution (passed as a set) satisfies
 		all clauses specified by the `lines` of the file.
 		"""       
-		for i in range(5, len(lines)):
+		for i in range(6, len(lines)):
 			# We convert every clause into a list of strings.
 			# The last entry of every such list gets removed since it is equal to "0" (the end-of-clause-symbol).
 			literals = lines[i].split()[:-1]
@@ -660,7 +672,7 @@ class TestGenerator(unittest.TestCase):
 		"""This method checks if the clauses in `lines` are tautologies or improper k-SAT clauses 
 		(this second part of the test kind of duplicates check_clause_width_and_used_variables).
 		"""
-		for i in range(5, len(lines)):
+		for i in range(6, len(lines)):
 			# We convert every clause in a list of strings.
 			# The last entry of every list can be removed since it is equal to "0" (the end-of-clause-symbol).       
 			literals = lines[i].split()[:-1]
@@ -833,8 +845,8 @@ class TestGenerator(unittest.TestCase):
 		
 		# We count how many times a 1-correct, 2-correct, and 3-correct clause appears.
 		# We compare these values to the expected values.
-		# The clauses begin at lines[5].
-		observed_frequency_list = self.count_p_clauses(lines[5:], self.hidden2, 1000)
+		# The clauses begin at lines[6].
+		observed_frequency_list = self.count_p_clauses(lines[6:], self.hidden2, 1000)
 		W = self.calculate_rejected_prob(p)
 		P1, P2, P3 = self.calculate_add_probabilities(p, W)
 		# Letting Q_i be the number of i-clauses (for this notion see `calculate_add_probabilities`),
@@ -855,7 +867,7 @@ class TestGenerator(unittest.TestCase):
 		"""This method checks whether there are any duplicate clauses in `lines`.
 		"""
 		in_formula_set = set()
-		for i in range(5, len(lines)):			
+		for i in range(6, len(lines)):			
 			# We convert each clause in a list of strings.
 			# The last entry "0" (signaling the end of the line/clause) will be removed.
 			literals = lines[i].split()[:-1]
@@ -893,6 +905,231 @@ class TestGenerator(unittest.TestCase):
 		lines = self.get_all_lines(path)
 		self.check_for_duplicate_clauses(lines)
 
+
+
+	def check_sampler(self, sampler):
+		"""This method checks the files generated with `sampler`:
+		The files have to be reproducible, may not contain duplicate clauses and
+		the clauses have to be sampled w.r.t. the p-values (chi-squared test as in `test_probabilities`).
+		"""
+		n = 100
+		m = 10000
+		s = 11
+		k = 2
+		filename = self.calculate_file_name(n, m, k=k, s=s)
+		path1 = os.path.join(tmpfolder, filename)
+		path2 = os.path.join(tmpcopyfolder, filename)
+		g.main(n, m, s=s, k=k, o=tmpfolder, sampler=sampler)
+		copy2(path1, path2)
+		g.main(n, m, s=s, k=k, o=tmpfolder, sampler=sampler)
+		self.assertTrue(filecmp.cmp(path1, path2, shallow=False))
+		lines = self.get_all_lines(path1)
+		self.check_for_duplicate_clauses(lines)
+		self.assertIn(f"-sampler {sampler}", lines[1])
+
+		p = [0.25, 0.125, 0.3]
+		n = 1000
+		m = 5000
+		s = randint(1,10000)
+		o = tmpfolder
+		F = './hidden2.solution'
+		path =  os.path.join(o, self.calculate_file_name(n, m, s=s))
+		g.main(n, m, s=s, o=o, p=p, F=F, sampler=sampler)
+		lines = self.get_all_lines(path)
+		for line in lines[6:]:
+			# Each clause has k = 3 distinct variables.
+			self.assertEqual(len(set(abs(int(l)) for l in line.split()[:-1])), 3)
+
+		observed_frequency_list = self.count_p_clauses(lines[6:], self.hidden2, 1000)
+		P1, P2, P3 = self.calculate_add_probabilities(p, self.calculate_rejected_prob(p))
+		_, p = chisquare(observed_frequency_list, [m*P1, m*P2, m*P3])
+		if p < 0.05:
+			print("WARNING, WARNING. Self-destruction initialized.")
+			print(f"p-value for the instance generated by the {sampler} sampler is", p)
+		print(f"Everything's fine... probably. p-value for the instance generated by the {sampler} sampler is", p)
+
+
+
+	def test_batch_sampler(self):
+		"""We test the vectorized sampler (sampler='batch') with `check_sampler`."""
+
+		print(sys._getframe(  ).f_code.co_name)
+
+		self.check_sampler("batch")
+
+		# Unknown samplers are rejected.
+		with self.assertRaises(ValueError):
+			g.main(100, 10000, o=tmpfolder, sampler="unknown")
+
+
+
+	def test_compressed_output(self):
+		"""We test whether the gzip and xz compressed files contain the same DIMACS content as the uncompressed file.
+		"""
+
+		print(sys._getframe(  ).f_code.co_name)
+
+		n = 200
+		m = 850
+		s = 5
+		path = os.path.join(tmpfolder, self.calculate_file_name(n, m, s=s))
+		g.main(n, m, s=s, o=tmpfolder)
+		lines = self.get_all_lines(path)
+
+		for z in ["gz", "xz"]:
+			g.main(n, m, s=s, o=tmpfolder, z=z)
+			with cnfformula.open_dimacs(path + "." + z, "rt") as f:
+				compressed_lines = f.readlines()
+			self.assertEqual(lines[2:], compressed_lines[2:])
+			self.assertEqual(lines[1].rstrip("\n") + " -z " + z + "\n", compressed_lines[1])
+
+		with self.assertRaises(ValueError):
+			g.main(n, m, o=tmpfolder, z="zip")
+
+
+
+	def test_array_cnf(self):
+		"""We test whether the array-backed ArrayCNF (used by the batch sampler) produces the same DIMACS output as CNF
+		and rejects the same invalid clauses.
+		"""
+
+		print(sys._getframe(  ).f_code.co_name)
+
+		clauses = [[(True, 1), (False, 2), (True, 3)], [(False, 4), (True, 5), (False, 1)], [(True, 2), (True, 4)]]
+		F = cnfformula.CNF(5)
+		F_array = cnfformula.ArrayCNF(5)
+		for clause in clauses:
+			F.add_clause(clause)
+			F_array.add_clause(clause)
+		self.assertEqual(F.dimacs(), F_array.dimacs())
+		self.assertEqual(F.clauses, list(F_array.clauses))
+
+		# The clauses of an ArrayCNF cannot be changed directly.
+		with self.assertRaises(AttributeError):
+			F_array.clauses.append([1, 2])
+		with self.assertRaises(AttributeError):
+			F_array.clauses = []
+		self.assertEqual(len(F_array), 3)
+
+		# Bulk insertion of clauses of fixed width and of mixed widths (via offsets).
+		F_bulk = cnfformula.ArrayCNF(5, 3)
+		F_bulk.add_clauses(numpy.array([[1, -2, 3], [-4, 5, -1]]))
+		F_bulk.add_clauses(numpy.array([2, 4]), offsets=[0, 2])
+		self.assertEqual(F.dimacs(), F_bulk.dimacs())
+		self.assertEqual(len(F_bulk), 3)
+
+		for invalid in [[[1, -1, 2]], [[1, 2, 6]], [[0, 1, 2]]]:
+			with self.assertRaises(ValueError):
+				F_bulk.add_clauses(numpy.array(invalid))
+		for literals, offsets in [([1, 2], []), ([1, 2], [1, 2]), ([1, 2], [0, 3]), ([1, 2, 3], [0, 2, 1, 3])]:
+			with self.assertRaises(ValueError):
+				F_bulk.add_clauses(numpy.array(literals), offsets=offsets)
+		with self.assertRaises(TypeError):
+			F_bulk.add_clauses(numpy.array([[1.0, 2.0, 3.0]]))
+		self.assertEqual(len(F_bulk), 3)
+
+
+
+	def test_concurrent_generation(self):
+		"""We test whether formulas generated concurrently in threads are identical to formulas generated one after another,
+		i.e. whether the generation does not depend on any global state.
+		"""
+
+		print(sys._getframe(  ).f_code.co_name)
+
+		calls = [(60, 250, 3, s, sampler) for s in range(1, 7) for sampler in ["exact", "batch"]]
+		calls += [(40, 160, 4, 9, "exact"), (80, 300, 2, 9, "exact")]
+
+		for n, m, k, s, sampler in calls:
+			g.main(n, m, k=k, s=s, o=os.path.join(tmpcopyfolder, sampler), sampler=sampler)
+
+		with ThreadPoolExecutor(max_workers=8) as executor:
+			futures = [executor.submit(g.main, n, m, k=k, s=s, o=os.path.join(tmpfolder, sampler), sampler=sampler)
+				for n, m, k, s, sampler in calls]
+			for future in futures:
+				future.result()
+
+		for n, m, k, s, sampler in calls:
+			filename = os.path.join(sampler, self.calculate_file_name(n, m, k=k, s=s))
+			lines = self.get_all_lines(os.path.join(tmpfolder, filename))
+			copylines = self.get_all_lines(os.path.join(tmpcopyfolder, filename))
+			# The call line contains the output path, which differs.
+			self.assertEqual(lines[:1] + lines[2:], copylines[:1] + copylines[2:])
+
+		# The variable mapping shared by all generations cannot be modified.
+		mapping = hash_clauses.get_variable_mapping(60)
+		with self.assertRaises(TypeError):
+			mapping[(True, 1)] = 0
+		self.assertIs(hash_clauses.get_variable_mapping(60), mapping)
+
+
+
+	def test_repair(self):
+		"""We test the repair mode at a low clause-to-variable ratio:
+		All variables have to be used, the number of attempts and of replaced clauses is written to the header
+		and the formula contains only unique clauses.
+		"""
+
+		print(sys._getframe(  ).f_code.co_name)
+
+		n = 3000
+		m = 6000
+		s = 21
+		for sampler in ["exact", "batch"]:
+			o = os.path.join(tmpfolder, sampler)
+			path = os.path.join(o, self.calculate_file_name(n, m, s=s))
+			g.main(n, m, s=s, o=o, sampler=sampler, repair=True)
+			lines = self.get_all_lines(path)
+
+			self.assertTrue(lines[1].rstrip().endswith("--repair"))
+			self.assertTrue(lines[4].startswith("c Sampling attempts: "))
+			self.assertEqual(int(lines[4].split()[-1]), 1)
+			self.assertTrue(lines[5].startswith("c Repaired clauses: "))
+			self.assertGreater(int(lines[5].split()[-1]), 0)
+			self.assertEqual(lines[6], f"p cnf {n} {m}\n")
+
+			clauses = lines[7:]
+			self.assertEqual(len(clauses), m)
+			used_variables = set()
+			for clause in clauses:
+				used_variables.update(abs(int(l)) for l in clause.split()[:-1])
+			self.assertEqual(used_variables, set(range(1, n+1)))
+			self.check_for_duplicate_clauses(lines[1:])
+
+		# The repair draws its own random numbers: Its first variables do not repeat
+		# (up to the shift by one of the variables after v) the first candidate of the sampler.
+		n = 1000
+		for s in range(5):
+			others = sample_clauses.repair_generator(s).choice(n-1, size=2, replace=False) + 1
+			first_candidate = numpy.random.default_rng(s).integers(1, n+1, size=(1, 3))[0]
+			for variable in others:
+				self.assertGreater(numpy.abs(first_candidate - variable).min(), 1)
+
+		# The generator passes this generator to repair_coverage (the stream is identified by the increment of PCG64).
+		with patch.object(sample_clauses, "repair_coverage", wraps=sample_clauses.repair_coverage) as repair_coverage:
+			g.main(3000, 6000, s=21, o=tmpfolder, sampler="batch", repair=True)
+		rng = repair_coverage.call_args.args[5]
+		self.assertEqual(rng.bit_generator.state["state"]["inc"], sample_clauses.repair_generator(22).bit_generator.state["state"]["inc"])
+
+
+
+
+	def test_direct_sampler(self):
+		"""We test the rejection-free sampler (sampler='direct') with `check_sampler`.
+		Also p-values with a tiny acceptance rate (which the other samplers would reject almost always) have to work.
+		"""
+
+		print(sys._getframe(  ).f_code.co_name)
+
+		self.check_sampler("direct")
+
+		# Only one in a million uniformly drawn clauses would be accepted.
+		p = [1e-6, 1e-6, 1e-6]
+		self.assertAlmostEqual(sample_clauses.expected_acceptance_rate(3, p), 7/8 * 1e-6)
+		self.assertTrue(numpy.allclose(sample_clauses.satisfied_literal_distribution(3, p), [0.0, 3/7, 3/7, 1/7]))
+		hidden = {i: i in self.hidden2 for i in range(1, 1001)}
+		variables, clauses = sample_clauses.sample_clauses_direct(3, 1000, 5000, hidden, 5, p)
+		self.assertEqual(clauses.shape, (5000, 3))
 		
 		
 if __name__ == 'main':
@@ -0,0 +1,95 @@
+import unittest
+import os
+import io
+import filecmp
+import subprocess
+from shutil import rmtree
+import sys
+
+BASE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_PATH)
+
+import mod_instance as mi
+import mod_bundle as mb
+
+# Specify the folderpaths used during testing
+tmpfolder = "./tests/tmp_bundle"
+tmpcopyfolder = "./tests/tmp_bundle_2"
+
+class TestModBundle(unittest.TestCase):
+
+    def setUp(self):
+        os.makedirs(tmpfolder, exist_ok=True)
+        os.makedirs(tmpcopyfolder, exist_ok=True)
+
+    def tearDown(self):
+        rmtree(tmpfolder)
+        rmtree(tmpcopyfolder)
+
+    def test_materialize(self):
+        print(sys._getframe(  ).f_code.co_name)
+        # The instances of a bundle are identical to the files created by modify_instance.
+        orig = './tests/test_instances/k3-n500-m2100-r4.200-s1367145976.cnf'
+        res = './tests/test_instances/k3-n500-m2100-r4.200-s1367145976.resolvents'
+        for shuffle, selection in [(False, "bernoulli"), (True, "bernoulli"), (True, "sparse")]:
+            mi.modify_instance(orig, res, seed=23, M=7, outputPath=tmpfolder, shuffle=shuffle, selection=selection)
+            bundle_path = mb.create_bundle(orig, res, seed=23, M=7, outputPath=tmpcopyfolder, shuffle=shuffle, selection=selection)
+            bundle = mb.ModifiedInstanceBundle(bundle_path)
+            self.assertEqual(len(bundle), 7)
+            for i in range(len(bundle)):
+                file_name = bundle.materialize(i, tmpcopyfolder)
+                self.assertTrue(filecmp.cmp(file_name, os.path.join(tmpfolder, bundle.file_name(i)), shallow=False))
+                os.remove(file_name)
+                os.remove(os.path.join(tmpfolder, bundle.file_name(i)))
+
+            # The bundle stores the files once plus one bit per resolvent and instance.
+            self.assertLess(os.path.getsize(bundle_path), os.path.getsize(orig) + os.path.getsize(res) + 7 * (len(mi.get_clause_file(res)) // 8 + 1) + 5000)
+
+        # Parameters are checked as in modify_instance.
+        with self.assertRaises(ValueError):
+            mb.create_bundle(orig, res, M=0)
+        with self.assertRaises(TypeError):
+            mb.create_bundle(orig, res, p=1)
+
+    def test_write(self):
+        print(sys._getframe(  ).f_code.co_name)
+        # A single instance can be written to a file object or to stdout.
+        orig = './tests/test_instances/uf250-01.cnf'
+        res = './tests/test_instances/uf250-01.resolvents'
+        p = 0.02
+        bundle_path = mb.create_bundle(orig, res, seed=5, M=3, outputPath=tmpfolder, p=p, shuffle=True)
+        bundle = mb.ModifiedInstanceBundle(bundle_path)
+        seed = bundle.seeds[1]
+        self.assertEqual(bundle.index(seed), 1)
+
+        mi.modify_single(orig, res, seed=seed, outputPath=tmpcopyfolder, p=p, shuffle=True)
+        with open(os.path.join(tmpcopyfolder, bundle.file_name(1)), "rb") as f:
+            expected = f.read()
+
+        f = io.BytesIO()
+        bundle.write(1, f)
+        self.assertEqual(f.getvalue(), expected)
+
+        output = subprocess.run([sys.executable, os.path.join(BASE_PATH, "mod_bundle.py"), "-bundle", bundle_path, "-seeds", str(seed), "-to", "-"],
+                                stdout=subprocess.PIPE, check=True).stdout
+        self.assertEqual(output, expected)
+
+
+    def test_empty_resolvents(self):
+        print(sys._getframe(  ).f_code.co_name)
+        # A resolvents file without clauses gives the original instances (as modify_instance writes them).
+        orig = './tests/test_instances/uf250-01.cnf'
+        res = os.path.join(tmpfolder, "empty.resolvents")
+        with open(res, "w") as f:
+            f.write("c Max length 4\nc To level 1\n")
+        mi.modify_instance(orig, res, seed=3, M=2, outputPath=tmpfolder, p=0.5)
+        bundle = mb.ModifiedInstanceBundle(mb.create_bundle(orig, res, seed=3, M=2, outputPath=tmpcopyfolder, p=0.5))
+        self.assertEqual(len(bundle.resolvent_clauses), 0)
+        for i in range(len(bundle)):
+            file_name = bundle.materialize(i, tmpcopyfolder)
+            self.assertTrue(filecmp.cmp(file_name, os.path.join(tmpfolder, bundle.file_name(i)), shallow=False))
+
+
+
+if __name__ == 'main':
+    unittest.main()
@@ -3,7 +3,7 @@ import os, glob
 import filecmp
 from os.path import isfile
 from shutil import rmtree, copy2
-from scipy.stats import binom_test
+from scipy.stats import binom_test, chi2_contingency
 import sys
 
 BASE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -11,6 +11,7 @@ sys.path.append(BASE_PATH)
 
 #from random import randint, seed
 import random
+import numpy
 
 import mod_instance as g
 
@@ -560,7 +561,114 @@ class TestModInstance(unittest.TestCase):
                 os.remove(file_path_orig)
                 os.remove(file_path_copy)
 
-        
+    def test_batch(self):
+        # The files created for several seeds at once are the same as the files created one by one (with and without shuffling).
+        print(sys._getframe(  ).f_code.co_name)
+
+        orig = './tests/test_instances/uf250-01.cnf'
+        res = './tests/test_instances/uf250-01.resolvents'
+        seeds = [5, 1789, 42, 2**32 - 1, 7]
+        p = 0.01
+        for shuffle in [False, True]:
+            g.modify_batch(orig, res, seeds, './tests/tmp_test', p, shuffle=shuffle)
+            for s in seeds:
+                mod_name = self.create_file(orig, res, base_path='./tests/tmp_test_2', s=s, p=p, shuffle=shuffle)
+                batch_name = os.path.join('./tests/tmp_test', os.path.basename(mod_name))
+                self.assertTrue(filecmp.cmp(batch_name, mod_name, shallow=False))
+
+    def test_parallel(self):
+        # The files created by several processes are the same as the files created serially.
+        print(sys._getframe(  ).f_code.co_name)
+
+        orig = './tests/test_instances/k3-n500-m2100-r4.200-s1367145976.cnf'
+        res = './tests/test_instances/k3-n500-m2100-r4.200-s1367145976.resolvents'
+        for shuffle in [False, True]:
+            g.modify_instance(orig, res, seed=31, M=11, outputPath='./tests/tmp_test', shuffle=shuffle)
+            g.modify_instance(orig, res, seed=31, M=11, outputPath='./tests/tmp_test_2', shuffle=shuffle, workers=3)
+            files = sorted(os.listdir('./tests/tmp_test'))
+            self.assertEqual(len(files), 11)
+            self.assertEqual(files, sorted(os.listdir('./tests/tmp_test_2')))
+            for file_ in files:
+                self.assertTrue(filecmp.cmp(os.path.join('./tests/tmp_test', file_), os.path.join('./tests/tmp_test_2', file_), shallow=False))
+                os.remove(os.path.join('./tests/tmp_test', file_))
+                os.remove(os.path.join('./tests/tmp_test_2', file_))
+
+        # Check if invalid numbers of workers get rejected
+        with self.assertRaises(TypeError):
+            g.modify_instance(orig, res, M=1, workers=2.0)
+        with self.assertRaises(ValueError):
+            g.modify_instance(orig, res, M=1, workers=0)
+
+    def test_sparse_selection(self):
+        # The sparse selection samples the resolvents with the same distribution as the Bernoulli selection.
+        # As in check_probabilities, the statistical tests are "soft" checks which fail in 5% of the cases.
+        print(sys._getframe(  ).f_code.co_name)
+
+        no_of_resolvents = 5000
+        p = 0.01
+        counts = {"bernoulli": [], "sparse": []}
+        buckets = {"bernoulli": numpy.zeros(10), "sparse": numpy.zeros(10)}
+        for seed in range(1, 1001):
+            for selection in ["bernoulli", "sparse"]:
+                _, sampled = g.select_resolvents(seed, no_of_resolvents, p, selection)
+                # The indices are distinct, sorted and valid.
+                self.assertTrue(numpy.all(numpy.diff(sampled) > 0))
+                self.assertTrue(numpy.all((0 <= sampled) & (sampled < no_of_resolvents)))
+                counts[selection].append(len(sampled))
+                buckets[selection] += numpy.bincount(sampled // 500, minlength=10)
+
+        # Both selections sample all resolvents equally often ...
+        _, p_value_buckets = chi2_contingency([buckets["bernoulli"], buckets["sparse"]])[:2]
+        # ... and the numbers of sampled resolvents have the same distribution (Binomial(5000, 0.01) in both cases).
+        bins = [0, 40, 45, 50, 55, 60, no_of_resolvents + 1]
+        histograms = [numpy.histogram(counts[selection], bins=bins)[0] for selection in ["bernoulli", "sparse"]]
+        _, p_value_counts = chi2_contingency(histograms)[:2]
+        p_value_mean = binom_test(sum(counts["sparse"]), 1000 * no_of_resolvents, p)
+        for name, p_value in [("buckets", p_value_buckets), ("counts", p_value_counts), ("mean", p_value_mean)]:
+            if p_value < 0.05:
+                print("WARNING: The sparse selection failed the test for the", name)
+            print("p-value", p_value)
+
+        # The files state the sparse selection and are reproducible.
+        orig = './tests/test_instances/k3-n500-m2100-r4.200-s1367145976.cnf'
+        res = './tests/test_instances/k3-n500-m2100-r4.200-s1367145976.resolvents'
+        g.modify_single(orig, res, seed=3, outputPath='./tests/tmp_test', p=0.01, shuffle=True, selection="sparse")
+        g.modify_single(orig, res, seed=3, outputPath='./tests/tmp_test_2', p=0.01, shuffle=True, selection="sparse")
+        file_name = "k3-n500-m2100-r4.200-s1367145976_mod_s3_p0.01.cnf"
+        self.assertTrue(filecmp.cmp(os.path.join('./tests/tmp_test', file_name), os.path.join('./tests/tmp_test_2', file_name), shallow=False))
+        self.assertEqual(self.get_header(os.path.join('./tests/tmp_test', file_name))[1], "c Used with seed 3 and p 0.01 (sparse selection)\n")
+
+        with self.assertRaises(ValueError):
+            g.modify_instance(orig, res, M=1, selection="dense")
+
+    def test_clause_file(self):
+        # The clause lines of a file are loaded once and copied as byte ranges.
+        # Lines with trailing whitespace and a last line without newline are normalized as line.rstrip()+"\n".
+        print(sys._getframe(  ).f_code.co_name)
+
+        path = './tests/tmp_test/unnormalized.cnf'
+        with open(path, 'w') as f:
+            f.write("c comment\np cnf 3 4\n1 -2 0  \n\n 2 3 0\r\nc comment in between\n-1 -3 0")
+        clause_file = g.ClauseFile(path)
+        self.assertEqual(len(clause_file), 4)
+
+        out = numpy.zeros(int(clause_file.lengths.sum()), dtype=numpy.uint8)
+        positions = numpy.cumsum(clause_file.lengths) - clause_file.lengths
+        clause_file.copy_lines(out, positions)
+        self.assertEqual(out.tobytes(), b"1 -2 0\n\n 2 3 0\n-1 -3 0\n")
+
+        # Copy only some lines in reversed order.
+        lines = numpy.array([3, 0])
+        lengths = clause_file.lengths[lines]
+        out = numpy.zeros(int(lengths.sum()), dtype=numpy.uint8)
+        clause_file.copy_lines(out, numpy.array([7, 0]), lines)
+        self.assertEqual(out.tobytes(), b"1 -2 0\n-1 -3 0\n")
+
+        # Normalized files are memory-mapped and copied directly.
+        clause_file = g.ClauseFile('./tests/test_instances/uf250-01.resolvents')
+        self.assertIsInstance(clause_file.data, numpy.memmap)
+
+
         
 if __name__ == 'main':
     unittest.main()
\ No newline at end of file
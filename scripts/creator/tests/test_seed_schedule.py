@@ -0,0 +1,134 @@
+import unittest
+from unittest.mock import patch
+import os
+import random
+import filecmp
+from shutil import rmtree
+import sys
+
+BASE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_PATH)
+
+import seed_schedule as ss
+import mod_instance as mi
+import base_instance_creator as bic
+
+# Specify the folderpath used during testing
+tmpfolder = "./tmp_seedtest"
+
+class TestSeedSchedule(unittest.TestCase):
+
+    def setUp(self):
+        os.makedirs(tmpfolder, exist_ok=True)
+
+    def tearDown(self):
+        rmtree(tmpfolder)
+
+    def draw_seeds_with_list(self, rng, count):
+        # The seeds as they were drawn before (with a list of the used seeds).
+        used_seeds = []
+        for i in range(count):
+            seed = rng.randint(1, 2**32 - 1)
+            while seed in used_seeds:
+                seed = rng.randint(1, 2**32 - 1)
+            used_seeds.append(seed)
+        return used_seeds
+
+    def test_draw_seeds(self):
+        print(sys._getframe(  ).f_code.co_name)
+        # The seeds are the same as before and distinct.
+        seeds = ss.draw_seeds(random.Random(42), 1000)
+        self.assertEqual(seeds, self.draw_seeds_with_list(random.Random(42), 1000))
+        self.assertEqual(len(set(seeds)), 1000)
+
+        # Used seeds are replaced by the next seed.
+        first_seeds = ss.draw_seeds(random.Random(3), 5)
+        used = set(first_seeds[:3])
+        seeds = ss.draw_seeds(random.Random(3), 5, used)
+        self.assertEqual(seeds[:2], first_seeds[3:])
+        self.assertFalse(set(seeds) & set(first_seeds[:3]))
+        self.assertEqual(used, set(first_seeds[:3]) | set(seeds))
+
+    def test_schedule(self):
+        print(sys._getframe(  ).f_code.co_name)
+        # An extended schedule gives the same seeds as a schedule drawn at once.
+        schedule = ss.SeedSchedule(17)
+        schedule.extend(300)
+        self.assertEqual(schedule.extend(200), ss.draw_seeds(random.Random(17), 500)[300:])
+        self.assertEqual(len(schedule), 500)
+
+        # A saved schedule can be loaded and extended.
+        path = os.path.join(tmpfolder, "seeds.json")
+        schedule.save(path)
+        loaded = ss.SeedSchedule.load(path)
+        self.assertEqual(loaded.seed, 17)
+        self.assertEqual(loaded.seeds, schedule.seeds)
+        self.assertEqual(loaded.extend(10), schedule.extend(10))
+
+        # Loading restores the state of the random number generator instead of drawing the seeds again.
+        with patch.object(random.Random, "randint", side_effect=AssertionError("seed drawn")):
+            loaded = ss.SeedSchedule.load(path)
+        self.assertEqual(loaded.extend(10), schedule.seeds[500:510])
+
+        # Files which are not schedules are rejected.
+        with open(path, "w") as f:
+            f.write("c seed schedule with seed 17\n12345\n")
+        with self.assertRaises(ValueError):
+            ss.SeedSchedule.load(path)
+
+    def test_scheduled_seeds(self):
+        print(sys._getframe(  ).f_code.co_name)
+        # The schedule is created and extended as needed.
+        path = os.path.join(tmpfolder, "seeds.json")
+        self.assertEqual(ss.scheduled_seeds(path, 9, 20), ss.draw_seeds(random.Random(9), 20))
+        self.assertEqual(ss.scheduled_seeds(path, 9, 5), ss.draw_seeds(random.Random(9), 5))
+        self.assertEqual(ss.scheduled_seeds(path, 9, 50), ss.draw_seeds(random.Random(9), 50))
+        self.assertEqual(len(ss.SeedSchedule.load(path)), 50)
+
+        # A schedule of another seed is rejected.
+        with self.assertRaises(ValueError):
+            ss.scheduled_seeds(path, 10, 5)
+
+    def test_modify_instance_with_schedule(self):
+        print(sys._getframe(  ).f_code.co_name)
+        # modify_instance writes the same files with and without a schedule.
+        orig = './tests/test_instances/uf250-01.cnf'
+        res = './tests/test_instances/uf250-01.resolvents'
+        path = os.path.join(tmpfolder, "seeds.json")
+        ss.scheduled_seeds(path, 13, 2)
+        mi.modify_instance(orig, res, seed=13, M=4, outputPath=os.path.join(tmpfolder, "drawn"), p=0.05)
+        mi.modify_instance(orig, res, seed=13, M=4, outputPath=os.path.join(tmpfolder, "scheduled"), p=0.05, schedule=path)
+        files = sorted(os.listdir(os.path.join(tmpfolder, "drawn")))
+        self.assertEqual(len(files), 4)
+        self.assertEqual(sorted(os.listdir(os.path.join(tmpfolder, "scheduled"))), files)
+        for file_name in files:
+            self.assertTrue(filecmp.cmp(os.path.join(tmpfolder, "drawn", file_name), os.path.join(tmpfolder, "scheduled", file_name), shallow=False))
+        self.assertEqual(len(ss.SeedSchedule.load(path)), 4)
+
+        with self.assertRaises(ValueError):
+            mi.modify_instance(orig, res, seed=14, M=4, outputPath=tmpfolder, p=0.05, schedule=path)
+        with self.assertRaises(TypeError):
+            mi.modify_instance(orig, res, seed=13, M=4, outputPath=tmpfolder, p=0.05, schedule=1)
+
+    def test_create_instances_with_schedule(self):
+        print(sys._getframe(  ).f_code.co_name)
+        # create_instances creates the same instances with and without a schedule.
+        path = os.path.join(tmpfolder, "seeds.json")
+        bic.create_instances([20, 30], 4.2, N=3, s=5, o=os.path.join(tmpfolder, "drawn"))
+        bic.create_instances([20, 30], 4.2, N=3, s=5, o=os.path.join(tmpfolder, "scheduled"), schedule=path)
+        self.assertEqual(ss.SeedSchedule.load(path).seeds, ss.draw_seeds(random.Random(5), 6))
+        for n in ["n20", "n30"]:
+            files = sorted(os.listdir(os.path.join(tmpfolder, "drawn", n)))
+            self.assertEqual(len(files), 3)
+            self.assertEqual(sorted(os.listdir(os.path.join(tmpfolder, "scheduled", n))), files)
+            for file_name in files:
+                # The files differ only in the output path in the header.
+                with open(os.path.join(tmpfolder, "drawn", n, file_name)) as f:
+                    drawn = f.read().replace(os.path.join(tmpfolder, "drawn"), "")
+                with open(os.path.join(tmpfolder, "scheduled", n, file_name)) as f:
+                    scheduled = f.read().replace(os.path.join(tmpfolder, "scheduled"), "")
+                self.assertEqual(drawn, scheduled)
+
+
+if __name__ == 'main':
+    unittest.main()
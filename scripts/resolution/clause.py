@@ -1,61 +1,84 @@
-import random
+import os
+import sys
 import cython_functions as c
 
+# The hashing of clauses is shared with the creator and located in the parent folder.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import clause_hashing
+
 class Clause:
 
+    # Millions of resolvents are kept in memory: a clause only stores its literals (as a sorted tuple), its length,
+    # its hash value and (if wanted) its two parents, without a __dict__ per clause.
+    __slots__ = ("variables", "length", "hash", "parents")
+
 
     @classmethod
     def init_variable_mapping(cls, n_vars, seed=42):
         """
         This method initializes the variable mapping:
-        Each literal of the clause `cls` is uniquely mapped to a randomly chosen value in {0, ..., 2^32 - 1}.
+        Each literal of the clause `cls` is uniquely mapped to a randomly chosen value in {0, ..., 2^64 - 1} (see clause_hashing.zobrist_keys).
         Parameter cls: The clause.
         Parameter n_vars: The number of variables.
         Parameter seed: The seed to initialize the random number generator.
         """
-        c.init_variable_mapping(n_vars, seed)
+        c.set_variable_mapping(clause_hashing.zobrist_keys(n_vars, seed))
 
     @classmethod
     def calculate_hash_value(cls, variables):
         return c.hash_value(variables)
 
 
+    @classmethod
+    def from_sorted(cls, variables, hash_value):
+        """
+        Returns a clause with the literals `variables` (a sorted tuple of distinct literals) and their hash value `hash_value`.
+        Nothing is checked (see Formula.add_clause_array).
+        """
+        c = cls.__new__(cls)
+        c.variables = variables
+        c.length = len(variables)
+        c.hash = hash_value
+        c.parents = None
+        return c
+
+
     def __init__(self):
-        self.variables = set()
+        self.variables = ()
         self.length = 0
-        self.parents = set()
+        self.hash = 0
+        self.parents = None # The parents are only stored if they are set.
 
     def hash_clause(self):
         """
-        This method calculates the sum of literals of a clause w.r.t. the above variable mapping.
+        This method calculates the XOR of the literals of a clause w.r.t. the above variable mapping.
         Parameter clause: The clause is a list of the form [(Boolean, int)]. The Boolean describes the polarity of the literal. 
         """
         return c.hash_value(self.variables)
 
     def set_variables(self, variables):
-        # self.variables = variables
-        self.variables.update(variables)
-        self.length = len(variables)
+        # The literals are stored as a sorted tuple (the clauses are written in this order), repeated literals once.
+        self.variables = tuple(sorted(set(variables)))
+        self.length = len(self.variables)
         self.hash = self.hash_clause()
 
     def set_parents(self, p1, p2):
-        self.parents.add(p1)
-        self.parents.add(p2)
+        self.parents = (p1, p2)
 
     def get_parents(self):
-        return self.parents
+        return self.parents if self.parents is not None else ()
 
     def add_variable(self, x):
         if x in self.variables:
             print("Error: ", x, " is already in the variable list.")
-        self.variables.append(x)
+        self.variables = tuple(sorted(self.variables + (x,)))
         self.length += 1
         self.hash = self.hash_clause()
 
     def remove_variable(self, x):
         if x not in self.variables:
             print("Error: ", x, " is not in the variable list.")
-        self.variables.remove(x)
+        self.variables = tuple(v for v in self.variables if v != x)
         self.length -= 1
         self.hash = self.hash_clause()
 
@@ -1,53 +1,143 @@
-import random
 from itertools import chain, combinations
+from array import array
+from libc.stdlib cimport malloc, free
+cimport cython
+
+cdef extern from *:
+    int __builtin_ctzll(unsigned long long x) nogil
 
 cdef dict variable_mapping = {}
 
-cpdef init_variable_mapping(int n_vars, int seed):
-    global variable_mapping
-    rng = random.Random()
-    rng.seed(seed)
-    cdef list sample = random.sample(range(2**32-1), 2*n_vars)
-    cdef int i = 0
-    cdef int l
-    for l in range(1, n_vars+1):
-        variable_mapping[l] = sample[i]
-        variable_mapping[-l] = sample[i+1]
-        i += 2
-
-cdef long calculate_hash_value(variables):
-    return sum(map(lambda x: variable_mapping[x], variables))
-
-cpdef long hash_value(variables):
+# The same keys in a C array: the key of the literal l (with |l| <= n_keys) is literal_keys[l + n_keys].
+cdef unsigned long long[::1] literal_keys = array('Q', [0])
+cdef int n_keys = 0
+
+cpdef set_variable_mapping(dict keys):
+    # keys maps each literal to a random 64-bit value (see clause_hashing.zobrist_keys).
+    # The keys of zobrist_keys(n) are a prefix of the keys of zobrist_keys(n') for n < n',
+    # thus formulas with different numbers of variables can share the mapping.
+    # The C array is rebuilt on every call (e.g. the keys of another seed replace the former ones),
+    # all hash values are computed from it.
+    global literal_keys, n_keys
+    variable_mapping.update(keys)
+
+    cdef int n = max(map(abs, variable_mapping)) if variable_mapping else 0
+    new_keys = array('Q', [0]) * (2*n + 1)
+    for literal, key in variable_mapping.items():
+        new_keys[literal + n] = key
+    literal_keys = new_keys
+    n_keys = n
+
+cpdef literal_key_array():
+    # Returns a copy of the keys as an array('Q'): the key of the literal l is at l + n, and n.
+    return array('Q', literal_keys), n_keys
+
+cdef unsigned long long calculate_hash_value(variables) except? 0:
+    cdef unsigned long long h = 0
+    cdef int x
+    for x in variables:
+        if x > n_keys or x < -n_keys or x == 0:
+            raise KeyError(x)
+        h ^= literal_keys[x + n_keys]
+    return h
+
+cpdef unsigned long long hash_value(variables) except? 0:
     return calculate_hash_value(variables)
 
-cdef int get_absolute_set_length(set variables):
-    return len(set(map(abs, variables)))
+cpdef resolve(tuple vars_clauseA, tuple vars_clauseB, int variable, int max_length, hash_values):
+        # The literals of both clauses are sorted tuples (see clause.Clause), the resolvent is returned as a sorted tuple.
+        # `hash_values` is the ClauseHashSet of the formula.
+        cdef Py_ssize_t len_a = len(vars_clauseA), len_b = len(vars_clauseB)
+        # The first len_a + len_b ints hold the two clauses, the remaining ones the resolvent.
+        cdef int *buffer = <int *> malloc(2 * (len_a + len_b + 1) * sizeof(int))
+        if buffer == NULL:
+            raise MemoryError()
 
-cpdef resolve(set vars_clauseA, set vars_clauseB, int variable, int max_length, set hash_values):
-        cdef set new_clause_vars = vars_clauseA.union(vars_clauseB)
-        #new_clause_vars = new_clause_vars.update(vars_clauseB)
-        #
-        if len(new_clause_vars)-2 > max_length: # after resolving the two literals `variable` and -`variable` will be gone
+        cdef Py_ssize_t i
+        try:
+            for i in range(len_a):
+                buffer[i] = vars_clauseA[i]
+            for i in range(len_b):
+                buffer[len_a + i] = vars_clauseB[i]
+            return resolve_sorted(buffer, len_a, buffer + len_a, len_b, buffer + len_a + len_b, variable, max_length, hash_values)
+        finally:
+            free(buffer)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef object resolve_sorted(int *a, Py_ssize_t len_a, int *b, Py_ssize_t len_b, int *resolvent, int variable, int max_length, hash_values):
+        # Union of the sorted clauses `a` and `b` without `variable` and -`variable`.
+        cdef Py_ssize_t i = 0, j = 0, k = 0
+        cdef int x
+        while i < len_a or j < len_b:
+            if j == len_b or (i < len_a and a[i] < b[j]):
+                x = a[i]
+                i += 1
+            elif i == len_a or b[j] < a[i]:
+                x = b[j]
+                j += 1
+            else: # a[i] == b[j]
+                x = a[i]
+                i += 1
+                j += 1
+            if x != variable and x != -variable:
+                resolvent[k] = x
+                k += 1
+
+        if k > max_length:
             return None # The resolvent would be above allowed `max_length`
 
+        # The resolvent is sorted: the negative literals come first in the order of decreasing absolute values,
+        # the positive literals last in the order of increasing absolute values.
+        i = 0
+        j = k - 1
+        while i < j and resolvent[i] < 0 and resolvent[j] > 0:
+            if -resolvent[i] == resolvent[j]:
+                return None # The resolvent would be tautological
+            elif -resolvent[i] > resolvent[j]:
+                i += 1
+            else:
+                j -= 1
 
-        # #if len(set(map(abs, new_clause_vars))) < len(new_clause_vars)-1:
-        if get_absolute_set_length(new_clause_vars) < len(new_clause_vars)-1:
-            return None # The resolvent would be tautological
-
-        new_clause_vars = new_clause_vars.difference({variable, -variable})
-        # # Subsumption check:
-        # # We iterate over all possible subsets S of the literals in the resolvent R which satisfy 1 <= |S| <= |R|.
-        # # If the hash value of S is alread present in the set of hash values of the formula F, we know that R is subsumed
-        # # by another clause of the formula F.
-        cdef int r
-        cdef list comb
-        for r in range(len(new_clause_vars), 0, -1):
-            comb = list(combinations(new_clause_vars, r))
-            for var_combination in comb:
-                if calculate_hash_value(var_combination) in hash_values:
+        for i in range(k):
+            if resolvent[i] > n_keys or resolvent[i] < -n_keys:
+                raise KeyError(resolvent[i])
+
+        # Subsumption check:
+        # We iterate over all possible subsets S of the literals in the resolvent R which satisfy 1 <= |S| <= |R|.
+        # If S is alread present in the formula F (`hash_values` is a ClauseHashSet), we know that R is subsumed
+        # by another clause of the formula F.
+        if k >= 64:
+            if subsumed_by_subset([resolvent[i] for i in range(k)], hash_values):
+                return None
+            return tuple([resolvent[i] for i in range(k)])
+
+        # The subsets are enumerated in Gray code order: each subset differs from the previous one in a single
+        # literal, thus the hash value of the subset is updated with a single XOR.
+        # The hash value is screened with the Bloom filter of `hash_values` (see ClauseHashSet.bloom_filter) in C,
+        # only if it passes, the set is asked (and the literals of the subset are collected).
+        cdef unsigned char[::1] bloom = hash_values.bloom_filter()
+        cdef unsigned long long filter_mask = 8 * (<unsigned long long> bloom.shape[0]) - 1
+        cdef unsigned long long subset, mask = 0, h = 0, b1, b2
+        cdef int bit
+        for subset in range(1, (<unsigned long long> 1) << k):
+            bit = __builtin_ctzll(subset)
+            mask ^= (<unsigned long long> 1) << bit
+            h ^= literal_keys[resolvent[bit] + n_keys]
+            b1 = h & filter_mask
+            b2 = (h >> 32) & filter_mask
+            if (bloom[b1 >> 3] >> (b1 & 7)) & 1 and (bloom[b2 >> 3] >> (b2 & 7)) & 1:
+                if hash_values.contains(tuple([resolvent[i] for i in range(k) if (mask >> i) & 1]), h):
                     return None
 
-        return new_clause_vars
+        return tuple([resolvent[i] for i in range(k)])
+
 
+def subsumed_by_subset(literals, hash_values):
+    # Returns True if a subset of `literals` (including `literals`) is in the ClauseHashSet `hash_values`.
+    for r in range(len(literals), 0, -1):
+        for var_combination in combinations(literals, r):
+            if hash_values.contains(var_combination, calculate_hash_value(var_combination)):
+                return True
+    return False
@@ -1,8 +1,11 @@
 import clause as clause
 import cython_functions as c
+from clause_hashing import ClauseHashSet
+from occurrence_index import new_occurrence_index
 
-from collections import defaultdict
 from sortedcontainers import SortedList
+import numpy as np
+import gc
 from itertools import chain, combinations
 
 # Some terminology used in the comments:
@@ -21,15 +24,16 @@ from itertools import chain, combinations
 
 class Formula:
 
-    def __init__(self):
+    def __init__(self, index="sets"):
         self.n_variables = 0 # number of variables in the formula
         self.n_clauses = 0 # number of clauses in the formula
         self.clauses = {} # set of the clauses in the formula
         self.current_max_length = 0 # maximal length of a clause in the formula
-        self.variable_dict = defaultdict(set) # dictionary keys: variables; values: indices of clauses in the `clauses` set where the variable appears
-        self.length_dict = defaultdict(set) # dictionary keys: length; values: indices of clauses in the `clauses` set that have the specified length
-        self.length_variable_dict = defaultdict(set) # dictionary keys: (clause_length, variable); values: indices of clauses in the `clauses` set that have the specified length and contain the specified variable
-        self.clause_hash_values = set() # Set of the hash values of the clauses in the formula
+        self.index = index # backend of the occurrence indices below ("sets" or "sorted", see occurrence_index.py)
+        self.variable_dict = new_occurrence_index(index) # keys: variables; values: indices of clauses in the `clauses` set where the variable appears
+        self.length_dict = new_occurrence_index(index) # keys: length; values: indices of clauses in the `clauses` set that have the specified length
+        self.length_variable_dict = new_occurrence_index(index) # keys: (clause_length, variable); values: indices of clauses in the `clauses` set that have the specified length and contain the specified variable
+        self.clause_hash_values = ClauseHashSet() # Set of the clauses in the formula, addressed by their hash values
 
 
     def set_n_vars(self, n):
@@ -50,23 +54,85 @@ class Formula:
 
         # Update the variable_dict and length_variable_dict
         for v in c.get_variables():
-            self.variable_dict[v].add(self.n_clauses)
-            self.length_variable_dict[(c.length, v)].add(self.n_clauses)
+            self.variable_dict.add(v, self.n_clauses)
+            self.length_variable_dict.add((c.length, v), self.n_clauses)
 
         # Update the length_dict
-        self.length_dict[c.length].add(self.n_clauses)
+        self.length_dict.add(c.length, self.n_clauses)
 
         # Update the number of clauses in the formula object
         self.n_clauses += 1
 
-        # Add the hash value of the clause to the set of hash values of the clauses in the formula
-        self.clause_hash_values.add(c.hash)
+        # Add the clause to the set of (hash values of the) clauses in the formula
+        self.clause_hash_values.add(c.variables, c.hash)
 
         # Potentially update the current_max_length of the formula
         if c.length > self.current_max_length:
             self.current_max_length = c.length
 
 
+    def add_clause_array(self, literals, lengths):
+        """
+        This method adds clauses like add_clause, but builds the indices in bulk.
+        The clauses are given by the flat array `literals` (the literals of the clauses one after another,
+        the literals of each clause sorted and distinct) and the array `lengths` (the numbers of literals of the clauses).
+        """
+        literals = np.asarray(literals, dtype=np.int64)
+        lengths = np.asarray(lengths, dtype=np.int64)
+        if len(lengths) == 0:
+            return
+        n = self.n_variables
+        if len(literals) > 0 and np.abs(literals).max() > n:
+            raise KeyError(int(literals[np.abs(literals).argmax()]))
+
+        indices = np.arange(self.n_clauses, self.n_clauses + len(lengths))
+        literal_indices = np.repeat(indices, lengths)
+        starts = np.cumsum(lengths) - lengths
+
+        # The hash values of the clauses (the XOR of the keys of their literals, see clause.Clause.init_variable_mapping).
+        key_array, n_keys = c.literal_key_array()
+        if len(literals) > 0 and np.abs(literals).max() > n_keys:
+            raise KeyError(int(literals[np.abs(literals).argmax()]))
+        keys = np.frombuffer(key_array, dtype=np.uint64)
+        # An empty clause has the hash value 0 (reduceat would return the key of the next literal).
+        hash_values = np.bitwise_xor.reduceat(np.append(keys[literals + n_keys], np.uint64(0)), starts)
+        hash_values[lengths == 0] = 0
+
+        # The garbage collector would scan the growing formula again and again while the clauses are created.
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            all_literals = literals.tolist()
+            for i, start, length, h in zip(indices.tolist(), starts.tolist(), lengths.tolist(), hash_values.tolist()):
+                new_clause = clause.Clause.from_sorted(tuple(all_literals[start:start+length]), h)
+                self.clauses[i] = new_clause
+                self.clause_hash_values.add(new_clause.variables, new_clause.hash)
+
+            for v, occurrences in grouped(literals, literal_indices):
+                self.variable_dict.add_many(v, occurrences)
+            # The keys (length, v) are encoded as length * (2n+1) + v + n.
+            for key, occurrences in grouped(np.repeat(lengths, lengths) * (2*n + 1) + literals + n, literal_indices):
+                self.length_variable_dict.add_many((key // (2*n + 1), key % (2*n + 1) - n), occurrences)
+            for length, occurrences in grouped(lengths, indices):
+                self.length_dict.add_many(length, occurrences)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+        self.n_clauses += len(lengths)
+        self.current_max_length = max(self.current_max_length, int(lengths.max()))
+
+
+    def clause_array(self):
+        """
+        Returns the clauses of the formula (in the order of their indices) as in add_clause_array:
+        the flat int32 array of their literals and the int32 array of their lengths.
+        """
+        lengths = np.fromiter((self.clauses[i].length for i in range(self.n_clauses)), dtype=np.int32, count=self.n_clauses)
+        literals = np.fromiter(chain.from_iterable(self.clauses[i].variables for i in range(self.n_clauses)), dtype=np.int32, count=int(lengths.sum()))
+        return literals, lengths
+
+
     def remove_clause(self, index):
         """This methods removes the clause object at index `index` in the clause set from the formula and updates all necessary parameters."""
 
@@ -80,12 +146,10 @@ class Formula:
 
         # Update the variable_dict
         for v in c.get_variables():
-            occurrences = self.variable_dict[v] # Obtain the occurences of variable `v`
-            occurrences.remove(index) # Remove `index` from this set
-            self.variable_dict[v] = occurrences # Update the respective set in the variable_dict
+            self.variable_dict.remove(v, index) # Remove `index` from the occurrences of variable `v`
 
         # Update the clause_hash_values set
-        self.clause_hash_values.remove(c.hash)
+        self.clause_hash_values.remove(c.variables, c.hash)
 	
 
     def resolve_on_variable(self, index_clauseA, index_clauseB, variable, max_length=30000, parents=False):
@@ -118,16 +182,11 @@ class Formula:
         If force_increasing_index=True, only partner clauses with an index higher than `index_clause` and `min_index` are considered
         (this can dramatically save runtime!).
         """
-        partner_clause_indices = self.variable_dict[-variable] # Find the indices of clauses containing -`variable
-
         if force_increasing_index:
             min_index = max(index_clause, min_index)
 
-        if min_index > 0:
-            partner_clause_indices = [index for index in partner_clause_indices if index >= min_index]
-            #partner_clause_indices = partner_clause_indices[partner_clause_indices.bisect_left(min_index):]
-        
-        return partner_clause_indices
+        # Find the indices (at least min_index) of clauses containing -`variable`
+        return self.variable_dict.since(-variable, min_index)
       
 
     def resolve_all_with_clause_on_variable(self, index_clause, variable, force_increasing_index=False, min_index=0, max_length=30000, parents=False):
@@ -173,23 +232,17 @@ class Formula:
 		
 
     def remove_variable_from_clause(self, index, variable):
-        occurrences = self.variable_dict[variable]
-        self.variable_dict[variable] = None
-        # occurrences = self.variable_dict.pop(variable, None)
         clause = self.clauses[index]
         self.clauses[index] = None
         # clause = self.clauses.pop(index, None)
-        if occurrences == None:
+        if variable not in self.variable_dict:
             print("Error: variable", variable, "does not exist.")
             quit()
         if clause == None:
             print("Error: clause", index, "does not exist.")
             quit()
 
-        # print("index:",index, "variable:",variable)
-        # print(occurrences)
-        occurrences.remove(index)  ## variable does not occur in the clause anymore - remove it.
-        self.variable_dict[variable] = occurrences
+        self.variable_dict.remove(variable, index)  ## variable does not occur in the clause anymore - remove it.
         clause.remove_variable(variable)  ## variable removed from clause
         if clause.get_length() != 0:  ## if the clause became empty it does not has to be added to the clauses dict anymore. 
             self.clauses[index] = clause
@@ -206,3 +259,15 @@ class Formula:
 
 
             
+
+
+
+def grouped(keys, values):
+    """Yields the pairs (key, list of the values with this key) for the distinct keys of the array `keys` in increasing order.
+    The values of each key keep their order in `values`."""
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    values = values[order]
+    boundaries = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+    for key, group in zip(keys[np.r_[0, boundaries]].tolist(), np.split(values, boundaries)):
+        yield key, group.tolist()
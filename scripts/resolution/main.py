@@ -4,9 +4,52 @@ import formula
 import more_resolution_formula
 import clause
 import parse_formula
+from occurrence_index import INDEX_BACKENDS
 
 import argparse
-from os.path import isdir, join, basename
+import hashlib
+import json
+import os
+import shutil
+from os.path import isdir, join, basename, exists
+
+# The version of the resolvents files in the cache (see cache_path).
+# It has to be increased whenever the resolvents written for the same formula and parameters change.
+CACHE_VERSION = 2
+
+# The format of the resolvents files, written to their header (see write_header). Files without this line have the format 1.
+# Format 2: The literals of the clauses are kept as sorted tuples (see clause.Clause). Thus, the literals of each resolvent
+# are sorted and the resolvents of a level are written in another order than in format 1 (each level contains the same clauses).
+# mod_instance samples the resolvents by their position, so the same seed gives different modified instances for the two formats.
+RESOLVENTS_FORMAT = 2
+
+
+
+def resolvents_file_path(formula, output_path):
+    """
+    Returns the path of the resolvents file of `formula`.cnf: `output_path` itself or,
+    if `output_path` is a folder, the file `formula`.resolvents in this folder.
+    """
+    if isdir(output_path):
+        suffix = basename(formula).replace(".cnf", "") + ".resolvents"
+        output_path = join(output_path, suffix)
+    return output_path
+
+
+
+def write_header(f, converge, more, max_length, times):
+    """
+    Writes the header of a resolvents file containing the information specified via
+    `max_length`, `converge`, and `more`/`times` and the format of the file (see RESOLVENTS_FORMAT) to the opened file `f`.
+    """
+    f.write(f"c Max length {max_length}\n")
+    if converge:
+        f.write("c To convergence\n")
+    elif more:
+        f.write(f"c To level {times}\n")
+    else:
+        f.write("c To level 1\n")
+    f.write(f"c Resolvents format {RESOLVENTS_FORMAT}\n")
 
 
 
@@ -17,49 +60,221 @@ def write_resolvents_file(formula, output_path, converge, more, max_length, time
     The header of this file will contain the information specified via
     `max_length`, `converge`, and `more`/`times`.
     """
-    if isdir(output_path):
-        suffix = basename(formula).replace(".cnf", "") + ".resolvents"
-        output_path = join(output_path, suffix)
+    output_path = resolvents_file_path(formula, output_path)
 
     with open(output_path, 'w') as f:
-        f.write(f"c Max length {max_length}\n")
-        if converge:
-            f.write("c To convergence\n")
-        elif more:
-            f.write(f"c To level {times}\n")
-        else:
-            f.write("c To level 1\n")
+        write_header(f, converge, more, max_length, times)
 
         for clause in output_list:
             f.write(clause)
 
 
 
-def resolve_and_write(formula, output_path=None, converge=False, more=None, max_length=4, times=2):
-    cnf, n_vars, _ = parse_formula.parse_formula(formula)
+def read_checkpoint(checkpoint_path, parameters):
+    """
+    Returns the number of completed levels and the size of the resolvents file after the last completed level
+    stored in the checkpoint file `checkpoint_path`, or None if there is no checkpoint for a run with the same `parameters`.
+    """
+    if not exists(checkpoint_path):
+        return None
+    with open(checkpoint_path, 'r') as f:
+        checkpoint = json.load(f)
+    if checkpoint["parameters"] != parameters:
+        return None
+    return checkpoint["levels"], checkpoint["size"]
+
+
+
+def write_checkpoint(checkpoint_path, parameters, levels, size):
+    """
+    Stores that `levels` levels are completed and that the resolvents file has the size `size` after them.
+    The checkpoint file is replaced atomically, i.e. a killed run leaves the former or the new checkpoint.
+    """
+    with open(checkpoint_path + ".tmp", 'w') as f:
+        json.dump({"parameters": parameters, "levels": levels, "size": size}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(checkpoint_path + ".tmp", checkpoint_path)
+
+
+
+def read_levels(f):
+    """
+    Returns the resolvents of each level of a streamed resolvents file (opened in `f`) as lists of clause.Clause objects.
+    The resolvents of the level i follow the line "c Level i".
+    """
+    levels = []
+    for line in f:
+        if line.startswith("c Level"):
+            levels.append([])
+        elif not line.startswith("c") and levels:
+            c = clause.Clause()
+            c.set_variables(int(x) for x in line.split()[:-1])
+            levels[-1].append(c)
+    return levels
+
+
+
+def stream_resolvents(cnf, formula, output_path, converge, more, max_length, times, workers, intersect):
+    """
+    Resolves `cnf` (parsed from the file `formula`) and writes the resolvents of each level to the resolvents file
+    (see resolvents_file_path) as soon as the level is complete, preceded by the line "c Level i".
+    After each level, a checkpoint (the resolvents file with the suffix .checkpoint) is written.
+    If a checkpoint of a run with the same parameters exists (e.g. the run was killed), the completed levels
+    are read from the resolvents file and only the following levels are resolved.
+    The checkpoint is removed when the resolution is finished.
+    """
+    output_path = resolvents_file_path(formula, output_path)
+    checkpoint_path = output_path + ".checkpoint"
+    parameters = {"formula": os.path.abspath(formula), "formula_size": os.path.getsize(formula),
+                  "converge": bool(converge), "more": bool(more), "max_length": max_length, "times": times,
+                  "format": RESOLVENTS_FORMAT}
+
+    checkpoint = read_checkpoint(checkpoint_path, parameters) if exists(output_path) else None
+    if checkpoint is None:
+        f = open(output_path, 'w')
+        write_header(f, converge, more, max_length, times)
+        completed_levels = []
+    else:
+        # Resolvents written after the last checkpoint belong to an incomplete level.
+        f = open(output_path, 'r+')
+        f.truncate(checkpoint[1])
+        completed_levels = read_levels(f)
+        if len(completed_levels) != checkpoint[0]:
+            raise ValueError(f"The resolvents file {output_path} does not match its checkpoint.")
+        f.seek(0, os.SEEK_END)
+
+    def level_done(i, result):
+        f.write(f"c Level {i}\n")
+        f.writelines(str(x) for x in result)
+        f.flush()
+        os.fsync(f.fileno())
+        write_checkpoint(checkpoint_path, parameters, i, f.tell())
+
+    with f:
+        if converge or more:
+            cnf = more_resolution_formula.MoreResolutionFormula(form=cnf, intersect=intersect)
+            # Each level except the last one (which is empty) is written by level_done.
+            cnf.resolve_multiple_times(times=float('inf') if converge else times+1, max_length=max_length,
+                                       workers=workers, completed_levels=completed_levels, level_done=level_done)
+        else:
+            level_done(1, cnf.resolve_all(max_length=max_length))
+
+    if exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+
+
+def resolution_formula(cnf, state, intersect):
+    """
+    Returns the more_resolution_formula.MoreResolutionFormula of the parsed formula `cnf` or, if the file `state` exists,
+    the one saved in this file (see MoreResolutionFormula.save_state), whose levels are continued.
+    Raises a ValueError if the saved formula has other original clauses than `cnf`.
+    """
+    if state is None or not exists(state):
+        return more_resolution_formula.MoreResolutionFormula(form=cnf, intersect=intersect)
+
+    saved = more_resolution_formula.MoreResolutionFormula.load_state(state)
+    n_original = saved.level_starts[0] if saved.level_starts else saved.n_clauses
+    if n_original != cnf.n_clauses or any(saved.clauses[i].variables != cnf.clauses[i].variables for i in range(n_original)):
+        raise ValueError(f"The state {state} belongs to another formula.")
+    return saved
+
+
+
+def cache_path(cache_dir, cnf, parameters):
+    """
+    Returns the path of the cached resolvents file of the parsed formula `cnf` resolved with `parameters` in the folder `cache_dir`.
+    Its name is the SHA-256 hash of the clauses of `cnf` and of `parameters`. The clauses are hashed in their order
+    (which determines the order of the resolvents) with sorted and distinct literals, i.e. comments, whitespace and the order
+    of the literals in the cnf-file do not change the hash.
+    """
+    literals, lengths = cnf.clause_array()
+    h = hashlib.sha256()
+    h.update(json.dumps(dict(parameters, version=CACHE_VERSION, n_clauses=cnf.n_clauses), sort_keys=True).encode())
+    h.update(lengths.tobytes())
+    h.update(literals.tobytes())
+    return join(cache_dir, h.hexdigest() + ".resolvents")
+
+
+
+def store_in_cache(path, cached):
+    """Copies the resolvents file `path` to the cache file `cached` (atomically, a killed run leaves no incomplete file)."""
+    os.makedirs(os.path.dirname(cached), exist_ok=True)
+    shutil.copyfile(path, f"{cached}.{os.getpid()}.tmp")
+    os.replace(f"{cached}.{os.getpid()}.tmp", cached)
+
+
+
+def resolve_and_write(formula, output_path=None, converge=False, more=None, max_length=4, times=2, index="sets", workers=1, intersect="subsets", stream=False, state=None, cache_dir=None):
+    """
+    Resolves the formula in the file `formula` and writes the resolvents (see write_resolvents_file).
+    The clause occurrences are stored in the occurrence index backend `index` ("sets" or the more compact "sorted",
+    see occurrence_index.py). The resolvents do not depend on the backend (only their order may differ).
+    With `converge` or `more`, each level is resolved by `workers` processes (the resolvents do not depend on `workers`)
+    and the clauses sharing literals are found with the mode `intersect` (see more_resolution_formula.INTERSECT_MODES).
+    With `stream`, the resolvents are not collected but written level by level and a killed run
+    can be resumed (see stream_resolvents), None is returned.
+    With `state` (only with `converge` or `more`), the resolution is saved to the file `state` after each level
+    and at the end. If this file exists, the saved levels are continued instead of being resolved again
+    (the backends saved in the state are used), e.g. to resume a killed run or to resolve one more level.
+    With `cache_dir`, the resolvents file is copied from the folder `cache_dir` if the same clauses were resolved
+    with the same parameters before (see cache_path), otherwise it is copied to this folder after the resolution.
+    """
+    if state is not None and (stream or not (converge or more)):
+        raise ValueError("A state can only be saved with converge or more (and without stream).")
+    if (stream or cache_dir is not None) and output_path is None:
+        raise ValueError("The resolvents can only be streamed or cached with an output_path.")
+
+    cnf, n_vars, _ = parse_formula.parse_formula(formula, index)
+
+    cached = None
+    if cache_dir is not None:
+        # Only these parameters change the resolvents file (not the number of workers or a state).
+        parameters = {"converge": bool(converge), "more": bool(more), "times": times if more and not converge else None,
+                      "max_length": max_length, "index": index, "intersect": intersect, "stream": bool(stream)}
+        cached = cache_path(cache_dir, cnf, parameters)
+        if exists(cached):
+            print(f"The resolvents of {formula} are taken from the cache ({cached}).")
+            shutil.copyfile(cached, resolvents_file_path(formula, output_path))
+            if stream:
+                return None
+            with open(cached, 'r') as f:
+                return [line for line in f if not line.startswith("c")]
+
+    if stream:
+        stream_resolvents(cnf, formula, output_path, converge, more, max_length, times, workers, intersect)
+        if cached is not None:
+            store_in_cache(resolvents_file_path(formula, output_path), cached)
+        return None
+
     output_list = []
+    save_state = None if state is None else lambda i, result: cnf.save_state(state)
 
     if converge:
-        cnf = more_resolution_formula.MoreResolutionFormula(form=cnf)
-        old_n_clauses = cnf.n_clauses
-        result_dict = cnf.resolve_to_convergence(max_length=max_length)
+        cnf = resolution_formula(cnf, state, intersect)
+        result_dict = cnf.resolve_to_convergence(max_length=max_length, workers=workers, level_done=save_state)
 
         for i in result_dict:
             output_list.extend([str(x) for x in result_dict[i]])
 
     else:
         if more:
-            cnf = more_resolution_formula.MoreResolutionFormula(form=cnf)
-            result_dict = cnf.resolve_multiple_times(times=times+1, max_length=max_length)
+            cnf = resolution_formula(cnf, state, intersect)
+            result_dict = cnf.resolve_multiple_times(times=times+1, max_length=max_length, workers=workers, level_done=save_state)
         else:
             result_dict = {1: cnf.resolve_all(max_length=max_length)}
 
         for i in result_dict:
             output_list.extend([str(x) for x in result_dict[i]])
 
+    if state is not None:
+        cnf.save_state(state)
     
     if output_path is not None:
         write_resolvents_file(formula, output_path, converge, more, max_length, times, output_list)
+        if cached is not None:
+            store_in_cache(resolvents_file_path(formula, output_path), cached)
     else:
         print(output_list)
 
@@ -75,6 +290,12 @@ if __name__ == '__main__':
     parser.add_argument("--converge", default=False, action="store_true" , help="Perform resolution until no new clauses are added?")
     parser.add_argument('-t', '--times', default=2, type=int, help="The number of resolution rounds. Only used if --more is used.")
     parser.add_argument('-l', '--max_length', default=4, type=int, help="The maximal length.")    
+    parser.add_argument('--index', default="sets", choices=INDEX_BACKENDS, help="The backend storing the clause occurrences (sorted needs less memory).")
+    parser.add_argument('-w', '--workers', default=1, type=int, help="The number of processes resolving each level (only used with --more or --converge).")
+    parser.add_argument('--intersect', default="subsets", choices=more_resolution_formula.INTERSECT_MODES, help="How clauses sharing literals are found (postings needs less memory).")
+    parser.add_argument('--stream', default=False, action="store_true", help="Write the resolvents level by level (a killed run is resumed from the last completed level).")
+    parser.add_argument('--state', default=None, type=str, help="Save the resolution to this file after each level and continue the levels saved in it (only used with --more or --converge).")
+    parser.add_argument('--cache_dir', default=None, type=str, help="Take the resolvents from this folder if the same clauses were resolved with the same parameters before (and store them there otherwise).")
     args = parser.parse_args()
 
-    resolve_and_write(args.formula, args.output_path, args.converge, args.more, args.max_length, args.times)
+    resolve_and_write(args.formula, args.output_path, args.converge, args.more, args.max_length, args.times, args.index, args.workers, args.intersect, args.stream, args.state, args.cache_dir)
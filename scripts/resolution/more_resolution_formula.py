@@ -1,10 +1,23 @@
 import clause as clause
 import formula as formula
 import cython_functions
+from occurrence_index import new_occurrence_index
 
-from collections import defaultdict
-from itertools import combinations, chain
+from itertools import combinations, chain, repeat
+from collections import Counter
 from sys import stderr
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+
+# How resolve_all finds the clauses sharing at least `min_intersect` literals with a clause:
+# "subsets":  Every clause is stored under each of its subsets of at most `needed_intersect` literals
+#             (multiple_lit_occ_dict) and the occurrences of the subsets of the clause are looked up.
+# "postings": No additional index. The occurrences of the literals of the clause (length_variable_dict)
+#             are intersected with the candidates and the shared literals are counted.
+INTERSECT_MODES = ["subsets", "postings"]
 
 
 def find_combinations(rights_candidate, subset_occ):
@@ -12,13 +25,22 @@ def find_combinations(rights_candidate, subset_occ):
 
 class MoreResolutionFormula(formula.Formula):
 
-    def __init__(self, form = None):
-        formula.Formula.__init__(self)
+    def __init__(self, form = None, index="sets", intersect="subsets"):
+        formula.Formula.__init__(self, index if form is None else form.index)
+        if intersect not in INTERSECT_MODES:
+            raise ValueError("intersect has to be one of {}.".format(", ".join(INTERSECT_MODES)))
+        self.intersect = intersect
         self.max_length = None
         self.multiple_lit_occ_dict = {}
-        self.already_resolved = set()
         # A set containing the clauses which were deregisted.
         self.deregistered_clauses = set()
+        # The clauses with an index below n_checked_clauses were checked for subsumption (see add_all_clauses).
+        self.n_checked_clauses = 0
+        # For each call of add_all_clauses which added clauses (i.e. for each level): the numbers of added clauses,
+        # of added clauses which are subsumed (forward) and of former clauses which are subsumed by the added ones (backward).
+        self.subsumption_counters = []
+        # The index of the first clause added on each level resolved so far (see resolve_multiple_times).
+        self.level_starts = []
         if form != None:
             self.n_variables = form.n_variables
             self.n_clauses = form.n_clauses
@@ -65,17 +87,19 @@ class MoreResolutionFormula(formula.Formula):
                             self.needed_intersect = max(self.needed_intersect, temp_intersect)
 
         for l in range(1, self.needed_intersect+1):
-            self.multiple_lit_occ_dict[l] = defaultdict(set)
+            self.multiple_lit_occ_dict[l] = new_occurrence_index(self.index)
         for i in range(self.n_clauses):
             self.add_clause_to_multiple_occ_dict(i, self.needed_intersect)
 
             
 
     def add_clause_to_multiple_occ_dict(self, index, intersect):
+        if self.intersect != "subsets":
+            return
         clause_vars = self.clauses[index].variables
         for l in range(1, intersect+1):
             for var_subset in combinations(clause_vars, l):
-                self.multiple_lit_occ_dict[l][frozenset(var_subset)].add(index)
+                self.multiple_lit_occ_dict[l].add(frozenset(var_subset), index)
 
     def add_all_clauses(self, clauses):
         """
@@ -85,23 +109,59 @@ class MoreResolutionFormula(formula.Formula):
         """
         added_clauses = []
         for c in clauses:
-            if not c.hash in self.clause_hash_values:
+            if not self.clause_hash_values.contains(c.variables, c.hash):
                 self.add_clause(c)
                 added_clauses.append(c)
 
-        for i in self.clauses:
-            if i in self.deregistered_clauses:
-                continue
-            c_vars = self.clauses[i].variables
-            for var_combination in chain.from_iterable(
-                    combinations(c_vars, r) for r in range(1, len(c_vars))):
-                if cython_functions.hash_value(var_combination) in self.clause_hash_values:
-                    #print("subsumed clause:", c_vars, "subsumed by:", list(var_combination))
-                    self.deregister_clause(i)
-                    break
-                
+        # The subsumption is checked incrementally: Only the clauses which were added since the last check
+        # (all clauses on the first call) can be subsumed by or subsume clauses which were not subsumed before.
+        new_clauses = range(self.n_checked_clauses, self.n_clauses)
+        if len(new_clauses) == 0:
+            return added_clauses
+
+        # Forward subsumption: a new clause is subsumed if a proper subset of it is a clause of the formula.
+        forward = 0
+        for i in new_clauses:
+            if self.is_subsumed(i):
+                self.deregister_clause(i)
+                forward += 1
+
+        # Backward subsumption: a former clause is subsumed if a new clause is a proper subset of it.
+        backward = 0
+        for i in new_clauses:
+            backward += self.deregister_subsumed_clauses(i, self.n_checked_clauses)
+
+        self.n_checked_clauses = self.n_clauses
+        self.subsumption_counters.append({"added": len(added_clauses), "forward": forward, "backward": backward})
         return added_clauses
 
+    def is_subsumed(self, index):
+        # Returns True if a proper subset of the clause at `index` is a clause of the formula.
+        c_vars = self.clauses[index].variables
+        for var_combination in chain.from_iterable(
+                combinations(c_vars, r) for r in range(1, len(c_vars))):
+            if self.clause_hash_values.contains(var_combination, cython_functions.hash_value(var_combination)):
+                #print("subsumed clause:", c_vars, "subsumed by:", list(var_combination))
+                return True
+        return False
+
+    def deregister_subsumed_clauses(self, index, max_index):
+        # Deregisters the clauses with an index below `max_index` which contain the clause at `index` as a proper subset.
+        # For each greater length, these are the clauses in the intersection of the occurrences of its literals
+        # in the length_variable_dict (which only contains clauses that are not deregistered).
+        # Returns the number of deregistered clauses.
+        c_vars = self.clauses[index].variables
+        if len(c_vars) == 0:
+            return 0
+        subsumed = []
+        for length in range(len(c_vars)+1, self.current_max_length+1):
+            occurrences = sorted((self.length_variable_dict[(length, v)] for v in c_vars), key=len)
+            subsumed.extend(i for i in set(occurrences[0]).intersection(*occurrences[1:]) if i < max_index)
+        subsumed.sort()
+        for i in subsumed:
+            self.deregister_clause(i)
+        return len(subsumed)
+
 
     def add_clause(self, c):
         super().add_clause(c)
@@ -116,24 +176,39 @@ class MoreResolutionFormula(formula.Formula):
         c = self.clauses[clause_index]
         length = len(c.variables)
         for v in c.variables:
-            self.length_variable_dict[(length, v)].remove(clause_index)
+            self.length_variable_dict.remove((length, v), clause_index)
 
-        if not (self.max_length is None):
+        if not (self.max_length is None) and self.intersect == "subsets":
             for l in range(1, self.needed_intersect + 1):
                 for var_subset in combinations(c.variables, l):
-                    self.multiple_lit_occ_dict[l][frozenset(var_subset)].remove(clause_index)
+                    self.multiple_lit_occ_dict[l].remove(frozenset(var_subset), clause_index)
 
     def resolve_all_add_to_formula(self, min_index=0, max_length=4):
         resolvents = self.resolve_all(min_index=min_index, max_length=max_length)
         return self.add_all_clauses(resolvents)
 
-    def resolve_all(self, min_index=0, max_length=4, parents=False):
+    def resolve_all(self, min_index=0, max_length=4, parents=False, workers=1):
         if self.max_length is None:
             self.build_multiple_occ_dict(max_length)
 
+        if workers > 1:
+            return self.resolve_all_parallel(min_index, max_length, parents, workers)
+
         resolvents = []
+        for _, _, lit, left, right in self.resolvable_pairs(min_index):
+            resolvent = self.resolve_on_variable(left, right, lit, max_length, parents)
+            if resolvent is not None:
+                resolvents.append(resolvent)
+        return resolvents
+
+    def resolvable_pairs(self, min_index=0, variables=None):
+        """
+        Yields the pairs of clauses which are resolved by resolve_all as tuples (i, j, lit, left, right):
+        The clause `left` (with index at least `min_index`) has length i and contains `lit`,
+        the clause `right` has length j and contains -`lit`. Each pair is yielded only once (see new_pairs).
+        If `variables` (a set) is given, only the literals of these variables are resolved.
+        """
         for i in range(1, self.current_max_length+1):
-            clauses_left = self.length_dict[i]
             for j in range(1, self.current_max_length+1):
                 min_intersect = i+j-2-self.max_length
                 # If the min_intersect is greater than the maximal needed intersection,
@@ -141,54 +216,112 @@ class MoreResolutionFormula(formula.Formula):
                 # The maximal needed intersection is calculated in build_multiple_occ_dict.
                 if min_intersect > self.needed_intersect:
                     continue
-                clauses_right = self.length_dict[j]
                 for lit in range(-self.n_variables, self.n_variables+1):
-                    lefts = self.length_variable_dict[(i, lit)]
+                    if variables is not None and abs(lit) not in variables:
+                        continue
+                    lefts = self.length_variable_dict.since((i, lit), min_index)
                     if min_intersect <= 0:
                         rights = self.length_variable_dict[(j, -lit)]
-                        resolvents.extend(self.resolve_two_sets(lefts, rights, lit, min_index=min_index, max_length=max_length, parents=parents))
+                        for left in lefts:
+                            for right in self.new_pairs(left, rights, min_index):
+                                yield i, j, lit, left, right
                     else:
-                        for left in filter(lambda x: x >= min_index, lefts):
-                            for C in combinations(self.clauses[left].variables, min_intersect):
-                                rights = self.length_variable_dict[(j, -lit)].intersection(self.multiple_lit_occ_dict[min_intersect][frozenset(C)])
-                                resolvents.extend(self.resolve_clause_with_set(left, rights, lit, max_length, parents))
+                        for left in lefts:
+                            rights = self.intersecting_clauses(left, lit, j, min_intersect)
+                            for right in self.new_pairs(left, rights, min_index):
+                                yield i, j, lit, left, right
 
-        return resolvents
-                    
+    def intersecting_clauses(self, left, lit, length, min_intersect):
+        """
+        Returns the clauses of length `length` which contain -`lit` and share at least `min_intersect` literals
+        with the clause `left` (each clause once, see INTERSECT_MODES).
+        """
+        if self.intersect == "subsets":
+            # A clause is found for every common subset C of both clauses (the dict keeps the order of the first occurrence).
+            found = {}
+            for C in combinations(self.clauses[left].variables, min_intersect):
+                for right in self.length_variable_dict.intersection((length, -lit), self.multiple_lit_occ_dict[min_intersect][frozenset(C)]):
+                    found[right] = None
+            return found
 
-    def resolve_two_sets(self, lefts, rights, literal,min_index=0, max_length=4, parents=False):
-        if len(lefts) == 0 or len(rights) == 0:
-            return []
-        resolvents = []
-        for left in filter(lambda x: x >= min_index, lefts):
-            for right in rights:
-                if (left, right) in self.already_resolved or (right, left) in self.already_resolved:
-                    continue
-                self.already_resolved.add((left, right))
-                resolvent = self.resolve_on_variable(left, right, literal, max_length, parents)
-                if resolvent is not None:
-                    resolvents.append(resolvent)
-        return resolvents
+        rights = self.length_variable_dict[(length, -lit)]
+        shared = Counter()
+        for v in self.clauses[left].variables:
+            if v != lit:
+                shared.update(self.length_variable_dict.intersection((length, v), rights))
+        return sorted(right for right, count in shared.items() if count >= min_intersect)
 
-    def resolve_clause_with_set(self, left, rights, literal, max_length=4, parents=False):
-        resolvents = []
+    def new_pairs(self, left, rights, min_index):
+        # Yields the clauses `right` of `rights` which are resolved with the clause `left` (where left >= min_index).
+        # If both clauses are new (right >= min_index), the pair is also found as (right, left) with the negated literal.
+        # It is only resolved in the order left <= right. Pairs of two old clauses were resolved on a former level.
+        # Hence, each pair is resolved once without storing the resolved pairs.
         for right in rights:
-            if (left, right) in self.already_resolved or (right, left) in self.already_resolved:
-                continue
-            self.already_resolved.add((left, right))
-            resolvent = self.resolve_on_variable(left, right, literal, max_length, parents)
-            if resolvent is not None:
-                resolvents.append(resolvent)
+            if right < min_index or left <= right:
+                yield right
+
+    def resolve_all_parallel(self, min_index, max_length, parents, workers):
+        """
+        Resolves as resolve_all, but with `workers` processes.
+        The variables are distributed among the processes. Each process works on a copy of the formula (created by fork)
+        and resolves the pairs of clauses on the literals of its variables. A pair of clauses is resolved on a literal and
+        its negation only, hence no pair is resolved by two processes. The resolvents are merged in the order of resolve_all,
+        thus the result is the same as the result of resolve_all.
+        """
+        global _forked_formula
+        _forked_formula = self
+
+        # Small interleaved groups of variables, such that the processes get a similar amount of work.
+        n_groups = min(4 * workers, max(self.n_variables, 1))
+        groups = [set(range(k, self.n_variables+1, n_groups)) for k in range(1, n_groups+1)]
+
+        candidates = []
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("fork")) as executor:
+                for group_candidates in executor.map(_resolve_variables, repeat(min_index), repeat(max_length), groups):
+                    candidates.extend(group_candidates)
+        finally:
+            _forked_formula = None
+
+        # Each group contains the resolvents of its literals in the order of resolve_all.
+        candidates.sort(key=lambda candidate: candidate[:3])
+        resolvents = []
+        for _, _, _, left, right, variables in candidates:
+            resolvent = clause.Clause()
+            resolvent.set_variables(variables)
+            if parents:
+                resolvent.set_parents(self.clauses[left], self.clauses[right])
+            resolvents.append(resolvent)
         return resolvents
 
-   
-            
-    def resolve_multiple_times(self, times=2, max_length=4, parents=False):
-        result_dict = {}
-        old_n_clauses = self.n_clauses
-        result = self.resolve_all(max_length=max_length, min_index=0, parents=parents)
-        result = self.add_all_clauses(result)
-        i = 1
+    def level_clauses(self, level):
+        # Returns the clauses added on the level `level` (they have consecutive indices).
+        end = self.level_starts[level] if level < len(self.level_starts) else self.n_clauses
+        return [self.clauses[i] for i in range(self.level_starts[level-1], end)]
+
+    def resolve_multiple_times(self, times=2, max_length=4, parents=False, workers=1, completed_levels=(), level_done=None):
+        # The levels which were resolved before (by a former call or in a state loaded with load_state) are continued.
+        # `completed_levels` are the resolvents of the first levels of a former run with the same parameters
+        # (e.g. read from a streamed resolvents file), they are added to the formula again instead of being resolved.
+        # `level_done(i, result)` is called as soon as the level i (which was not completed before) is complete.
+        if self.level_starts and self.max_length != max_length:
+            raise ValueError(f"The levels were resolved with max_length {self.max_length}.")
+        if self.max_length is None:
+            self.build_multiple_occ_dict(max_length)
+
+        for level in completed_levels:
+            self.level_starts.append(self.n_clauses)
+            self.add_all_clauses(level)
+        known_levels = len(self.level_starts)
+        if known_levels == 0:
+            self.level_starts.append(self.n_clauses)
+            self.add_all_clauses(self.resolve_all(max_length=max_length, min_index=0, parents=parents, workers=workers))
+
+        # The levels of a former call beyond `times` are not returned.
+        i = min(len(self.level_starts), times)
+        result_dict = {level: self.level_clauses(level) for level in range(1, i)}
+        old_n_clauses = self.level_starts[i-1]
+        result = self.level_clauses(i)
         while i < times and len(result) > 0:
             unit_counter = 0
             binary_counter = 0
@@ -205,8 +338,11 @@ class MoreResolutionFormula(formula.Formula):
                 f"{binary_counter} binary, and {ternary_counter} ternary clauses this level. "
                 f"In total {self.n_clauses} clauses and {len(self.deregistered_clauses)} subsumed clauses.")
             result_dict[i] = result
-            result = self.resolve_all(max_length=max_length, min_index=old_n_clauses, parents=parents)
+            if level_done is not None and i > known_levels:
+                level_done(i, result)
+            result = self.resolve_all(max_length=max_length, min_index=old_n_clauses, parents=parents, workers=workers)
             old_n_clauses = self.n_clauses
+            self.level_starts.append(old_n_clauses)
             result = self.add_all_clauses(result)
             i += 1
 
@@ -215,5 +351,63 @@ class MoreResolutionFormula(formula.Formula):
         result_dict[i] = result
         return result_dict
 
-    def resolve_to_convergence(self, max_length=4, parents=False):
-        return self.resolve_multiple_times(times=float('inf'), max_length=max_length, parents=parents)
+    def resolve_to_convergence(self, max_length=4, parents=False, workers=1, completed_levels=(), level_done=None):
+        return self.resolve_multiple_times(times=float('inf'), max_length=max_length, parents=parents, workers=workers,
+                                           completed_levels=completed_levels, level_done=level_done)
+
+    def save_state(self, path):
+        """
+        Saves the formula and the state of the resolution (the clauses, the deregistered clauses, the levels and
+        the counters of the subsumption) to the NumPy file `path` (see numpy.savez), such that load_state can
+        continue the resolution without resolving the former levels again. The parents of the clauses are not saved.
+        The file is replaced atomically, i.e. a killed process leaves the former or the new state.
+        """
+        literals, lengths = self.clause_array()
+        counters = [[counter["added"], counter["forward"], counter["backward"]] for counter in self.subsumption_counters]
+        with open(path + ".tmp", 'wb') as f:
+            np.savez(f,
+                     n_variables=self.n_variables,
+                     max_length=-1 if self.max_length is None else self.max_length,
+                     index=self.index,
+                     intersect=self.intersect,
+                     literals=literals,
+                     lengths=lengths,
+                     deregistered_clauses=np.array(sorted(self.deregistered_clauses), dtype=np.int64),
+                     n_checked_clauses=self.n_checked_clauses,
+                     subsumption_counters=np.array(counters, dtype=np.int64).reshape(-1, 3),
+                     level_starts=np.array(self.level_starts, dtype=np.int64))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load_state(cls, path):
+        """Returns the MoreResolutionFormula saved with save_state in the file `path`."""
+        with np.load(path) as state:
+            cnf = cls(index=str(state["index"]), intersect=str(state["intersect"]))
+            cnf.set_n_vars(int(state["n_variables"]))
+            cnf.add_clause_array(state["literals"], state["lengths"])
+            if state["max_length"] >= 0:
+                cnf.build_multiple_occ_dict(int(state["max_length"]))
+            for i in state["deregistered_clauses"].tolist():
+                cnf.deregister_clause(i)
+            cnf.n_checked_clauses = int(state["n_checked_clauses"])
+            cnf.subsumption_counters = [{"added": added, "forward": forward, "backward": backward}
+                                        for added, forward, backward in state["subsumption_counters"].tolist()]
+            cnf.level_starts = state["level_starts"].tolist()
+        return cnf
+
+
+
+# The formula resolved by the processes of MoreResolutionFormula.resolve_all_parallel (inherited by fork).
+_forked_formula = None
+
+def _resolve_variables(min_index, max_length, variables):
+    # Returns the resolvents of the pairs of _forked_formula.resolvable_pairs(min_index, variables)
+    # as tuples (i, j, lit, left, right, literals of the resolvent).
+    candidates = []
+    for i, j, lit, left, right in _forked_formula.resolvable_pairs(min_index, variables):
+        resolvent = _forked_formula.resolve_on_variable(left, right, lit, max_length)
+        if resolvent is not None:
+            candidates.append((i, j, lit, left, right, resolvent.variables))
+    return candidates
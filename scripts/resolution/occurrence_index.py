@@ -0,0 +1,129 @@
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+
+# An occurrence index maps keys (e.g. literals, pairs (length, literal) or sets of literals) to the indices of the clauses
+# in which they occur. Two backends are available:
+#
+# "sets":   A defaultdict(set) (the standard). Lookups with a minimal index have to check every occurrence.
+# "sorted": The indices of each key are stored in a sorted array of 32-bit integers (4 bytes per occurrence
+#           instead of about 70 bytes in a set). Lookups with a minimal index use binary search.
+#
+# Both backends provide add, add_many, remove, since and intersection. Indexing (index[key]) returns the occurrences of the key.
+
+INDEX_BACKENDS = ["sets", "sorted"]
+
+
+def new_occurrence_index(backend="sets"):
+    """Returns an empty occurrence index with the given backend (one of INDEX_BACKENDS)."""
+    if backend == "sets":
+        return SetOccurrenceIndex()
+    if backend == "sorted":
+        return SortedOccurrenceIndex()
+    raise ValueError("The index backend has to be one of {}.".format(", ".join(INDEX_BACKENDS)))
+
+
+
+class SetOccurrenceIndex(defaultdict):
+    """Occurrence index storing the indices of each key in a set."""
+
+    def __init__(self, *args):
+        # The arguments are ignored, they are only passed when the index is copied or pickled.
+        super().__init__(set)
+
+    def add(self, key, index):
+        self[key].add(index)
+
+    def add_many(self, key, indices):
+        self[key].update(indices)
+
+    def remove(self, key, index):
+        self[key].remove(index)
+
+    def since(self, key, min_index=0):
+        """Returns the indices >= min_index of `key`."""
+        occurrences = self[key]
+        if min_index > 0:
+            return [index for index in occurrences if index >= min_index]
+        return occurrences
+
+    def intersection(self, key, indices):
+        """Returns the indices of `key` which are also in `indices`."""
+        return self[key].intersection(indices)
+
+
+
+class SortedOccurrenceIndex:
+    """Occurrence index storing the indices of each key in a sorted array.
+
+    Clauses are appended to a formula with increasing indices, so adding an index is an append in almost all cases.
+    """
+
+    # The occurrences of keys which do not occur (never changed).
+    EMPTY = array('i')
+
+    def __init__(self):
+        self._occurrences = {}
+
+    def __getitem__(self, key):
+        return self._occurrences.get(key, self.EMPTY)
+
+    def __contains__(self, key):
+        return key in self._occurrences
+
+    def __len__(self):
+        return len(self._occurrences)
+
+    def keys(self):
+        return self._occurrences.keys()
+
+    def add(self, key, index):
+        occurrences = self._occurrences.get(key)
+        if occurrences is None:
+            occurrences = self._occurrences[key] = array('i')
+        if not occurrences or occurrences[-1] < index:
+            occurrences.append(index)
+        else:
+            position = bisect_left(occurrences, index)
+            if position == len(occurrences) or occurrences[position] != index:
+                occurrences.insert(position, index)
+
+    def add_many(self, key, indices):
+        """Adds the list of indices `indices` (in increasing order) to the occurrences of `key`."""
+        occurrences = self._occurrences.get(key)
+        if occurrences is None:
+            self._occurrences[key] = array('i', indices)
+        elif not occurrences or not indices or occurrences[-1] < indices[0]:
+            occurrences.extend(indices)
+        else:
+            for index in indices:
+                self.add(key, index)
+
+    def remove(self, key, index):
+        occurrences = self._occurrences.get(key, self.EMPTY)
+        position = bisect_left(occurrences, index)
+        if position == len(occurrences) or occurrences[position] != index:
+            raise KeyError(index)
+        del occurrences[position]
+
+    def since(self, key, min_index=0):
+        """Returns the indices >= min_index of `key` (in increasing order)."""
+        occurrences = self[key]
+        if min_index > 0:
+            return occurrences[bisect_left(occurrences, min_index):]
+        return occurrences
+
+    def intersection(self, key, indices):
+        """Returns the indices of `key` which are also in `indices` (in increasing order).
+        `indices` can be a set or a sorted array (e.g. the occurrences of another SortedOccurrenceIndex).
+        """
+        occurrences = self[key]
+        if not occurrences or not indices:
+            return []
+        if isinstance(indices, (set, frozenset)):
+            return sorted(indices.intersection(occurrences))
+        # Build the set of the shorter array only.
+        if len(indices) < len(occurrences):
+            return sorted(set(indices).intersection(occurrences))
+        return sorted(set(occurrences).intersection(indices))
+
@@ -1,6 +1,17 @@
+import io
+import re
+import warnings
+import numpy as np
+
 import formula as form
 import clause as clause
 
+# Lines starting with one of these characters do not contain clauses (comments, the problem line and the end marker of SATLIB files).
+NON_CLAUSE_LINE = re.compile(rb'^[cp%].*$', re.MULTILINE)
+PROBLEM_LINE = re.compile(rb'^p\s+\S+\s+(\d+)\s+(\d+)', re.MULTILINE)
+# The number of bytes parse_file reads at once.
+BLOCK_SIZE = 2**24
+
 def parse_line(line):
     if line.startswith('c') or line.startswith('p'):
         return None
@@ -23,8 +34,8 @@ def parse_length(lines):
     print("Error: No problem definition.")
     quit()
 
-def parse_lines(lines):
-    formula = form.Formula()
+def parse_lines(lines, index="sets"):
+    formula = form.Formula(index)
     (n_vars, m_clauses) = parse_length(lines)
     formula.set_n_vars(n_vars)
     for line in lines:
@@ -36,10 +47,102 @@ def parse_lines(lines):
     return (formula, n_vars, m_clauses)
 
 
-def parse_formula(filepath):
-    with open(filepath, 'r') as f:
-        lines = f.readlines()
-        return parse_lines(lines)
+def parse_dimacs(data, index="sets"):
+    """Parses the DIMACS formula `data` (bytes) like parse_file (see there)."""
+    return parse_file(io.BytesIO(data), index)
+
+
+def parse_file(f, index="sets", block_size=BLOCK_SIZE):
+    """
+    Parses the DIMACS formula in the binary file object `f` like parse_lines, but in bulk: The file is read in blocks
+    of about `block_size` bytes, which are split at their last newline. The clauses of a block are tokenized by NumPy
+    into a flat array of literals, which is split at the zeros (the literals after the last zero belong to a clause
+    continued in the next block). A clause may span several lines and the literals may be separated by any whitespace.
+    Empty clauses and a last clause without 0 are ignored, repeated literals of a clause are removed.
+
+    Only one block is held in memory at a time, the literals of all blocks are kept as int32 (4 bytes per literal).
+    """
+    problem = None
+    literal_blocks, length_blocks = [], []
+    carry = np.empty(0, dtype=np.int32) # the literals of a clause continued in the next block
+    rest = b''
+    while True:
+        block = f.read(block_size)
+        if block:
+            block = rest + block
+            end = block.rfind(b'\n') + 1
+            if end == 0:
+                rest = block
+                continue
+            block, rest = block[:end], block[end:]
+        else:
+            block, rest = rest, b''
+            if not block:
+                break
+
+        if problem is None:
+            problem = PROBLEM_LINE.search(block)
+
+        literals, lengths, carry = parse_block(block, carry)
+        literal_blocks.append(literals)
+        length_blocks.append(lengths)
+
+    if problem is None:
+        print("Error: No problem definition.")
+        quit()
+    (n_vars, m_clauses) = (int(problem.group(1)), int(problem.group(2)))
+
+    literals = np.concatenate(literal_blocks) if literal_blocks else np.empty(0, dtype=np.int32)
+    del literal_blocks
+    lengths = np.concatenate(length_blocks) if length_blocks else np.empty(0, dtype=np.int32)
+
+    formula = form.Formula(index)
+    formula.set_n_vars(n_vars)
+    formula.add_clause_array(literals, lengths)
+    return (formula, n_vars, m_clauses)
+
+
+def parse_block(block, carry):
+    """
+    Returns the literals (sorted and distinct within each clause) and the lengths of the non-empty clauses
+    ending in the DIMACS lines `block` (bytes), which continue the literals `carry`, and the literals after the last zero.
+    """
+    body = NON_CLAUSE_LINE.sub(b'', block)
+    with warnings.catch_warnings():
+        # NumPy only warns if a token is not an integer.
+        warnings.simplefilter("error", DeprecationWarning)
+        try:
+            tokens = np.fromstring(body, dtype=np.int64, sep=' ')
+        except DeprecationWarning:
+            raise ValueError("The formula contains a token which is not an integer.")
+    del body
+    if len(tokens) > 0 and np.abs(tokens).max() > np.iinfo(np.int32).max:
+        # Such a literal is not a variable of the formula (as in Formula.add_clause_array).
+        raise KeyError(int(tokens[np.abs(tokens).argmax()]))
+    tokens = np.concatenate((carry, tokens.astype(np.int32)))
+
+    # The literals of the i-th clause have the clause number i (the zeros are removed).
+    is_zero = tokens == 0
+    zeros = np.flatnonzero(is_zero)
+    end = zeros[-1] if len(zeros) > 0 else 0
+    carry = tokens[end+1:] if len(zeros) > 0 else tokens
+    clause_numbers = np.cumsum(is_zero[:end], dtype=np.int32)
+    literals = tokens[:end]
+    clause_numbers = clause_numbers[literals != 0]
+    literals = literals[literals != 0]
+
+    # Sort the literals of each clause and remove repeated literals.
+    order = np.lexsort((literals, clause_numbers))
+    literals = literals[order]
+    clause_numbers = clause_numbers[order]
+    del order
+    distinct = np.ones(len(literals), dtype=bool)
+    distinct[1:] = (literals[1:] != literals[:-1]) | (clause_numbers[1:] != clause_numbers[:-1])
+    literals = literals[distinct]
+    lengths = np.bincount(clause_numbers[distinct], minlength=len(zeros)).astype(np.int32)
+    return literals, lengths[lengths > 0], carry
 
 
-        
\ No newline at end of file
+def parse_formula(filepath, index="sets"):
+    with open(filepath, 'rb') as f:
+        return parse_file(f, index)
@@ -1,10 +1,15 @@
 import unittest
+import io
 import os.path
 import sys
 sys.path.insert(0,'..')
 
 import pyximport; pyximport.install(setup_args={})
 import parse_formula as f   # import your stuff
+import cython_functions
+import clause
+import formula as form
+from clause_hashing import ClauseHashSet, zobrist_keys, hash_literals
 
 
 
@@ -49,7 +54,83 @@ class ParseTest(unittest.TestCase):
         resolvent.sort()
         self.assertEqual(resolvent, [-39, 239])
 
-            
+
+    def test_compact_clauses(self):
+        # Klausel 161: 38 -210 1
+        # The literals are stored as a sorted tuple, parents only if they are wanted.
+        self.assertEqual(self.formula.clauses[161].variables, (-210, 1, 38))
+        self.assertFalse(hasattr(self.formula.clauses[161], "__dict__"))
+        resolvent = self.formula.resolve_on_variable(161, 340, -1)
+        self.assertEqual(resolvent.variables, (-210, -98, 38, 87))
+        self.assertEqual(resolvent.get_parents(), ())
+        resolvent = self.formula.resolve_on_variable(161, 340, -1, parents=True)
+        self.assertEqual(resolvent.get_parents(), (self.formula.clauses[161], self.formula.clauses[340]))
+        self.assertEqual(str(resolvent), "-210 -98 38 87 0\n")
+
+
+    def test_resolve_kernel(self):
+        hash_values = ClauseHashSet()
+        resolve = lambda a, b, v, max_length=4: cython_functions.resolve(a, b, v, max_length, hash_values)
+        self.assertEqual(resolve((-3, 1, 2), (-1, 2, 5), 1), (-3, 2, 5))
+        self.assertIsNone(resolve((-3, 1, 2), (-1, 4, 5), 1, max_length=3)) # too long
+        self.assertIsNone(resolve((-3, 1, 2), (-2, -1, 3), 1)) # tautological
+        self.assertEqual(resolve((1,), (-1,), 1), ()) # empty clause
+
+        # Resolvents containing a clause of the formula are subsumed.
+        hash_values.add((-3, 5), cython_functions.hash_value((-3, 5)))
+        self.assertIsNone(resolve((-3, 1, 2), (-1, 2, 5), 1))
+        self.assertEqual(resolve((-3, 1, 2), (-1, 2, 4), 1), (-3, 2, 4))
+
+
+    def test_reseeded_mapping(self):
+        # After the keys are drawn with another seed (for fewer variables than before), the kernel, hash_value
+        # and the bulk parser use the same keys, so subsumed resolvents are still found.
+        n_keys = cython_functions.literal_key_array()[1]
+        try:
+            clause.Clause.init_variable_mapping(10, seed=7)
+            self.assertEqual(cython_functions.hash_value((-3, 5)), hash_literals((-3, 5), zobrist_keys(10, seed=7)))
+            hash_values = ClauseHashSet()
+            hash_values.add((-3, 5), cython_functions.hash_value((-3, 5)))
+            self.assertIsNone(cython_functions.resolve((-3, 1, 2), (-1, 2, 5), 1, 4, hash_values))
+
+            formula = form.Formula()
+            formula.n_variables = 10
+            formula.add_clause_array([-3, 5, 1, 2, 7], [2, 3])
+            self.assertEqual([c.hash for c in formula.clauses.values()], [cython_functions.hash_value((-3, 5)), cython_functions.hash_value((1, 2, 7))])
+        finally:
+            clause.Clause.init_variable_mapping(n_keys)
+
+    def test_bulk_parser(self):
+        # The bulk parser gives the same formula as the line parser.
+        with open(self.filepath, 'r') as file:
+            formula, n, m = f.parse_lines(file.readlines())
+        self.assertEqual((n, m), (250, 1067))
+        self.assertEqual(self.formula.n_clauses, formula.n_clauses)
+        self.assertEqual([c.variables for c in self.formula.clauses.values()], [c.variables for c in formula.clauses.values()])
+        self.assertEqual([c.hash for c in self.formula.clauses.values()], [c.hash for c in formula.clauses.values()])
+        for v in range(-250, 251):
+            self.assertEqual(set(self.formula.variable_dict[v]), set(formula.variable_dict[v]))
+            self.assertEqual(set(self.formula.length_variable_dict[(3, v)]), set(formula.length_variable_dict[(3, v)]))
+        self.assertEqual(set(self.formula.length_dict[3]), set(formula.length_dict[3]))
+
+        # Clauses may span several lines and contain tabs, repeated literals are removed.
+        formula, n, m = f.parse_dimacs(b"c comment\np cnf 5 3\n1 -2\n 3 0\t-4\t5 0\nc comment\n 2 2 0\n0\n%\n0\n")
+        self.assertEqual((n, m), (5, 3))
+        self.assertEqual([c.variables for c in formula.clauses.values()], [(-2, 1, 3), (-4, 5), (2,)])
+        self.assertEqual(formula.current_max_length, 3)
+        with self.assertRaises(ValueError):
+            f.parse_dimacs(b"p cnf 5 1\n1 x 0\n")
+
+        # The file is read in blocks, clauses and lines may be split between the blocks.
+        data = b"c comment\np cnf 5 3\n1 -2\n 3 0\t-4\t5 0\nc comment\n 2 2 0\n0\n%\n0\n4 -1"
+        for block_size in [1, 3, 7, 16, len(data)]:
+            formula, n, m = f.parse_file(io.BytesIO(data), block_size=block_size)
+            self.assertEqual((n, m), (5, 3))
+            self.assertEqual([c.variables for c in formula.clauses.values()], [(-2, 1, 3), (-4, 5), (2,)])
+        with open(self.filepath, 'rb') as file:
+            formula, n, m = f.parse_file(file, block_size=100)
+        self.assertEqual([c.variables for c in self.formula.clauses.values()], [c.variables for c in formula.clauses.values()])
+
     def test_find_partner_clauses_on_variable(self):
         ### Test non-increasing ###
         # Klausel 10: 87 61 109
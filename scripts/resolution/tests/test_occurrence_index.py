@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import os
+import sys
+from array import array
+sys.path.insert(0,'..')
+
+import pyximport; pyximport.install(setup_args={})
+import parse_formula as pf
+import more_resolution_formula as r
+import occurrence_index as oi
+
+
+
+
+class TestOccurrenceIndex(unittest.TestCase):
+
+    def test_sorted_index(self):
+        print(sys._getframe(  ).f_code.co_name)
+        index = oi.new_occurrence_index("sorted")
+        for i in [0, 3, 7, 5, 9, 5]:
+            index.add(1, i)
+        self.assertEqual(list(index[1]), [0, 3, 5, 7, 9])
+        self.assertEqual(list(index[2]), [])
+        self.assertNotIn(2, index)
+
+        self.assertEqual(list(index.since(1, 4)), [5, 7, 9])
+        self.assertEqual(list(index.since(1, 10)), [])
+        self.assertEqual(index.intersection(1, {3, 4, 9}), [3, 9])
+        self.assertEqual(index.intersection(1, array('i', [1, 5, 7, 8, 11])), [5, 7])
+
+        index.remove(1, 5)
+        self.assertEqual(list(index[1]), [0, 3, 7, 9])
+        with self.assertRaises(KeyError):
+            index.remove(1, 5)
+
+        with self.assertRaises(ValueError):
+            oi.new_occurrence_index("bitmaps")
+
+
+    def resolvents(self, path, max_length, index):
+        formula, _, _ = pf.parse_formula(os.path.realpath(path), index=index)
+        cnf = r.MoreResolutionFormula(form=formula)
+        resolvents = cnf.resolve_to_convergence(max_length)
+        return [frozenset(x.variables) for level_results in resolvents.values() for x in level_results]
+
+    def test_same_resolvents(self):
+        print(sys._getframe(  ).f_code.co_name)
+        # Both backends find the same resolvents.
+        for path, max_length in [('./tests/test_instanzen/resolution.cnf', 4),
+                                 ('./tests/test_instanzen/input_res_10.cnf', 9),
+                                 ('./tests/test_instanzen/uf250-01.cnf', 4)]:
+            resolvents = self.resolvents(path, max_length, "sets")
+            self.assertTrue(resolvents)
+            self.assertEqual(set(self.resolvents(path, max_length, "sorted")), set(resolvents))
+
+
+
+if __name__ == '__main__':
+    unittest.main()
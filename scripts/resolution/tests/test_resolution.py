@@ -4,14 +4,17 @@ import unittest
 import os, glob
 from shutil import rmtree, copy2
 import sys
+from unittest import mock
 from copy import deepcopy
 from more_itertools import powerset
+from itertools import combinations
 import sys
 sys.path.insert(0,'..')
 
 import pyximport; pyximport.install(setup_args={})
 import parse_formula as pf
 import more_resolution_formula as r
+import main as m
 
 
 
@@ -218,7 +221,186 @@ class TestResolution(unittest.TestCase):
         expected = list(powerset(range(1,15)))
         expected = [set(x) for x in expected if x != (1,2,3,4,5,6,7,8,9,10,11,12,13,14)]
         self.assert_resolvents_equal_expected(results, expected)
-        
+
+
+    def test_pairs_resolved_once(self):
+        print(sys._getframe(  ).f_code.co_name)
+        # Each pair of clauses is enumerated once per clashing variable (in any order), also on later levels.
+        self.cnf = self.read_cnf('./tests/test_instanzen/uf250-01.cnf')
+        self.cnf.build_multiple_occ_dict(4)
+        old_n_clauses = self.cnf.n_clauses
+        for min_index in [0, old_n_clauses]:
+            pairs = [(frozenset((left, right)), abs(lit)) for _, _, lit, left, right in self.cnf.resolvable_pairs(min_index)]
+            self.assertEqual(len(pairs), len(set(pairs)))
+            self.assertTrue(all(max(pair) >= min_index for pair, _ in pairs))
+            self.cnf.add_all_clauses(self.cnf.resolve_all(min_index=min_index))
+            self.assertGreater(self.cnf.n_clauses, old_n_clauses)
+
+    def test_incremental_subsumption(self):
+        print(sys._getframe(  ).f_code.co_name)
+        # After each level, exactly the clauses with a proper subset in the formula are deregistered.
+        self.cnf = self.read_cnf('./tests/test_instanzen/uf250-01.cnf')
+        n_clauses = self.cnf.n_clauses
+        self.cnf.resolve_multiple_times(times=3, max_length=3)
+        for i in self.cnf.clauses:
+            c_vars = self.cnf.clauses[i].variables
+            subsumed = any(self.cnf.clause_hash_values.contains(subset, r.cython_functions.hash_value(subset))
+                           for l in range(1, len(c_vars)) for subset in combinations(c_vars, l))
+            self.assertEqual(subsumed, i in self.cnf.deregistered_clauses)
+
+        # One counter per level which added clauses (the original clauses are checked on the first level).
+        self.assertEqual(len(self.cnf.subsumption_counters), 3)
+        self.assertEqual(sum(counter["added"] for counter in self.cnf.subsumption_counters), self.cnf.n_clauses - n_clauses)
+        self.assertEqual(sum(counter["forward"] + counter["backward"] for counter in self.cnf.subsumption_counters), len(self.cnf.deregistered_clauses))
+
+    def test_intersect_modes(self):
+        print(sys._getframe(  ).f_code.co_name)
+        # Both modes find the same resolvents on each level.
+        for path, times in [('./tests/test_instanzen/uf250-01.cnf', 3), ('./tests/test_instanzen/k3-n500-m2100-r4.200-s1367145976.cnf', 2)]:
+            results = []
+            for intersect in r.INTERSECT_MODES:
+                cnf = r.MoreResolutionFormula(form=pf.parse_formula(os.path.realpath(path))[0], intersect=intersect)
+                result_dict = cnf.resolve_multiple_times(times=times, max_length=4)
+                results.append({level: sorted(x.variables for x in result_dict[level]) for level in result_dict})
+            self.assertEqual(results[0], results[1])
+
+        with self.assertRaises(ValueError):
+            r.MoreResolutionFormula(intersect="trie")
+
+    def test_parallel(self):
+        print(sys._getframe(  ).f_code.co_name)
+        # The processes find the same resolvents (in the same order and with the same parents) as a single process.
+        for path, max_length in [("./tests/test_instanzen/input_res_10.cnf", 9), ('./tests/test_instanzen/uf250-01.cnf', 4)]:
+            serial = self.read_cnf(path).resolve_multiple_times(times=3, max_length=max_length, parents=True)
+            parallel = self.read_cnf(path).resolve_multiple_times(times=3, max_length=max_length, parents=True, workers=3)
+            self.assertEqual(list(serial), list(parallel))
+            for level in serial:
+                self.assertEqual([str(x) for x in serial[level]], [str(x) for x in parallel[level]])
+                self.assertEqual([[str(p) for p in x.get_parents()] for x in serial[level]],
+                                 [[str(p) for p in x.get_parents()] for x in parallel[level]])
+
+
+    def test_stream(self):
+        print(sys._getframe(  ).f_code.co_name)
+        # The streamed file contains the same resolvents as the collected ones, preceded by a marker per level.
+        path = os.path.realpath('./tests/test_instanzen/uf250-01.cnf')
+        m.resolve_and_write(path, os.path.join(tmpfolder, "collected.resolvents"), more=True, max_length=3, times=3)
+        streamed = os.path.join(tmpfolder, "streamed.resolvents")
+        self.assertIsNone(m.resolve_and_write(path, streamed, more=True, max_length=3, times=3, stream=True))
+        with open(os.path.join(tmpfolder, "collected.resolvents")) as f:
+            collected_lines = f.readlines()
+        with open(streamed) as f:
+            streamed_lines = f.readlines()
+        self.assertEqual([line for line in streamed_lines if not line.startswith("c Level")], collected_lines)
+        self.assertEqual([line for line in streamed_lines if line.startswith("c Level")], ["c Level 1\n", "c Level 2\n", "c Level 3\n"])
+        self.assertFalse(os.path.exists(streamed + ".checkpoint"))
+
+        # The run is killed while resolving the third level (after a part of it was written).
+        resolve_all = r.MoreResolutionFormula.resolve_all
+        calls = []
+        def killed_resolve_all(cnf, *args, **kwargs):
+            calls.append(kwargs["min_index"])
+            if len(calls) == 3:
+                with open(streamed, 'a') as f:
+                    f.write("c Level 3\n1 2 0\n")
+                raise KeyboardInterrupt()
+            return resolve_all(cnf, *args, **kwargs)
+
+        with mock.patch.object(r.MoreResolutionFormula, "resolve_all", killed_resolve_all):
+            with self.assertRaises(KeyboardInterrupt):
+                m.resolve_and_write(path, streamed, more=True, max_length=3, times=3, stream=True)
+            self.assertTrue(os.path.exists(streamed + ".checkpoint"))
+
+            # The resumed run only resolves the levels 3 and 4 (the last level is resolved but not written).
+            calls.clear()
+            m.resolve_and_write(path, streamed, more=True, max_length=3, times=3, stream=True)
+            self.assertEqual(len(calls), 2)
+        with open(streamed) as f:
+            self.assertEqual(f.readlines(), streamed_lines)
+        self.assertFalse(os.path.exists(streamed + ".checkpoint"))
+
+        # A checkpoint of a run with other parameters is ignored.
+        with mock.patch.object(r.MoreResolutionFormula, "resolve_all", killed_resolve_all):
+            calls.clear()
+            with self.assertRaises(KeyboardInterrupt):
+                m.resolve_and_write(path, streamed, more=True, max_length=3, times=3, stream=True)
+        m.resolve_and_write(path, streamed, more=True, max_length=3, times=2, stream=True)
+        with open(streamed) as f:
+            self.assertEqual([line for line in f if line.startswith("c ")], ["c Max length 3\n", "c To level 2\n", "c Resolvents format 2\n", "c Level 1\n", "c Level 2\n"])
+
+    def test_save_state(self):
+        print(sys._getframe(  ).f_code.co_name)
+        # A saved and loaded state continues with the same levels as a single run.
+        path = os.path.realpath('./tests/test_instanzen/uf250-01.cnf')
+        state = os.path.join(tmpfolder, "state.npz")
+        for intersect in r.INTERSECT_MODES:
+            cnf = r.MoreResolutionFormula(form=pf.parse_formula(path)[0], intersect=intersect)
+            result_dict = cnf.resolve_multiple_times(times=4, max_length=3)
+
+            saved = r.MoreResolutionFormula(form=pf.parse_formula(path)[0], intersect=intersect)
+            saved.resolve_multiple_times(times=2, max_length=3)
+            saved.save_state(state)
+            loaded = r.MoreResolutionFormula.load_state(state)
+            self.assertEqual(loaded.intersect, intersect)
+            self.assertEqual([c.variables for c in loaded.clauses.values()], [c.variables for c in saved.clauses.values()])
+            continued = loaded.resolve_multiple_times(times=4, max_length=3)
+
+            self.assertEqual({level: sorted(x.variables for x in result_dict[level]) for level in result_dict},
+                             {level: sorted(x.variables for x in continued[level]) for level in continued})
+            self.assertEqual(loaded.deregistered_clauses, cnf.deregistered_clauses)
+            self.assertEqual(loaded.subsumption_counters, cnf.subsumption_counters)
+            self.assertEqual(loaded.level_starts, cnf.level_starts)
+            with self.assertRaises(ValueError):
+                loaded.resolve_multiple_times(times=5, max_length=4)
+
+        # resolve_and_write continues the saved state: the first run resolves the levels 1 to 3 (and writes 1 and 2),
+        # the second one only resolves the level 4.
+        m.resolve_and_write(path, os.path.join(tmpfolder, "level3.resolvents"), more=True, max_length=3, times=3)
+        os.remove(state)
+        m.resolve_and_write(path, os.path.join(tmpfolder, "continued.resolvents"), more=True, max_length=3, times=2, state=state)
+        resolve_all = r.MoreResolutionFormula.resolve_all
+        calls = []
+        def counted_resolve_all(cnf, *args, **kwargs):
+            calls.append(kwargs["min_index"])
+            return resolve_all(cnf, *args, **kwargs)
+        with mock.patch.object(r.MoreResolutionFormula, "resolve_all", counted_resolve_all):
+            m.resolve_and_write(path, os.path.join(tmpfolder, "continued.resolvents"), more=True, max_length=3, times=3, state=state)
+        self.assertEqual(len(calls), 1)
+        with open(os.path.join(tmpfolder, "level3.resolvents")) as f:
+            expected = sorted(f)
+        with open(os.path.join(tmpfolder, "continued.resolvents")) as f:
+            self.assertEqual(sorted(f), expected)
+
+        with self.assertRaises(ValueError):
+            m.resolve_and_write('./tests/test_instanzen/input_res_10.cnf', tmpfolder, more=True, max_length=3, times=3, state=state)
+
+    def test_cache(self):
+        print(sys._getframe(  ).f_code.co_name)
+        # The cached resolvents file is used for the same clauses and parameters, but not for other parameters.
+        path = os.path.realpath('./tests/test_instanzen/uf250-01.cnf')
+        cache_dir = os.path.join(tmpfolder, "cache")
+        output = os.path.join(tmpfolder, "resolvents")
+        os.makedirs(output)
+        resolvents = m.resolve_and_write(path, output, more=True, max_length=3, times=2, cache_dir=cache_dir)
+        self.assertEqual(len(os.listdir(cache_dir)), 1)
+        with open(os.path.join(output, "uf250-01.resolvents")) as f:
+            expected = f.read()
+
+        # Comments, whitespace and the order of the literals of a clause do not change the resolvents.
+        with open(path) as f:
+            lines = f.readlines()
+        renamed = os.path.join(tmpfolder, "renamed.cnf")
+        with open(renamed, 'w') as f:
+            f.write("c another comment\n")
+            f.writelines(line if line.startswith(("c", "p", "%")) else " ".join(reversed(line.split()[:-1])) + "  0\n" for line in lines)
+        with mock.patch.object(r.MoreResolutionFormula, "resolve_all", side_effect=AssertionError("The resolvents are not cached.")):
+            self.assertEqual(m.resolve_and_write(renamed, output, more=True, max_length=3, times=2, cache_dir=cache_dir, workers=2), resolvents)
+        with open(os.path.join(output, "renamed.resolvents")) as f:
+            self.assertEqual(f.read(), expected)
+
+        m.resolve_and_write(path, output, more=True, max_length=3, times=3, cache_dir=cache_dir)
+        m.resolve_and_write(path, output, more=True, max_length=3, times=3, cache_dir=cache_dir, stream=True)
+        self.assertEqual(len(os.listdir(cache_dir)), 3)
 
 
   
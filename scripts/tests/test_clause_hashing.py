@@ -0,0 +1,78 @@
+import unittest
+import os
+import sys
+
+BASE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BASE_PATH)
+
+import clause_hashing as h
+
+
+class TestClauseHashing(unittest.TestCase):
+
+    def test_hash_is_order_independent(self):
+        print(sys._getframe(  ).f_code.co_name)
+        keys = h.zobrist_keys(100)
+        self.assertEqual(h.hash_literals([1, -2, 3], keys), h.hash_literals([3, 1, -2], keys))
+        self.assertNotEqual(h.hash_literals([1, -2, 3], keys), h.hash_literals([1, 2, 3], keys))
+        # The keys are cached per n and reproducible.
+        self.assertIs(keys, h.zobrist_keys(100))
+        self.assertTrue(all(0 <= value < 2**64 for value in keys.values()))
+        # The keys for fewer variables are a prefix of the keys for more variables.
+        small_keys = h.zobrist_keys(10)
+        self.assertTrue(all(keys[l] == small_keys[l] for l in small_keys))
+
+
+    def test_collisions_are_resolved_exactly(self):
+        print(sys._getframe(  ).f_code.co_name)
+        # We force collisions by passing the same hash value for distinct clauses.
+        clauses = h.ClauseHashSet()
+        self.assertTrue(clauses.add((1, 2), 7))
+        self.assertTrue(clauses.add((1, 3), 7))
+        self.assertTrue(clauses.add((2, 3), 7))
+        self.assertFalse(clauses.add((2, 1), 7))
+        self.assertEqual(len(clauses), 3)
+        self.assertEqual(clauses.n_collisions, 2)
+
+        self.assertTrue(clauses.contains((3, 1), 7))
+        self.assertFalse(clauses.contains((1, 4), 7))
+        self.assertFalse(clauses.contains((1, 2), 8))
+
+        clauses.remove((1, 2), 7)
+        self.assertFalse(clauses.contains((1, 2), 7))
+        self.assertTrue(clauses.contains((1, 3), 7))
+        self.assertTrue(clauses.contains((2, 3), 7))
+        clauses.remove((2, 3), 7)
+        clauses.remove((1, 3), 7)
+        self.assertEqual(len(clauses), 0)
+        with self.assertRaises(KeyError):
+            clauses.remove((1, 3), 7)
+
+
+    def test_bloom_filter(self):
+        print(sys._getframe(  ).f_code.co_name)
+        # The bits of all stored hash values are set, also after the filter grew.
+        def passes(bloom, h):
+            mask = 8*len(bloom) - 1
+            return all((bloom[bit >> 3] >> (bit & 7)) & 1 for bit in (h & mask, (h >> 32) & mask))
+
+        keys = h.zobrist_keys(100)
+        clauses = h.ClauseHashSet()
+        stored = [(l, -l-1, l+2) for l in range(1, 98)] + [(l, l+1) for l in range(1, 99)]
+        for clause in stored:
+            clauses.add(clause, h.hash_literals(clause, keys))
+        bloom = clauses.bloom_filter()
+        self.assertGreaterEqual(8*len(bloom), len(stored) * h.ClauseHashSet.FILTER_BITS_PER_HASH)
+        self.assertTrue(all(passes(bloom, h.hash_literals(clause, keys)) for clause in stored))
+        for _ in range(5000):
+            clauses.add((len(clauses)+1,), len(clauses) * 0x9E3779B97F4A7C15 % 2**64)
+        bloom = clauses.bloom_filter()
+        self.assertGreaterEqual(8*len(bloom), len(clauses) * h.ClauseHashSet.FILTER_BITS_PER_HASH)
+        self.assertTrue(all(passes(bloom, h.hash_literals(clause, keys)) for clause in stored))
+        # Most hash values which are not stored are rejected.
+        rejected = sum(not passes(bloom, h.hash_literals((l, l+2), keys)) for l in range(1, 99))
+        self.assertGreater(rejected, 80)
+
+
+if __name__ == '__main__':
+    unittest.main()